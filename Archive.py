@@ -0,0 +1,227 @@
+import os
+import json
+import numpy as np
+from dimod.sampleset import SampleSet
+from dimod.variables import iter_serialize_variables, iter_deserialize_variables
+from .Response import Response, EXPORT_CHUNK_SIZE
+
+
+class ResponseArchive:
+    """An on-disk store for Response objects. Every response is saved in its own directory with a memory-mappable
+    layout:
+
+        samples.npy          bit-matrix of the samples (np.packbits along the variables, one row per sample)
+        energies.npy         energy of each sample
+        num_occurrences.npy  number of occurrences of each sample
+        metadata.json        variable labels (tuples as lists), variable type, shape, info of the sampleset and user
+                             defined metadata
+
+    Opening an archived response only reads metadata.json, the arrays are memory mapped and read by the operating
+    system when they are accessed.
+
+    Attributes
+    ----------
+    root
+        Directory that contains the archived responses
+
+    Methods
+    -------
+    store(response, name, overwrite, **metadata)
+        Save a response in the archive
+    open(name)
+        Open an archived response lazily
+    names()
+        Return the names of all archived responses
+    """
+
+    def __init__(self, root):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+
+    def __len__(self):
+        return len(self.names())
+
+    def __contains__(self, name):
+        try:
+            return os.path.isfile(os.path.join(self._directory(name), "metadata.json"))
+        except ValueError:
+            return False
+
+    def __iter__(self):
+        for name in self.names():
+            yield self.open(name)
+
+    def _directory(self, name):
+        """Return the directory of the response name. Names are plain directory names inside the archive. """
+        separators = [separator for separator in (os.sep, os.altsep) if separator]
+        if not name or name in (".", "..") or any(separator in name for separator in separators):
+            raise ValueError(f"Invalid response name '{name}': names can not be empty, '.', '..' or contain a path "
+                             f"separator")
+        root = os.path.realpath(self.root)
+        directory = os.path.realpath(os.path.join(root, name))
+        if os.path.dirname(directory) != root:
+            raise ValueError(f"Invalid response name '{name}': it leaves the archive directory")
+        return directory
+
+    def names(self):
+        """Return the sorted names of all archived responses. """
+        return sorted(name for name in os.listdir(self.root) if name in self)
+
+    def store(self, response, name=None, overwrite=False, **metadata):
+        """Save a response in the archive. The arrays are written chunk by chunk into memory mapped files.
+
+        Parameters
+        ----------
+        response: Response
+            The response that will be archived
+        name: str
+            Name of the archived response. If no name is passed, the next free number is used. Names containing a
+            path separator or '..' raise a ValueError.
+        overwrite: bool
+            Replace an archived response with the same name. By default a FileExistsError is raised.
+        **metadata
+            Additional JSON serializable information that is saved in metadata.json (e.g. the platform or solver)
+
+        Returns
+        -------
+        name: str
+            The name under which the response was archived
+        """
+        if name is None:
+            existing = [int(n) for n in self.names() if n.isdigit()]
+            name = str(max(existing) + 1 if existing else 0)
+        directory = self._directory(name)
+        if name in self:
+            if not overwrite:
+                raise FileExistsError(f"The archive already contains a response named '{name}'")
+            # the response is not listed while it is rewritten
+            os.remove(os.path.join(directory, "metadata.json"))
+        os.makedirs(directory, exist_ok=True)
+
+        record = response.sampleset.record
+        num_rows, num_variables = record.sample.shape
+        arrays = {
+            "samples": np.lib.format.open_memmap(os.path.join(directory, "samples.npy"), mode="w+", dtype=np.uint8,
+                                                 shape=(num_rows, (num_variables + 7) // 8)),
+            "energies": np.lib.format.open_memmap(os.path.join(directory, "energies.npy"), mode="w+",
+                                                  dtype=record.energy.dtype, shape=(num_rows,)),
+            "num_occurrences": np.lib.format.open_memmap(os.path.join(directory, "num_occurrences.npy"), mode="w+",
+                                                         dtype=record.num_occurrences.dtype, shape=(num_rows,)),
+        }
+        start = 0
+        for samples, energies, num_occurrences in response._iter_chunks(packed=True, chunk_size=EXPORT_CHUNK_SIZE):
+            stop = start + len(energies)
+            arrays["samples"][start:stop] = samples
+            arrays["energies"][start:stop] = energies
+            arrays["num_occurrences"][start:stop] = num_occurrences
+            start = stop
+        for array in arrays.values():
+            array.flush()
+        del arrays
+
+        info = response._export_metadata(packed=True)
+        # tuple labels are stored as lists and restored by ArchivedResponse
+        info["variable_labels"] = _jsonable(list(iter_serialize_variables(response.sampleset.variables)))
+        info["response_type"] = type(response).__name__
+        info["info"] = _jsonable(response.sampleset.info)
+        info["metadata"] = _jsonable(metadata)
+        # metadata.json is written last, so only completely written responses are listed by names()
+        with open(os.path.join(directory, "metadata.json"), "w") as file:
+            json.dump(info, file)
+        return name
+
+    def open(self, name):
+        """Open an archived response. Nothing but the metadata is read until the arrays are accessed.
+
+        Parameters
+        ----------
+        name: str
+            Name of the archived response
+
+        Returns
+        -------
+        ArchivedResponse
+        """
+        return ArchivedResponse(self._directory(name))
+
+
+class ArchivedResponse:
+    """A read-only view of an archived response. The arrays are memory mapped, so accessing packed_samples, energies
+    and num_occurrences does not copy any data.
+
+    Attributes
+    ----------
+    path
+        Directory of the archived response
+    metadata
+        Content of metadata.json
+    variables
+        Variable labels of the samples
+    vartype
+        "BINARY" or "SPIN"
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, "metadata.json")) as file:
+            self.metadata = json.load(file)
+        self.variables = list(iter_deserialize_variables(self.metadata["variable_labels"]))
+        self.vartype = self.metadata["variable_type"]
+        self._arrays = {}
+
+    def __len__(self):
+        return self.metadata["num_rows"]
+
+    def _load(self, name):
+        if name not in self._arrays:
+            self._arrays[name] = np.load(os.path.join(self.path, name + ".npy"), mmap_mode="r")
+        return self._arrays[name]
+
+    @property
+    def packed_samples(self):
+        """Memory mapped bit-matrix of the samples. """
+        return self._load("samples")
+
+    @property
+    def energies(self):
+        """Memory mapped energies of the samples. """
+        return self._load("energies")
+
+    @property
+    def num_occurrences(self):
+        """Memory mapped number of occurrences of the samples. """
+        return self._load("num_occurrences")
+
+    def samples(self, start=0, stop=None):
+        """Unpack the samples start to stop into an int8 matrix with one column per variable. Only the requested rows
+        are read from the disk. """
+        packed = self.packed_samples[start:stop]
+        samples = np.unpackbits(packed, axis=1, count=len(self.variables)).view(np.int8)
+        if self.vartype == "SPIN":
+            samples = 2 * samples - 1
+        return samples
+
+    def to_response(self):
+        """Load the whole archived response into memory and return it as a Response object. """
+        sampleset = SampleSet.from_samples((self.samples(), self.variables), self.vartype,
+                                           energy=np.asarray(self.energies),
+                                           num_occurrences=np.asarray(self.num_occurrences),
+                                           info=self.metadata["info"], sort_labels=False)
+        return Response(sampleset)
+
+
+def _jsonable(value):
+    """Return value with NumPy scalars and arrays converted into Python values, recursively for dictionaries, lists and
+    tuples. Keys that JSON does not support and values of other types are replaced by their string representation. """
+    if isinstance(value, dict):
+        return {key if isinstance(key, (str, int, float, bool)) or key is None else str(key): _jsonable(item)
+                for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_jsonable(item) for item in value]
+    if isinstance(value, np.ndarray):
+        return _jsonable(value.tolist())
+    if isinstance(value, np.generic):
+        return _jsonable(value.item())
+    if isinstance(value, (str, int, float, bool)) or value is None:
+        return value
+    return str(value)
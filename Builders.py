@@ -0,0 +1,217 @@
+import numpy as np
+
+
+def graph_arrays(graph, weight="weight", weights=None):
+    """Return the nodes and edges of a graph as arrays.
+
+    Parameters
+    ----------
+    graph
+        networkx graph or array of shape (m, 2) with one edge per row
+    weight: str
+        Edge attribute that is used as weight of a networkx graph (missing attributes count as 1)
+    weights: array
+        Weights of the edges of an edge array (default 1)
+
+    Returns
+    -------
+    nodes: list
+        Node labels, the i-th entry belongs to index i
+    u, v: numpy.ndarray
+        Node indices of the edges
+    w: numpy.ndarray
+        Edge weights
+    """
+    if hasattr(graph, "nodes") and hasattr(graph, "edges"):
+        nodes = list(graph.nodes())
+        index = {node: i for i, node in enumerate(nodes)}
+        num_edges = graph.number_of_edges()
+        u = np.fromiter((index[a] for a, b in graph.edges()), dtype=np.int64, count=num_edges)
+        v = np.fromiter((index[b] for a, b in graph.edges()), dtype=np.int64, count=num_edges)
+        w = np.fromiter((data.get(weight, 1.0) for a, b, data in graph.edges(data=True)), dtype=np.float64,
+                        count=num_edges)
+        return nodes, u, v, w
+
+    edges = np.asarray(graph)
+    if edges.ndim != 2 or edges.shape[1] != 2:
+        raise ValueError("graph has to be a networkx graph or an array of shape (m, 2)")
+    labels, inverse = np.unique(edges, return_inverse=True)
+    inverse = inverse.reshape(edges.shape)
+    w = np.ones(len(edges)) if weights is None else np.asarray(weights, dtype=np.float64)
+    return labels.tolist(), inverse[:, 0], inverse[:, 1], w
+
+
+def _one_hot_pairs(groups):
+    """Return all index pairs (i < j) within the rows of groups (array of shape (num_groups, group_size)). """
+    first, second = np.triu_indices(groups.shape[1], k=1)
+    return groups[:, first].ravel(), groups[:, second].ravel()
+
+
+def _qubo(config, num_variables, linear_terms, quadratic_terms, variables, offset):
+    """Create an array-backed Qubo from lists of (index, bias) and (row, col, bias) arrays. """
+    from .Problem import Qubo
+
+    linear = np.zeros(num_variables)
+    for index, bias in linear_terms:
+        np.add.at(linear, index, bias)
+    row = np.concatenate([np.asarray(term[0], dtype=np.int64) for term in quadratic_terms])
+    col = np.concatenate([np.asarray(term[1], dtype=np.int64) for term in quadratic_terms])
+    quadratic = np.concatenate([np.broadcast_to(np.asarray(term[2], dtype=np.float64), np.shape(term[0]))
+                                for term in quadratic_terms])
+    return Qubo.from_arrays(config, linear, (row, col, quadratic), variables, offset)
+
+
+def graph_coloring(graph, num_colors, config=None, penalty=1.0, conflict=1.0):
+    """QUBO of the graph coloring problem. The binary variable (node, color) is 1 if the node gets the color.
+
+    Energy: penalty * sum over the nodes of (sum over the colors of x[node, color] - 1)^2
+    + conflict * sum over the edges (u, v) and the colors c of x[u, c] * x[v, c]. A valid coloring has energy 0.
+
+    Parameters
+    ----------
+    graph
+        networkx graph or edge array, see graph_arrays
+    num_colors: int
+        Number of colors
+    config
+        The config object that contains the users configuration data
+    penalty, conflict
+        Weights of the one-color-per-node constraint and of adjacent nodes with the same color
+
+    Returns
+    -------
+    Qubo
+    """
+    nodes, u, v, w = graph_arrays(graph)
+    num_nodes = len(nodes)
+    variable = np.arange(num_nodes * num_colors, dtype=np.int64).reshape(num_nodes, num_colors)
+    first, second = _one_hot_pairs(variable)
+    colors = np.arange(num_colors)
+    variables = [(node, color) for node in nodes for color in range(num_colors)]
+    return _qubo(config, len(variables), [(variable.ravel(), -penalty)],
+                 [(first, second, 2 * penalty),
+                  ((u[:, None] * num_colors + colors).ravel(), (v[:, None] * num_colors + colors).ravel(), conflict)],
+                 variables, penalty * num_nodes)
+
+
+def max_cut(graph, config=None, weight="weight", weights=None):
+    """QUBO of the (weighted) maximum cut problem. The binary variable of a node is its side of the cut. The energy is
+    the negative weight of the cut.
+
+    Parameters
+    ----------
+    graph
+        networkx graph or edge array, see graph_arrays
+    config
+        The config object that contains the users configuration data
+    weight, weights
+        Edge weights, see graph_arrays
+
+    Returns
+    -------
+    Qubo
+    """
+    nodes, u, v, w = graph_arrays(graph, weight, weights)
+    return _qubo(config, len(nodes), [(u, -w), (v, -w)], [(u, v, 2 * w)], nodes, 0.0)
+
+
+def max_independent_set(graph, config=None, penalty=2.0, node_weights=None):
+    """QUBO of the (weighted) maximum independent set problem. The binary variable of a node is 1 if the node is in the
+    set. The energy of an independent set is its negative weight.
+
+    Parameters
+    ----------
+    graph
+        networkx graph or edge array, see graph_arrays
+    config
+        The config object that contains the users configuration data
+    penalty: float
+        Penalty for both nodes of an edge in the set, has to be larger than the largest node weight
+    node_weights: array
+        Weight of every node (in the order of the nodes, see graph_arrays), default 1
+
+    Returns
+    -------
+    Qubo
+    """
+    nodes, u, v, w = graph_arrays(graph)
+    node_weights = np.ones(len(nodes)) if node_weights is None else np.asarray(node_weights, dtype=np.float64)
+    return _qubo(config, len(nodes), [(np.arange(len(nodes)), -node_weights)], [(u, v, penalty)], nodes, 0.0)
+
+
+def tsp(distances, config=None, penalty=None, weight="weight"):
+    """QUBO of the traveling salesperson problem. The binary variable (city, position) is 1 if the city is visited at
+    the position of the tour.
+
+    Energy: penalty * (every city at exactly one position and every position with exactly one city, squared
+    violations) + the length of the closed tour. A valid tour has its length as energy. The QUBO has n^3 quadratic
+    terms for n cities.
+
+    Parameters
+    ----------
+    distances
+        Matrix of the distances between the cities, or a networkx graph whose edge weights are the distances. Pairs
+        of cities without an edge can not follow each other (they get the distance penalty).
+    config
+        The config object that contains the users configuration data
+    penalty: float
+        Weight of the constraints, by default twice the largest distance
+    weight: str
+        Edge attribute of a networkx graph that contains the distance
+
+    Returns
+    -------
+    Qubo
+    """
+    if hasattr(distances, "nodes"):
+        cities, u, v, w = graph_arrays(distances, weight)
+        matrix = np.full((len(cities), len(cities)), np.nan)
+        matrix[u, v] = w
+        matrix[v, u] = w
+    else:
+        matrix = np.array(distances, dtype=np.float64)
+        cities = list(range(len(matrix)))
+    num_cities = len(cities)
+    np.fill_diagonal(matrix, np.nan)
+    if penalty is None:
+        penalty = 2 * np.nanmax(matrix) if num_cities > 1 else 1.0
+    matrix = np.where(np.isnan(matrix), penalty, matrix)
+
+    variable = np.arange(num_cities * num_cities, dtype=np.int64).reshape(num_cities, num_cities)
+    city_first, city_second = _one_hot_pairs(variable)
+    position_first, position_second = _one_hot_pairs(variable.T)
+
+    # x[a, p] * x[b, p + 1] for all ordered pairs of different cities a, b and all positions p
+    a, b = np.nonzero(~np.eye(num_cities, dtype=bool))
+    positions = np.arange(num_cities)
+    tour_first = (variable[a][:, positions]).ravel()
+    tour_second = (variable[b][:, (positions + 1) % num_cities]).ravel()
+    tour_bias = np.repeat(matrix[a, b], num_cities)
+
+    variables = [(city, position) for city in cities for position in range(num_cities)]
+    return _qubo(config, len(variables), [(variable.ravel(), -2 * penalty)],
+                 [(city_first, city_second, 2 * penalty), (position_first, position_second, 2 * penalty),
+                  (tour_first, tour_second, tour_bias)],
+                 variables, 2 * penalty * num_cities)
+
+
+def number_partitioning(numbers, config=None):
+    """QUBO of the number partitioning problem. The binary variable of a number is the set it belongs to. The energy is
+    the squared difference of the sums of the two sets (s_i = 2 x_i - 1, energy (sum of numbers[i] * s_i)^2).
+
+    Parameters
+    ----------
+    numbers: array
+        The numbers that are partitioned
+    config
+        The config object that contains the users configuration data
+
+    Returns
+    -------
+    Qubo
+    """
+    numbers = np.asarray(numbers, dtype=np.float64)
+    total = numbers.sum()
+    row, col = np.triu_indices(len(numbers), k=1)
+    return _qubo(config, len(numbers), [(np.arange(len(numbers)), 4 * numbers * (numbers - total))],
+                 [(row, col, 8 * numbers[row] * numbers[col])], list(range(len(numbers))), total ** 2)
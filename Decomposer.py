@@ -0,0 +1,154 @@
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+from dimod.sampleset import SampleSet
+from . import LocalSolver
+from .Problem import Qubo, Ising
+from .Response import Response
+
+
+class Decomposer:
+    """Solve problems that are too large for a platform by splitting them into sub-problems (client-side, similar to
+    QBSolv).
+
+    In every iteration the variables are ranked by the energy impact of flipping them in the current solution. The
+    ranking is cut into num_subproblems sub-problems of subproblem_size variables, the remaining variables are clamped
+    to their current values. The sub-problems are solved concurrently on the chosen platform and every sub-solution that
+    lowers the energy of the whole problem is written back into the current solution. The iterations stop when the
+    energy did not improve for max_stall iterations or after max_iter iterations.
+
+    Attributes
+    ----------
+    platform, solver, params
+        Platform, solver and solver parameters the sub-problems are solved with
+    subproblem_size
+        Number of variables per sub-problem
+    num_subproblems
+        Number of sub-problems per iteration
+    workers
+        Number of sub-problems that are solved at the same time
+    times
+        Number of samples per sub-problem
+    polish
+        If True, the current solution is improved with a steepest descent after every iteration
+
+    Methods
+    -------
+    solve(problem, initial_state)
+        Solve the problem and return a Response with the best solution. The response has an attribute convergence
+        with one entry per iteration.
+    """
+
+    def __init__(self, platform="local", solver=None, params=None, subproblem_size=50, num_subproblems=4, workers=4,
+                 times=1, max_iter=100, max_stall=3, polish=True, seed=None):
+        self.platform = platform
+        self.solver = solver
+        self.params = params if params is not None else {}
+        self.subproblem_size = subproblem_size
+        self.num_subproblems = num_subproblems
+        self.workers = workers
+        self.times = times
+        self.max_iter = max_iter
+        self.max_stall = max_stall
+        self.polish = polish
+        self.rng = np.random.default_rng(seed)
+
+    def _subproblem(self, problem, variables, state, linear, fields, row, col, quadratic):
+        """Create the sub-problem over the given variable indices, all other variables are clamped to state. """
+        selected = np.zeros(len(linear), dtype=bool)
+        selected[variables] = True
+        position = np.full(len(linear), -1, dtype=np.int64)
+        position[variables] = np.arange(len(variables))
+
+        # the clamped variables contribute to the linear biases of the selected variables
+        sub_linear = linear[variables] + fields[variables]
+        internal = selected[row] & selected[col]
+        sub_row, sub_col, sub_quadratic = position[row[internal]], position[col[internal]], quadratic[internal]
+        np.subtract.at(sub_linear, sub_row, sub_quadratic * state[col[internal]])
+        np.subtract.at(sub_linear, sub_col, sub_quadratic * state[row[internal]])
+
+        if isinstance(problem, Ising):
+            subproblem = Ising(problem.config, dict(enumerate(sub_linear.tolist())),
+                               dict(zip(zip(sub_row.tolist(), sub_col.tolist()), sub_quadratic.tolist())))
+        else:
+            qubo = {(i, i): bias for i, bias in enumerate(sub_linear.tolist())}
+            qubo.update(zip(zip(sub_row.tolist(), sub_col.tolist()), sub_quadratic.tolist()))
+            subproblem = Qubo(problem.config, qubo)
+        subproblem.with_platform(self.platform).with_params(**self.params)
+        if self.solver is not None:
+            subproblem.with_solver(self.solver)
+        return subproblem
+
+    def _solve_subproblem(self, subproblem):
+        response = subproblem.solve(self.times)
+        best = int(np.argmin(response.sampleset.record.energy))
+        labels = list(response.sampleset.variables)
+        sample = response.sampleset.record.sample[best]
+        return sample[np.argsort(np.asarray(labels, dtype=np.int64))]
+
+    def solve(self, problem, initial_state=None):
+        """Solve a Qubo or Ising by decomposition.
+
+        Parameters
+        ----------
+        problem: Problem
+            The problem that is solved
+        initial_state: dict
+            Initial value of every variable. By default a random state is used.
+
+        Returns
+        -------
+        Response
+            Response with the best found solution. Its attribute convergence is a list with a dictionary per iteration
+            ("iteration", "energy", "accepted" sub-problems, "num_subproblems").
+        """
+        variables, linear, (row, col, quadratic), offset = problem.to_arrays()
+        vartype = problem.vartype
+        csr = LocalSolver.adjacency(len(variables), row, col, quadratic)
+
+        if initial_state is not None:
+            state = np.array([initial_state[v] for v in variables], dtype=np.int8)
+        else:
+            state = LocalSolver.initial_samples(1, len(variables), vartype, self.rng)[0]
+        if self.polish:
+            state = LocalSolver.steepest_descent(state[None, :], linear, csr, vartype)[0][0]
+        energy = LocalSolver.energies(state[None, :], linear, row, col, quadratic, offset)[0]
+
+        convergence = []
+        stall = 0
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            for iteration in range(self.max_iter):
+                fields = LocalSolver.local_fields(state[None, :], csr)[0]
+                impact = LocalSolver.flip_changes(state, vartype) * (linear + fields)
+                # ties are broken randomly, so that the sub-problems differ between iterations
+                ranking = np.lexsort((self.rng.random(len(variables)), impact))
+                groups = [ranking[start:start + self.subproblem_size]
+                          for start in range(0, min(len(ranking), self.num_subproblems * self.subproblem_size),
+                                             self.subproblem_size)]
+                subproblems = [self._subproblem(problem, group, state, linear, fields, row, col, quadratic)
+                               for group in groups]
+                solutions = list(executor.map(self._solve_subproblem, subproblems))
+
+                accepted = 0
+                for group, solution in zip(groups, solutions):
+                    candidate = state.copy()
+                    candidate[group] = solution
+                    candidate_energy = LocalSolver.energies(candidate[None, :], linear, row, col, quadratic, offset)[0]
+                    if candidate_energy < energy - LocalSolver.EPSILON:
+                        state, energy = candidate, candidate_energy
+                        accepted += 1
+                if self.polish:
+                    state = LocalSolver.steepest_descent(state[None, :], linear, csr, vartype)[0][0]
+                    energy = LocalSolver.energies(state[None, :], linear, row, col, quadratic, offset)[0]
+
+                previous = convergence[-1]["energy"] if convergence else None
+                convergence.append({"iteration": iteration, "energy": float(energy), "accepted": accepted,
+                                    "num_subproblems": len(subproblems)})
+                stall = stall + 1 if previous is not None and energy >= previous - LocalSolver.EPSILON else 0
+                if stall >= self.max_stall or len(groups) == 1 and len(groups[0]) == len(variables):
+                    break
+
+        sampleset = SampleSet.from_samples((state[None, :], variables), vartype, energy=[energy],
+                                           info={"convergence": convergence}, sort_labels=False)
+        response = Response(sampleset)
+        response.convergence = convergence
+        return response
@@ -0,0 +1,404 @@
+import os
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from .UQOExceptions import InvalidEmbeddingException
+
+try:
+    import minorminer
+except ImportError:
+    minorminer = None
+
+def _edges_file(solver):
+    from .client.config import CACHE_DIR
+
+    return os.path.join(CACHE_DIR, "edges_{0}.npy".format(solver.replace(os.sep, "_")))
+
+
+def cached_solver_edges(solver):
+    """Return the cached edge list (array of shape (num_edges, 2)) of a solver or None if it is not cached. """
+    path = _edges_file(solver)
+    return np.load(path) if os.path.isfile(path) else None
+
+
+def solver_edges(connection, solver, refresh=False):
+    """Return the edge list of a DWave solver as an array of shape (num_edges, 2). The edge list is requested from the
+    server only once and cached in CACHE_DIR (see client.config) afterwards.
+
+    Parameters
+    ----------
+    connection
+        Connection that is used if the edge list is not cached
+    solver: str
+        Name of the solver, e.g. "Advantage_system4.1"
+    refresh: bool
+        Request the edge list again even if it is cached
+    """
+    if solver is None:
+        raise ValueError("No DWave solver given. Pass the name of a solver or set the solver of the problem "
+                         "(Problem.with_solver).")
+    edges = None if refresh else cached_solver_edges(solver)
+    if edges is None:
+        edges = np.asarray(connection.get_edgelist(solver), dtype=np.int64).reshape(-1, 2)
+        path = _edges_file(solver)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        np.save(path, edges)
+    return edges
+
+
+class EmbeddingReport:
+    """Result of checking an embedding against the edge list of a solver.
+
+    Attributes
+    ----------
+    chain_lengths
+        Dictionary with the chain length of every variable
+    num_qubits
+        Number of qubits used by the embedding
+    max_chain_length, mean_chain_length
+        Statistics of the chain lengths
+    unembedded_variables
+        Variables of the problem without a chain
+    unknown_qubits
+        Qubits of the chains that are not part of the solver graph
+    overlapping_qubits
+        Qubits that are used by more than one chain
+    broken_chains
+        Variables whose chain is not connected in the solver graph
+    missing_couplers
+        Interactions (u, v) of the problem without a coupler between the chains of u and v
+    valid
+        True if the embedding has none of the problems above
+    """
+
+    def __init__(self, **kwargs):
+        self.__dict__.update(kwargs)
+
+    def errors(self):
+        """Return a list of human readable error messages. """
+        messages = []
+        for name in ["unembedded_variables", "unknown_qubits", "overlapping_qubits", "broken_chains",
+                     "missing_couplers"]:
+            values = getattr(self, name)
+            if values:
+                messages.append("{0} {1}: {2}{3}".format(len(values), name.replace("_", " "), values[:10],
+                                                         " ..." if len(values) > 10 else ""))
+        return messages
+
+    def __repr__(self):
+        lines = ["qubits used: {0}".format(self.num_qubits),
+                 "max chain length: {0}".format(self.max_chain_length),
+                 "mean chain length: {0:.2f}".format(self.mean_chain_length)]
+        return "\n".join(lines + (self.errors() or ["embedding is valid"]))
+
+
+def check_embedding(problem, embedding, edges):
+    """Check an embedding of a problem against an edge list. All checks are done on arrays, so even embeddings of large
+    problems are checked in milliseconds.
+
+    Parameters
+    ----------
+    problem: Problem
+        The embedded problem
+    embedding: dict
+        Dictionary that maps every variable of the problem to a chain (list of qubits)
+    edges: numpy.ndarray
+        Edge list of the solver, shape (num_edges, 2)
+
+    Returns
+    -------
+    EmbeddingReport
+    """
+    if embedding is None:
+        raise ValueError("No embedding given. Find an embedding first (e.g. Problem.find_pegasus_embedding).")
+    if edges is None:
+        raise ValueError("No edge list given. Pass the edge list of a solver (see solver_edges).")
+    variables, linear, (row, col, quadratic), offset = problem.to_arrays()
+    edges = np.asarray(edges, dtype=np.int64).reshape(-1, 2)
+    nodes = np.unique(edges)
+
+    embedded = [v for v in variables if v in embedding and len(embedding[v]) > 0]
+    unembedded = [v for v in variables if v not in embedding or len(embedding[v]) == 0]
+    chain_lengths = np.array([len(embedding[v]) for v in embedded], dtype=np.int64)
+    qubits = np.fromiter((q for v in embedded for q in embedding[v]), dtype=np.int64, count=int(chain_lengths.sum()))
+    chain_of_qubit = np.repeat(np.arange(len(embedded)), chain_lengths)
+
+    unknown = qubits[~np.isin(qubits, nodes)]
+    unique_qubits, counts = np.unique(qubits, return_counts=True)
+    overlapping = unique_qubits[counts > 1]
+
+    # map every qubit to its chain (-1 for unused qubits), qubits used by several chains keep the last chain
+    size = int(max(nodes.max() if len(nodes) else 0, qubits.max() if len(qubits) else 0)) + 1
+    owner = np.full(size, -1, dtype=np.int64)
+    owner[qubits] = chain_of_qubit
+    owner_a, owner_b = owner[edges[:, 0]], owner[edges[:, 1]]
+
+    # connectivity of the chains: propagate the smallest qubit id along the edges inside the chains
+    inside = (owner_a == owner_b) & (owner_a >= 0)
+    a, b = edges[inside, 0], edges[inside, 1]
+    component = np.arange(size)
+    while True:
+        previous = component.copy()
+        smallest = np.minimum(component[a], component[b])
+        np.minimum.at(component, a, smallest)
+        np.minimum.at(component, b, smallest)
+        component = component[component]
+        if np.array_equal(component, previous):
+            break
+    components_per_chain = np.zeros(len(embedded), dtype=np.int64)
+    roots = np.unique(np.stack([chain_of_qubit, component[qubits]], axis=1), axis=0)
+    np.add.at(components_per_chain, roots[:, 0], 1)
+    broken = [embedded[i] for i in np.flatnonzero(components_per_chain > 1)]
+
+    # couplers between the chains of interacting variables
+    chain_index = np.full(len(variables), -1, dtype=np.int64)
+    position = {v: i for i, v in enumerate(variables)}
+    chain_index[[position[v] for v in embedded]] = np.arange(len(embedded))
+    between = (owner_a >= 0) & (owner_b >= 0) & (owner_a != owner_b)
+    num_chains = max(len(embedded), 1)
+    available = np.unique(np.minimum(owner_a[between], owner_b[between]) * num_chains +
+                          np.maximum(owner_a[between], owner_b[between]))
+    chain_row, chain_col = chain_index[row], chain_index[col]
+    both_embedded = (chain_row >= 0) & (chain_col >= 0)
+    needed = np.minimum(chain_row, chain_col) * num_chains + np.maximum(chain_row, chain_col)
+    missing = np.flatnonzero(both_embedded & ~np.isin(needed, available))
+    missing_couplers = [(variables[row[k]], variables[col[k]]) for k in missing]
+
+    report = EmbeddingReport(
+        chain_lengths=dict(zip(embedded, chain_lengths.tolist())),
+        num_qubits=len(unique_qubits),
+        max_chain_length=int(chain_lengths.max()) if len(chain_lengths) else 0,
+        mean_chain_length=float(chain_lengths.mean()) if len(chain_lengths) else 0.0,
+        unembedded_variables=unembedded,
+        unknown_qubits=unknown.tolist(),
+        overlapping_qubits=overlapping.tolist(),
+        broken_chains=broken,
+        missing_couplers=missing_couplers,
+    )
+    report.valid = not report.errors()
+    return report
+
+
+def validate_embedding(problem, embedding, edges):
+    """Raise an InvalidEmbeddingException if the embedding is not valid for the edge list. """
+    report = check_embedding(problem, embedding, edges)
+    if not report.valid:
+        raise InvalidEmbeddingException(report.errors())
+    return report
+
+
+def topology_edges(topology, shape):
+    """Return the edge list of an ideal Chimera or Pegasus graph from dwave_networkx, e.g. ("chimera", (16, 16, 4)) or
+    ("pegasus", (16,)). """
+    import dwave_networkx as dnx
+
+    graph = dnx.chimera_graph(*shape) if topology == "chimera" else dnx.pegasus_graph(*shape)
+    return np.array(list(graph.edges()), dtype=np.int64).reshape(-1, 2)
+
+
+def _embedding_attempt(source_edges, target_edges, seed, params):
+    """Run one randomized minorminer attempt and return the embedding with variable indices as keys. """
+    embedding = minorminer.find_embedding(source_edges, target_edges, random_seed=seed, **params)
+    return {int(key): list(map(int, chain)) for key, chain in embedding.items()}
+
+
+def _embedding_quality(embedding):
+    """Sort key of an embedding: failed embeddings last, then the longest chain, then the number of qubits. """
+    if not embedding:
+        return (1, 0, 0)
+    lengths = [len(chain) for chain in embedding.values()]
+    return (0, max(lengths), sum(lengths))
+
+
+def find_embedding(problem, edges, attempts=8, workers=None, seed=None, **params):
+    """Search an embedding of a problem in the current machine. attempts randomized minorminer runs are distributed to
+    a process pool and the embedding with the shortest longest chain (then the fewest qubits) is returned.
+
+    Parameters
+    ----------
+    problem: Problem
+        The problem that is embedded
+    edges: numpy.ndarray
+        Edge list of the solver graph (see solver_edges and topology_edges)
+    attempts: int
+        Number of randomized attempts
+    workers: int
+        Number of processes. By default one process per CPU (at most attempts).
+    seed: int
+        Seed for the random seeds of the attempts
+    **params
+        Further parameters for minorminer.find_embedding (e.g. timeout, tries)
+
+    Returns
+    -------
+    embedding: dict
+        Dictionary that maps every variable label to a chain of qubits
+    """
+    if minorminer is None:
+        raise ImportError("minorminer is required to find embeddings locally")
+
+    variables, linear, (row, col, quadratic), offset = problem.to_arrays()
+    source_edges = list(zip(row.tolist(), col.tolist()))
+    target_edges = [tuple(edge) for edge in np.asarray(edges, dtype=np.int64).reshape(-1, 2).tolist()]
+    seeds = np.random.SeedSequence(seed).generate_state(attempts).tolist()
+
+    workers = min(workers if workers is not None else (os.cpu_count() or 1), attempts)
+    if workers <= 1:
+        embeddings = [_embedding_attempt(source_edges, target_edges, s, params) for s in seeds]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            embeddings = list(executor.map(_embedding_attempt, [source_edges] * attempts, [target_edges] * attempts,
+                                           seeds, [params] * attempts))
+    best = min(embeddings, key=_embedding_quality)
+    if source_edges and not best:
+        raise InvalidEmbeddingException(["no embedding was found in {0} attempts".format(attempts)])
+
+    # variables without interactions are not part of the source graph, they get a free qubit each
+    used = {qubit for chain in best.values() for qubit in chain}
+    free = (qubit for qubit in np.unique(edges).tolist() if qubit not in used)
+    embedding = {}
+    for index, label in enumerate(variables):
+        if index in best:
+            embedding[label] = best[index]
+            continue
+        try:
+            embedding[label] = [next(free)]
+        except StopIteration:
+            raise InvalidEmbeddingException(["no free qubit is left for the variable {0}".format(label)]) from None
+    return embedding
+
+
+# --------------------------- Rendering --------------------------- #
+
+# Topology graphs and node positions are expensive to build, they are cached per (family, shape, solver)
+_topology_cache = {}
+
+
+def solver_family(solver):
+    """Return the graph family of a DWave solver ("chimera", "pegasus" or "zephyr") based on its name. """
+    if solver is not None and solver.startswith("Advantage2"):
+        return "zephyr"
+    if solver is not None and solver.startswith("Advantage"):
+        return "pegasus"
+    return "chimera"
+
+
+def topology_shape(family, max_qubit):
+    """Return the smallest shape of a graph of the given family that contains the qubit index max_qubit. """
+    m = 1
+    if family == "pegasus":
+        while 24 * m * (m - 1) <= max_qubit:
+            m += 1
+        return (m,)
+    if family == "zephyr":
+        while 16 * m * (2 * m + 1) <= max_qubit:
+            m += 1
+        return (m,)
+    while 8 * m * m <= max_qubit:
+        m += 1
+    return (m, m, 4)
+
+
+def topology_graph(family, shape, solver=None, edges=None):
+    """Return the dwave_networkx graph and the node positions (array indexed by the qubit) of a topology. If the edge
+    list of a solver is passed, the graph only contains its working qubits and couplers. The result is cached. """
+    import dwave_networkx as dnx
+
+    key = (family, tuple(shape), solver)
+    if key not in _topology_cache:
+        edge_list = None if edges is None else [tuple(edge) for edge in np.asarray(edges).tolist()]
+        if family == "pegasus":
+            graph = dnx.pegasus_graph(*shape, edge_list=edge_list)
+            layout = dnx.pegasus_layout(graph)
+        elif family == "zephyr":
+            graph = dnx.zephyr_graph(*shape, edge_list=edge_list)
+            layout = dnx.zephyr_layout(graph)
+        else:
+            graph = dnx.chimera_graph(*shape, edge_list=edge_list)
+            layout = dnx.chimera_layout(graph)
+        positions = np.full((max(graph.nodes()) + 1, 2), np.nan)
+        nodes = np.fromiter(layout.keys(), dtype=np.int64, count=len(layout))
+        positions[nodes] = np.array(list(layout.values()))
+        _topology_cache[key] = (graph, positions)
+    return _topology_cache[key]
+
+
+def solver_topology(solver=None, family=None, shape=None):
+    """Return the graph and node positions for a solver. Family and shape are derived from the solver name and its
+    cached edge list; without an edge list the shape of the solver family's largest graph in use is taken (C16, P16,
+    Z6) unless a shape is given. """
+    family = family if family is not None else solver_family(solver)
+    edges = cached_solver_edges(solver) if solver is not None and solver_family(solver) == family else None
+    if shape is None:
+        if edges is not None and len(edges):
+            shape = topology_shape(family, int(edges.max()))
+        else:
+            shape = {"pegasus": (16,), "zephyr": (6,)}.get(family, (16, 16, 4))
+    return topology_graph(family, shape, solver if edges is not None else None, edges)
+
+
+def draw_embedding(embedding, output_path, solver=None, family=None, shape=None, mode="auto", dpi=200):
+    """Save a drawing of an embedding to a file.
+
+    Parameters
+    ----------
+    embedding: dict
+        Dictionary that maps every variable to a chain of qubits
+    output_path
+        Specifies the path to the file where to save the embedding
+    solver: str
+        DWave solver the embedding belongs to, used to derive the topology (see solver_topology)
+    family, shape
+        Override the topology, e.g. family="pegasus", shape=(16,)
+    mode: str
+        "full" draws every node and edge with dwave_networkx (slow for large embeddings), "raster" draws all qubits
+        and chain edges as two rasterised collections, "aggregate" draws a heatmap of the used qubits per region.
+        "auto" uses "full" for embeddings with up to 500 qubits and "raster" otherwise.
+    dpi: int
+        Resolution of the rasterised parts
+    """
+    import dwave_networkx as dnx
+    import matplotlib.pyplot as plt
+    from matplotlib.collections import LineCollection
+
+    family = family if family is not None else solver_family(solver)
+    graph, positions = solver_topology(solver, family, shape)
+    chains = list(embedding.values())
+    lengths = np.array([len(chain) for chain in chains], dtype=np.int64)
+    qubits = np.fromiter((q for chain in chains for q in chain), dtype=np.int64, count=int(lengths.sum()))
+    chain_of_qubit = np.repeat(np.arange(len(chains)), lengths)
+    if mode == "auto":
+        mode = "full" if len(qubits) <= 500 else "raster"
+
+    figure, axes = plt.subplots(figsize=(10, 10))
+    axes.set_axis_off()
+    if mode == "full":
+        draw = {"pegasus": dnx.draw_pegasus_embedding, "zephyr": dnx.draw_zephyr_embedding}.get(
+            family, dnx.draw_chimera_embedding)
+        draw(graph, emb=embedding, node_size=3, width=.3, ax=axes)
+    elif mode == "raster":
+        all_nodes = positions[~np.isnan(positions[:, 0])]
+        axes.scatter(all_nodes[:, 0], all_nodes[:, 1], s=0.5, c="lightgrey", linewidths=0, rasterized=True)
+
+        # edges between qubits of the same chain
+        edges = np.array(list(graph.edges()), dtype=np.int64).reshape(-1, 2)
+        owner = np.full(len(positions), -1, dtype=np.int64)
+        owner[qubits] = chain_of_qubit
+        inside = (owner[edges[:, 0]] == owner[edges[:, 1]]) & (owner[edges[:, 0]] >= 0)
+        colors = plt.get_cmap("hsv")((owner[edges[inside, 0]] * 0.618) % 1.0)
+        segments = np.stack([positions[edges[inside, 0]], positions[edges[inside, 1]]], axis=1)
+        axes.add_collection(LineCollection(segments, colors=colors, linewidths=0.6, rasterized=True))
+        axes.scatter(positions[qubits, 0], positions[qubits, 1], s=2, linewidths=0,
+                     c=plt.get_cmap("hsv")((chain_of_qubit * 0.618) % 1.0), rasterized=True)
+    elif mode == "aggregate":
+        bins = 4 * int(graph.graph.get("rows", 16))
+        used = positions[qubits]
+        heatmap, x_edges, y_edges = np.histogram2d(used[:, 0], used[:, 1], bins=bins)
+        axes.imshow(heatmap.T, origin="lower", cmap="viridis", interpolation="nearest",
+                    extent=(x_edges[0], x_edges[-1], y_edges[0], y_edges[-1]))
+    else:
+        raise ValueError(f"Invalid mode '{mode}'. Valid modes are 'auto', 'full', 'raster' and 'aggregate'")
+
+    axes.autoscale()
+    figure.savefig(output_path, dpi=dpi)
+    plt.close(figure)
+
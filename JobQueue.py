@@ -0,0 +1,326 @@
+import io
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+import multiprocessing
+from contextlib import closing
+import numpy as np
+from .Response import Response, sampleset_from_serializable
+from .client.codec import decode_reply
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    problem BLOB NOT NULL,
+    settings TEXT NOT NULL,
+    times INTEGER NOT NULL,
+    status TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    worker TEXT,
+    heartbeat REAL,
+    created REAL NOT NULL,
+    finished REAL,
+    error TEXT,
+    response TEXT
+);
+CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, created);
+"""
+
+
+def _labels_from_json(value):
+    """JSON turns tuple labels into lists, lists are not hashable, so every list was a tuple. """
+    if isinstance(value, list):
+        return tuple(_labels_from_json(item) for item in value)
+    return value
+
+
+def serialize_problem(problem):
+    """Return (kind, problem, settings) of a Qubo or Ising. The arrays of the problem are stored in NPZ format, the
+    variable labels, platform, solver, parameters and embedding as JSON. The embedding and the label-keyed solver
+    parameters (initial state, guidance) are keyed by variable indices (see Problem.encode_embedding and
+    Problem.encode_solver_params), so any label can be stored. """
+    from .Problem import LABEL_KEYED_PARAMS
+
+    variables, linear, (row, col, quadratic), offset = problem.to_arrays()
+    buffer = io.BytesIO()
+    np.savez(buffer, linear=linear, row=row, col=col, quadratic=quadratic, offset=np.float64(offset))
+    embedding = None
+    if problem.embedding is not None:
+        embedding = [[v, list(chain)] for v, chain in problem.encode_embedding(problem.embedding).items()]
+    solver_params = problem.encode_solver_params()
+    solver_params = {name: [[v, int(value)] for v, value in param.items()] if name in LABEL_KEYED_PARAMS else param
+                     for name, param in solver_params.items()}
+    settings = {
+        "variables": list(variables),
+        "platform": problem.platform,
+        "solver": problem.solver,
+        "solver_params": solver_params,
+        "uq_params": problem.uq_params,
+        "embedding": embedding,
+    }
+    return type(problem).__name__, buffer.getvalue(), json.dumps(settings)
+
+
+def deserialize_problem(config, kind, data, settings):
+    """Recreate the Qubo or Ising that was serialized with serialize_problem. """
+    from .Problem import Qubo, Ising, LABEL_KEYED_PARAMS
+
+    arrays = np.load(io.BytesIO(data))
+    settings = json.loads(settings)
+    variables = [_labels_from_json(v) for v in settings["variables"]]
+    cls = Ising if kind == "Ising" else Qubo
+    problem = cls.from_arrays(config, arrays["linear"], (arrays["row"], arrays["col"], arrays["quadratic"]),
+                              variables, float(arrays["offset"]))
+    problem.platform = settings["platform"]
+    problem.solver = settings["solver"]
+    problem.solver_params = {name: {variables[v]: value for v, value in param} if name in LABEL_KEYED_PARAMS else param
+                             for name, param in settings["solver_params"].items()}
+    problem.uq_params = settings["uq_params"]
+    if settings["embedding"] is not None:
+        problem.embedding = problem.decode_embedding({v: chain for v, chain in settings["embedding"]})
+    return problem
+
+
+class JobQueue:
+    """Durable queue of solve jobs in a SQLite database.
+
+    Every job stores the serialized problem (see serialize_problem), its platform, solver and parameters and the number
+    of samples. Workers claim pending jobs, solve them and store the serialized sampleset of the response. A running
+    job holds a lease that its worker renews while it is solving; jobs whose lease expired (e.g. because the process
+    crashed or was redeployed) are claimed again, so no job is lost after a restart.
+
+    Job ids are idempotent: by default the id is a hash of the problem, its settings and the number of samples, so
+    submitting the same job twice (e.g. when a script is restarted) does not create a second job.
+
+    Only the problem itself is stored: presolve information and Ising/QUBO conversion links are not kept, solve the
+    problem that should be sent to the platform.
+
+    Attributes
+    ----------
+    path
+        Path of the SQLite database
+    lease
+        Seconds after which a running job without a heartbeat is handed to another worker
+    max_attempts
+        Number of times a job is tried before it is marked as failed
+
+    Methods
+    -------
+    submit(problem, times, job_id)
+        Add a job (if no job with the same id exists) and return its id
+    claim(worker)
+        Mark the oldest pending (or expired) job as running and return it
+    complete(job_id, response, worker), fail(job_id, error, worker)
+        Store the result of a job. If worker is given, the result is only stored while the worker holds the lease.
+    status(job_id), result(job_id), wait(job_id)
+        Query a job
+    counts()
+        Return the number of jobs per status
+    run_worker(config), run_workers(config, workers)
+        Process jobs in the current process or in a pool of worker processes
+    """
+
+    def __init__(self, path, lease=60.0, max_attempts=3):
+        self.path = path
+        self.lease = lease
+        self.max_attempts = max_attempts
+        with self._connect() as connection:
+            connection.executescript(SCHEMA)
+
+    def _connect(self):
+        connection = sqlite3.connect(self.path, timeout=60, isolation_level=None)
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=NORMAL")
+        return closing(connection)
+
+    def submit(self, problem, times=1, job_id=None):
+        """Add a job to the queue.
+
+        Parameters
+        ----------
+        problem: Problem
+            The Qubo or Ising that is solved, with platform, solver and parameters set
+        times: int
+            Number of samples
+        job_id: str
+            Id of the job. By default a hash of the job is used.
+
+        Returns
+        -------
+        job_id: str
+        """
+        kind, data, settings = serialize_problem(problem)
+        if job_id is None:
+            digest = hashlib.sha256(kind.encode())
+            for part in (data, settings.encode(), str(times).encode()):
+                digest.update(part)
+            job_id = digest.hexdigest()
+        with self._connect() as connection:
+            connection.execute("INSERT OR IGNORE INTO jobs (id, kind, problem, settings, times, status, created) "
+                               "VALUES (?, ?, ?, ?, ?, 'pending', ?)",
+                               (job_id, kind, data, settings, times, time.time()))
+        return job_id
+
+    def claim(self, worker):
+        """Mark the oldest pending job (or running job with an expired lease) as running by worker.
+
+        Returns
+        -------
+        tuple or None
+            (job_id, kind, problem, settings, times) or None if there is no job
+        """
+        with self._connect() as connection:
+            connection.execute("BEGIN IMMEDIATE")
+            try:
+                row = connection.execute(
+                    "SELECT id, kind, problem, settings, times FROM jobs WHERE status = 'pending' "
+                    "OR (status = 'running' AND heartbeat < ?) ORDER BY created LIMIT 1",
+                    (time.time() - self.lease,)).fetchone()
+                if row is not None:
+                    connection.execute("UPDATE jobs SET status = 'running', worker = ?, heartbeat = ?, "
+                                       "attempts = attempts + 1 WHERE id = ?", (worker, time.time(), row[0]))
+                connection.execute("COMMIT")
+            except BaseException:
+                connection.execute("ROLLBACK")
+                raise
+        return row
+
+    def heartbeat(self, job_id, worker):
+        with self._connect() as connection:
+            connection.execute("UPDATE jobs SET heartbeat = ? WHERE id = ? AND worker = ? AND status = 'running'",
+                               (time.time(), job_id, worker))
+
+    @staticmethod
+    def _lease_condition(job_id, worker):
+        """WHERE clause (and its parameters) that matches a job, and only while worker holds its lease if worker is
+        given. A worker whose lease expired and whose job was claimed again can not overwrite the job. """
+        if worker is None:
+            return "id = ?", (job_id,)
+        return "id = ? AND worker = ? AND status = 'running'", (job_id, worker)
+
+    def complete(self, job_id, response, worker=None):
+        """Store the response of a job and mark it as done. Returns False if worker no longer holds the lease. """
+        serialized = json.dumps(response.sampleset.to_serializable(use_bytes=False))
+        condition, parameters = self._lease_condition(job_id, worker)
+        with self._connect() as connection:
+            cursor = connection.execute("UPDATE jobs SET status = 'done', response = ?, error = NULL, finished = ? "
+                                        "WHERE " + condition, (serialized, time.time()) + parameters)
+        return cursor.rowcount > 0
+
+    def fail(self, job_id, error, worker=None):
+        """Record an error. The job is tried again unless it already used max_attempts attempts. Returns False if
+        worker no longer holds the lease. """
+        condition, parameters = self._lease_condition(job_id, worker)
+        with self._connect() as connection:
+            cursor = connection.execute("UPDATE jobs SET status = CASE WHEN attempts >= ? THEN 'failed' "
+                                        "ELSE 'pending' END, error = ?, finished = ? WHERE " + condition,
+                                        (self.max_attempts, repr(error), time.time()) + parameters)
+        return cursor.rowcount > 0
+
+    def retry_failed(self):
+        """Set all failed jobs back to pending. """
+        with self._connect() as connection:
+            connection.execute("UPDATE jobs SET status = 'pending', attempts = 0 WHERE status = 'failed'")
+
+    def status(self, job_id):
+        """Return the status ("pending", "running", "done" or "failed") of a job or None if the job does not exist. """
+        with self._connect() as connection:
+            row = connection.execute("SELECT status FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return row[0] if row is not None else None
+
+    def error(self, job_id):
+        with self._connect() as connection:
+            row = connection.execute("SELECT error FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return row[0] if row is not None else None
+
+    def result(self, job_id):
+        """Return the Response of a finished job or None if the job is not done. """
+        with self._connect() as connection:
+            row = connection.execute("SELECT response FROM jobs WHERE id = ? AND status = 'done'",
+                                     (job_id,)).fetchone()
+        if row is None:
+            return None
+        response = Response(sampleset_from_serializable(decode_reply(row[0])))
+        if "timing" in response.sampleset.info:
+            response.timing = response.sampleset.info["timing"]
+        return response
+
+    def wait(self, job_id, poll=1.0, timeout=None):
+        """Block until a job is done or failed and return its Response (None if it failed). """
+        start = time.time()
+        while self.status(job_id) not in ("done", "failed"):
+            if timeout is not None and time.time() - start > timeout:
+                raise TimeoutError(f"Job {job_id} did not finish within {timeout} seconds")
+            time.sleep(poll)
+        return self.result(job_id)
+
+    def counts(self):
+        """Return a dictionary with the number of jobs per status. """
+        with self._connect() as connection:
+            return dict(connection.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall())
+
+    def run_worker(self, config, worker=None, stop_when_empty=True, poll=1.0):
+        """Claim and solve jobs in the current process.
+
+        Parameters
+        ----------
+        config
+            Config that is used to connect to the server
+        worker: str
+            Name of the worker (default: process id)
+        stop_when_empty: bool
+            Return when no job is left to claim. Otherwise the worker polls for new jobs.
+        poll: float
+            Seconds between two polls
+
+        Returns
+        -------
+        int
+            Number of jobs the worker processed
+        """
+        worker = worker if worker is not None else f"worker-{multiprocessing.current_process().pid}"
+        processed = 0
+        while True:
+            job = self.claim(worker)
+            if job is None:
+                if stop_when_empty and not self.counts().get("running"):
+                    return processed
+                time.sleep(poll)
+                continue
+            job_id, kind, data, settings, times = job
+
+            # renew the lease while the job is solved
+            stop = threading.Event()
+
+            def beat():
+                while not stop.wait(self.lease / 3):
+                    self.heartbeat(job_id, worker)
+
+            beater = threading.Thread(target=beat, daemon=True)
+            beater.start()
+            try:
+                problem = deserialize_problem(config, kind, data, settings)
+                self.complete(job_id, problem.solve(times), worker)
+            except Exception as error:
+                self.fail(job_id, error, worker)
+            finally:
+                stop.set()
+                beater.join()
+            processed += 1
+
+    def run_workers(self, config, workers=4, stop_when_empty=True, poll=1.0):
+        """Solve the jobs with a pool of worker processes and wait until they finish. Returns the number of processed
+        jobs. """
+        with multiprocessing.Pool(workers) as pool:
+            results = [pool.apply_async(_run_worker, (self.path, self.lease, self.max_attempts, config,
+                                                      f"worker-{index}", stop_when_empty, poll))
+                       for index in range(workers)]
+            return sum(result.get() for result in results)
+
+
+def _run_worker(path, lease, max_attempts, config, worker, stop_when_empty, poll):
+    return JobQueue(path, lease, max_attempts).run_worker(config, worker, stop_when_empty, poll)
+
@@ -0,0 +1,250 @@
+import os
+import json
+import mmap
+import zipfile
+import warnings
+import numpy as np
+import dimod
+
+# File extensions and the format they are read with
+FORMATS = {
+    ".json": "json",
+    ".qubo": "qbsolv",
+    ".coo": "coo",
+    ".txt": "coo",
+    ".npz": "npz",
+}
+
+# Number of bytes of a text file that are parsed at once
+LOAD_CHUNK_SIZE = 64 * 2 ** 20
+
+
+def _problem_from_arrays(config, vartype, linear, row, col, quadratic, variables=None, offset=0.0):
+    from .Problem import Qubo, Ising
+
+    cls = Ising if vartype is dimod.SPIN else Qubo
+    return cls.from_arrays(config, linear, (row, col, quadratic), variables, offset)
+
+
+def _coo_problem(config, vartype, i, j, value, num_variables=0):
+    """Create a problem from (i, j, value) triplets with integer indices, entries with i == j are linear biases. """
+    num_variables = max(num_variables, int(max(i.max(), j.max())) + 1 if len(i) else 0)
+    diagonal = i == j
+    linear = np.bincount(i[diagonal], value[diagonal], minlength=num_variables)
+    off_diagonal = ~diagonal
+    return _problem_from_arrays(config, vartype, linear, i[off_diagonal], j[off_diagonal], value[off_diagonal])
+
+
+def _strip_comments(chunk, comments):
+    """Cut every line at the first comment prefix: the text from the prefix to the end of the line is removed, so a
+    line that starts with a prefix (after optional spaces) becomes empty and the values before a trailing comment are
+    kept. The prefixes never occur in numbers, so the chunk is only searched for them instead of being split into
+    lines. """
+    pieces, start = [], 0
+    hits = {prefix: chunk.find(prefix) for prefix in comments}
+    while True:
+        hits = {prefix: hit if hit >= start or hit == -1 else chunk.find(prefix, start) for prefix, hit in hits.items()}
+        found = [hit for hit in hits.values() if hit != -1]
+        if not found:
+            break
+        hit = min(found)
+        line_end = chunk.find(b"\n", hit)
+        pieces.append(chunk[start:hit])
+        # the line break is kept, it separates the values before the comment from the next line
+        start = len(chunk) if line_end == -1 else line_end
+    if not pieces:
+        return chunk
+    pieces.append(chunk[start:])
+    return b"".join(pieces)
+
+
+def read_triplets(path, comments=(b"#", b"c", b"p"), chunk_size=LOAD_CHUNK_SIZE):
+    """Read a text file with one "i j value" triplet per line.
+
+    The file is memory mapped and parsed in chunks of chunk_size bytes (cut at line ends) with NumPy, so besides the
+    result only one chunk is held in memory. Everything from a comment prefix to the end of its line is ignored, lines
+    that start with a prefix are skipped.
+
+    Returns
+    -------
+    i, j: numpy.ndarray
+        Indices (int64)
+    value: numpy.ndarray
+        Values (float64)
+    """
+    rows, cols, values = [], [], []
+    with open(path, "rb") as file:
+        size = os.fstat(file.fileno()).st_size
+        data = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) if size else b""
+        try:
+            start = 0
+            while start < size:
+                stop = data.find(b"\n", min(start + chunk_size, size) - 1)
+                stop = size if stop == -1 else stop + 1
+                chunk = data[start:stop]
+                chunk = _strip_comments(chunk, comments)
+                # NumPy reads a chunk of only whitespace (e.g. only comments) as a number
+                if chunk.isspace() or not chunk:
+                    start = stop
+                    continue
+                with warnings.catch_warnings():
+                    warnings.simplefilter("error")
+                    try:
+                        numbers = np.fromstring(chunk, dtype=np.float64, sep=" ")
+                    except (ValueError, DeprecationWarning):
+                        raise ValueError(f"{path} contains a line that is not an 'i j value' triplet "
+                                         f"(bytes {start}-{stop})") from None
+                if len(numbers) % 3:
+                    raise ValueError(f"{path} contains a line that is not an 'i j value' triplet "
+                                     f"(bytes {start}-{stop})")
+                triplets = numbers.reshape(-1, 3)
+                rows.append(triplets[:, 0].astype(np.int64))
+                cols.append(triplets[:, 1].astype(np.int64))
+                values.append(np.ascontiguousarray(triplets[:, 2]))
+                del numbers, triplets, chunk
+                start = stop
+        finally:
+            if size:
+                data.close()
+    if not rows:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64), np.zeros(0)
+    return np.concatenate(rows), np.concatenate(cols), np.concatenate(values)
+
+
+def read_npz(path):
+    """Return the arrays of an .npz file as a dictionary. Arrays that are stored uncompressed (np.savez) are memory
+    mapped, compressed arrays (np.savez_compressed) are read. """
+    arrays = {}
+    with zipfile.ZipFile(path) as archive, open(path, "rb") as file:
+        for member in archive.infolist():
+            if not member.filename.endswith(".npy"):
+                continue
+            name = member.filename[:-4]
+            if member.compress_type != zipfile.ZIP_STORED:
+                with archive.open(member) as npy:
+                    arrays[name] = np.lib.format.read_array(npy)
+                continue
+            # skip the local file header of the member and the header of the .npy file
+            file.seek(member.header_offset + 26)
+            name_length, extra_length = np.frombuffer(file.read(4), dtype="<u2")
+            file.seek(member.header_offset + 30 + int(name_length) + int(extra_length))
+            version = np.lib.format.read_magic(file)
+            read_header = np.lib.format.read_array_header_1_0 if version == (1, 0) \
+                else np.lib.format.read_array_header_2_0
+            shape, fortran_order, dtype = read_header(file)
+            if dtype.hasobject or not shape or 0 in shape:
+                with archive.open(member) as npy:
+                    arrays[name] = np.lib.format.read_array(npy)
+                continue
+            arrays[name] = np.memmap(path, dtype=dtype, mode="r", offset=file.tell(), shape=shape,
+                                     order="F" if fortran_order else "C")
+    return arrays
+
+
+def load_json(path, config=None):
+    """Read a problem from a JSON file.
+
+    A QUBO is stored as {"type": "qubo", "terms": [[u, v, bias], ...]} (terms with u == v are linear biases), an Ising
+    as {"type": "ising", "linear": [[u, h], ...], "quadratic": [[u, v, J], ...]}. The labels can be any JSON values,
+    lists are turned into tuples. An optional entry "offset" sets the energy offset.
+    """
+    from .Problem import Qubo, Ising
+
+    with open(path) as file:
+        data = json.load(file)
+
+    def label(value):
+        return tuple(label(item) for item in value) if isinstance(value, list) else value
+
+    if data.get("type", "qubo").lower() == "ising":
+        problem = Ising(config, {label(u): h for u, h in data.get("linear", [])},
+                        {(label(u), label(v)): bias for u, v, bias in data.get("quadratic", [])})
+    else:
+        problem = Qubo(config, {(label(u), label(v)): bias for u, v, bias in data.get("terms", [])})
+    problem.offset = float(data.get("offset", 0.0))
+    return problem
+
+
+def load_coo(path, config=None, vartype=dimod.BINARY, chunk_size=LOAD_CHUNK_SIZE):
+    """Read a problem from a text file with one "i j value" triplet per line (integer indices, lines starting with "#"
+    or "c" are comments). Triplets with i == j are linear biases. The file is parsed in chunks (see read_triplets). """
+    return _coo_problem(config, vartype, *read_triplets(path, chunk_size=chunk_size))
+
+
+def load_qbsolv(path, config=None, chunk_size=LOAD_CHUNK_SIZE):
+    """Read a QUBO in the qbsolv .qubo format: comment lines start with "c", the program line
+    "p qubo 0 maxNodes nNodes nCouplers" is followed by the diagonal entries "i i value" and the couplers
+    "i j value". The file is parsed in chunks (see read_triplets). """
+    num_variables = 0
+    with open(path, "rb") as file:
+        for line in file:
+            if line.startswith(b"p"):
+                num_variables = int(line.split()[3])
+                break
+            if not line.startswith(b"c"):
+                break
+    return _coo_problem(config, dimod.BINARY, *read_triplets(path, chunk_size=chunk_size),
+                        num_variables=num_variables)
+
+
+def load_npz(path, config=None, vartype=None):
+    """Read a problem from an .npz file. Uncompressed arrays are memory mapped (see read_npz).
+
+    Two layouts are supported: the arrays "linear", "row", "col", "quadratic" and optionally "offset", "variables" and
+    "vartype" ("BINARY" or "SPIN") as used by Problem.to_arrays, or a scipy.sparse matrix saved with
+    scipy.sparse.save_npz (QUBO matrix in COO, CSR or CSC format, diagonal entries are linear biases).
+    """
+    arrays = read_npz(path)
+    if vartype is None:
+        vartype = dimod.SPIN if "vartype" in arrays and str(arrays["vartype"]) == "SPIN" else dimod.BINARY
+
+    if "linear" in arrays:
+        variables = arrays["variables"].tolist() if "variables" in arrays else None
+        offset = float(arrays["offset"]) if "offset" in arrays else 0.0
+        return _problem_from_arrays(config, vartype, arrays["linear"], arrays["row"], arrays["col"],
+                                    arrays["quadratic"], variables, offset)
+
+    if "format" not in arrays:
+        raise ValueError(f"{path} contains neither a problem (linear, row, col, quadratic) nor a scipy.sparse matrix")
+    matrix_format = arrays["format"].tolist()
+    matrix_format = matrix_format.decode() if isinstance(matrix_format, bytes) else matrix_format
+    shape = tuple(int(n) for n in arrays["shape"])
+    if matrix_format == "coo":
+        i, j = arrays["row"], arrays["col"]
+    elif matrix_format in ("csr", "csc"):
+        indptr, indices = arrays["indptr"], arrays["indices"]
+        major = np.repeat(np.arange(len(indptr) - 1, dtype=np.int64), np.diff(indptr))
+        i, j = (major, indices) if matrix_format == "csr" else (indices, major)
+    else:
+        raise ValueError(f"Unsupported scipy.sparse format '{matrix_format}' in {path}")
+    return _coo_problem(config, vartype, np.asarray(i, dtype=np.int64), np.asarray(j, dtype=np.int64),
+                        np.asarray(arrays["data"], dtype=np.float64), num_variables=max(shape))
+
+
+def load_problem(path, config=None, vartype=None):
+    """Read a problem file, the format is chosen by the extension (see FORMATS).
+
+    Parameters
+    ----------
+    path
+        Path of the problem file
+    config
+        The config object that is passed to the problem
+    vartype
+        dimod.BINARY or dimod.SPIN for formats that do not contain the variable type (COO and NPZ, default BINARY)
+
+    Returns
+    -------
+    Qubo or Ising
+    """
+    extension = os.path.splitext(path)[1].lower()
+    file_format = FORMATS.get(extension)
+    if file_format == "json":
+        return load_json(path, config)
+    if file_format == "qbsolv":
+        return load_qbsolv(path, config)
+    if file_format == "coo":
+        return load_coo(path, config, vartype if vartype is not None else dimod.BINARY)
+    if file_format == "npz":
+        return load_npz(path, config, vartype)
+    raise ValueError(f"Unknown problem file format '{extension}'. Known formats are {sorted(FORMATS)}")
@@ -0,0 +1,384 @@
+import os
+import time
+import numpy as np
+import dimod
+from concurrent.futures import ProcessPoolExecutor
+
+# Vectorised local search on a sparse problem. All functions work on a whole matrix of samples at once (one row per
+# sample, one column per variable) and on the array form returned by Problem.to_arrays().
+
+# Differences in energy above -EPSILON are not considered an improvement
+EPSILON = 1e-9
+
+# number of samples whose local fields are computed at once
+FIELD_CHUNK_SIZE = 4096
+
+# number of (sample, quadratic term) products that are held in memory at once
+FIELD_CHUNK_ENTRIES = 2 ** 22
+
+
+def adjacency(num_variables, row, col, quadratic):
+    """Return the symmetric quadratic part of a problem in CSR format (indptr, indices, data). """
+    targets = np.concatenate([row, col])
+    sources = np.concatenate([col, row])
+    data = np.concatenate([quadratic, quadratic]).astype(np.float64)
+    order = np.argsort(targets, kind="stable")
+    indptr = np.zeros(num_variables + 1, dtype=np.int64)
+    np.cumsum(np.bincount(targets, minlength=num_variables), out=indptr[1:])
+    return indptr, sources[order].astype(np.int64), data[order]
+
+
+def _chunk_sizes(num_entries):
+    """Return the number of samples and of terms per chunk, so that a chunk has at most FIELD_CHUNK_ENTRIES
+    products. """
+    rows = max(1, min(FIELD_CHUNK_SIZE, FIELD_CHUNK_ENTRIES // max(num_entries, 1)))
+    return rows, max(1, FIELD_CHUNK_ENTRIES // rows)
+
+
+def energies(samples, linear, row, col, quadratic, offset=0.0):
+    """Return the energy of every sample. """
+    samples = np.asarray(samples, dtype=np.float64)
+    result = samples @ linear + offset
+    rows, terms = _chunk_sizes(len(quadratic))
+    for start in range(0, len(samples), rows):
+        chunk = samples[start:start + rows]
+        for first in range(0, len(quadratic), terms):
+            last = first + terms
+            products = chunk[:, row[first:last]] * chunk[:, col[first:last]]
+            result[start:start + rows] += products @ quadratic[first:last]
+    return result
+
+
+def local_fields(samples, csr):
+    """Return the matrix samples @ J, where J is the symmetric quadratic part of the problem given as CSR arrays. The
+    variables are processed in blocks of about FIELD_CHUNK_ENTRIES / (samples per chunk) entries. """
+    indptr, indices, data = csr
+    num_variables = len(indptr) - 1
+    fields = np.zeros((len(samples), num_variables))
+    nonempty = np.flatnonzero(np.diff(indptr))
+    if len(nonempty) == 0:
+        return fields
+    rows, terms = _chunk_sizes(len(indices))
+    # consecutive variables whose entries start in the same window of terms entries form a block
+    window = (indptr[nonempty] - indptr[nonempty[0]]) // terms
+    blocks = np.split(nonempty, np.flatnonzero(np.diff(window)) + 1)
+    for start in range(0, len(samples), rows):
+        chunk = np.asarray(samples[start:start + rows], dtype=np.float64)
+        for block in blocks:
+            first, last = indptr[block[0]], indptr[block[-1] + 1]
+            fields[start:start + rows, block] = np.add.reduceat(chunk[:, indices[first:last]] * data[first:last],
+                                                                indptr[block] - first, axis=1)
+    return fields
+
+
+def flip_changes(samples, vartype):
+    """Return by how much every variable changes if it is flipped (1 - 2x for BINARY, -2s for SPIN). """
+    if vartype is dimod.SPIN:
+        return -2.0 * samples
+    return 1.0 - 2.0 * samples
+
+
+def update_fields(fields, sample_indices, variable_indices, changes, csr):
+    """Update the local fields after variable_indices[k] of sample sample_indices[k] changed by changes[k]. Every sample
+    must occur at most once. """
+    indptr, indices, data = csr
+    lengths = indptr[variable_indices + 1] - indptr[variable_indices]
+    total = lengths.sum()
+    if total == 0:
+        return
+    ends = np.cumsum(lengths)
+    positions = np.arange(total) - np.repeat(ends - lengths, lengths) + np.repeat(indptr[variable_indices], lengths)
+    fields[np.repeat(sample_indices, lengths), indices[positions]] += np.repeat(changes, lengths) * data[positions]
+
+
+def steepest_descent(samples, linear, csr, vartype, max_iter=None):
+    """Flip the variable with the largest decrease of energy in every sample until no single flip improves a sample.
+
+    Returns
+    -------
+    samples: numpy.ndarray
+        The improved samples
+    flips: numpy.ndarray
+        Number of flipped variables per sample
+    """
+    samples = np.array(samples, dtype=np.int8)
+    fields = local_fields(samples, csr)
+    flips = np.zeros(len(samples), dtype=np.int64)
+    active = np.arange(len(samples))
+    iteration = 0
+    while len(active) and (max_iter is None or iteration < max_iter):
+        changes = flip_changes(samples[active], vartype)
+        deltas = changes * (linear + fields[active])
+        best = np.argmin(deltas, axis=1)
+        improving = deltas[np.arange(len(active)), best] < -EPSILON
+        active, best = active[improving], best[improving]
+        change = changes[improving, best]
+        samples[active, best] += change.astype(np.int8)
+        update_fields(fields, active, best, change, csr)
+        flips[active] += 1
+        iteration += 1
+    return samples, flips
+
+
+def greedy_descent(samples, linear, csr, vartype, max_iter=None):
+    """Sweep over the variables and flip every variable that decreases the energy, until a sweep does not change any
+    sample. The sweeps are vectorised over all samples.
+
+    Returns
+    -------
+    samples: numpy.ndarray
+        The improved samples
+    flips: numpy.ndarray
+        Number of flipped variables per sample
+    """
+    indptr, indices, data = csr
+    samples = np.array(samples, dtype=np.int8)
+    fields = local_fields(samples, csr)
+    flips = np.zeros(len(samples), dtype=np.int64)
+    iteration = 0
+    changed = True
+    while changed and (max_iter is None or iteration < max_iter):
+        changed = False
+        for variable in range(samples.shape[1]):
+            change = flip_changes(samples[:, variable], vartype)
+            improving = np.flatnonzero(change * (linear[variable] + fields[:, variable]) < -EPSILON)
+            if len(improving) == 0:
+                continue
+            changed = True
+            samples[improving, variable] += change[improving].astype(np.int8)
+            neighbours = indices[indptr[variable]:indptr[variable + 1]]
+            weights = data[indptr[variable]:indptr[variable + 1]]
+            fields[np.ix_(improving, neighbours)] += np.outer(change[improving], weights)
+            flips[improving] += 1
+        iteration += 1
+    return samples, flips
+
+
+DESCENT_METHODS = {
+    "steepest_descent": steepest_descent,
+    "greedy_descent": greedy_descent,
+}
+
+
+def _descend_chunk(method, samples, linear, csr, vartype, max_iter):
+    return DESCENT_METHODS[method](samples, linear, csr, vartype, max_iter)
+
+
+def descend(samples, linear, csr, vartype, method="steepest_descent", workers=None, max_iter=None):
+    """Run a descent method on all samples. If workers is larger than 1, the samples are split into one chunk per
+    worker and the chunks are processed in parallel processes.
+
+    Returns
+    -------
+    samples: numpy.ndarray
+        The improved samples
+    flips: numpy.ndarray
+        Number of flipped variables per sample
+    """
+    if method not in DESCENT_METHODS:
+        raise ValueError(f"Unknown method '{method}'. Valid methods are {list(DESCENT_METHODS)}")
+    if workers is None or workers <= 1 or len(samples) < 2:
+        return DESCENT_METHODS[method](samples, linear, csr, vartype, max_iter)
+
+    chunks = np.array_split(np.asarray(samples), min(workers, len(samples)))
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        results = list(executor.map(_descend_chunk, [method] * len(chunks), chunks, [linear] * len(chunks),
+                                    [csr] * len(chunks), [vartype] * len(chunks), [max_iter] * len(chunks)))
+    return np.concatenate([r[0] for r in results]), np.concatenate([r[1] for r in results])
+
+
+# --------------------------- Local solver platform --------------------------- #
+
+def temperature_schedule(number_iterations, temperature_start=1000.0, temperature_end=1.0, temperature_mode=0,
+                         temperature_decay=0.001, temperature_interval=100):
+    """Return the temperature of every iteration. The parameters follow the Fujitsu annealing parameters: the
+    temperature is reduced every temperature_interval iterations by the factor (1-temperature_decay) (mode 0),
+    (1-temperature_decay*T) (mode 1) or (1-temperature_decay*T^2) (mode 2). If temperature_end is not None and mode
+    is 0, the decay is chosen such that the last temperature equals temperature_end. """
+    steps = max(1, -(-number_iterations // temperature_interval))
+    if temperature_end is not None and temperature_mode == 0 and steps > 1:
+        temperature_decay = 1.0 - (temperature_end / temperature_start) ** (1.0 / (steps - 1))
+
+    temperatures = np.empty(steps)
+    temperature = temperature_start
+    for step in range(steps):
+        temperatures[step] = temperature
+        if temperature_mode == 0:
+            temperature *= 1.0 - temperature_decay
+        elif temperature_mode == 1:
+            temperature *= 1.0 - temperature_decay * temperature
+        elif temperature_mode == 2:
+            temperature *= 1.0 - temperature_decay * temperature ** 2
+        else:
+            raise ValueError(f"Invalid temperature_mode {temperature_mode}. Valid modes are 0, 1 and 2")
+        temperature = max(temperature, 1e-12)
+    return np.repeat(temperatures, temperature_interval)[:number_iterations]
+
+
+def initial_samples(num_reads, num_variables, vartype, rng, guidance=None):
+    """Return random samples, or copies of the guidance sample if one is given. """
+    if guidance is not None:
+        return np.tile(np.asarray(guidance, dtype=np.int8), (num_reads, 1))
+    samples = rng.integers(0, 2, (num_reads, num_variables), dtype=np.int8)
+    if vartype is dimod.SPIN:
+        samples = 2 * samples - 1
+    return samples
+
+
+def simulated_annealing(num_reads, linear, csr, vartype, temperatures, rng, guidance=None):
+    """Metropolis simulated annealing. In every iteration each read proposes to flip one random variable, the reads are
+    processed as one matrix. The best sample seen by every read is returned. """
+    num_variables = len(linear)
+    samples = initial_samples(num_reads, num_variables, vartype, rng, guidance)
+    fields = local_fields(samples, csr)
+    current = samples @ linear.astype(np.float64) + 0.5 * np.einsum("ij,ij->i", samples, fields)
+    best_samples, best = samples.copy(), current.copy()
+    reads = np.arange(num_reads)
+
+    for temperature in temperatures:
+        variables = rng.integers(0, num_variables, num_reads)
+        changes = flip_changes(samples[reads, variables], vartype)
+        deltas = changes * (linear[variables] + fields[reads, variables])
+        with np.errstate(over="ignore"):
+            accepted = (deltas <= 0) | (rng.random(num_reads) < np.exp(-deltas / temperature))
+        accepted_reads, accepted_variables = reads[accepted], variables[accepted]
+        samples[accepted_reads, accepted_variables] += changes[accepted].astype(np.int8)
+        update_fields(fields, accepted_reads, accepted_variables, changes[accepted], csr)
+        current[accepted_reads] += deltas[accepted]
+
+        improved = np.flatnonzero(current < best - EPSILON)
+        if len(improved):
+            best[improved] = current[improved]
+            best_samples[improved] = samples[improved]
+    return best_samples
+
+
+def tabu_search(num_reads, linear, csr, vartype, number_iterations, tenure, rng, guidance=None):
+    """Tabu search. In every iteration each read flips the best variable that is not tabu (or that leads to a new best
+    sample of the read), the flipped variable stays tabu for tenure iterations. The best sample seen by every read is
+    returned. """
+    num_variables = len(linear)
+    samples = initial_samples(num_reads, num_variables, vartype, rng, guidance)
+    fields = local_fields(samples, csr)
+    current = samples @ linear.astype(np.float64) + 0.5 * np.einsum("ij,ij->i", samples, fields)
+    best_samples, best = samples.copy(), current.copy()
+    tabu_until = np.zeros((num_reads, num_variables), dtype=np.int64)
+    reads = np.arange(num_reads)
+
+    for iteration in range(number_iterations):
+        changes = flip_changes(samples, vartype)
+        deltas = changes * (linear + fields)
+        allowed = (tabu_until <= iteration) | (current[:, None] + deltas < best[:, None] - EPSILON)
+        deltas[~allowed] = np.inf
+        variables = np.argmin(deltas, axis=1)
+        movable = np.isfinite(deltas[reads, variables])
+        moving_reads, moving_variables = reads[movable], variables[movable]
+        change = changes[moving_reads, moving_variables]
+        samples[moving_reads, moving_variables] += change.astype(np.int8)
+        update_fields(fields, moving_reads, moving_variables, change, csr)
+        current[moving_reads] += deltas[moving_reads, moving_variables]
+        tabu_until[moving_reads, moving_variables] = iteration + tenure
+
+        improved = np.flatnonzero(current < best - EPSILON)
+        if len(improved):
+            best[improved] = current[improved]
+            best_samples[improved] = samples[improved]
+    return best_samples
+
+
+def _solve_chunk(method, num_reads, linear, csr, vartype, params, seed, guidance):
+    rng = np.random.default_rng(seed)
+    if method == "tabu":
+        return tabu_search(num_reads, linear, csr, vartype, params["number_iterations"], params["tenure"], rng,
+                           guidance)
+    temperatures = temperature_schedule(params["number_iterations"], params["temperature_start"],
+                                        params["temperature_end"], params["temperature_mode"],
+                                        params["temperature_decay"], params["temperature_interval"])
+    return simulated_annealing(num_reads, linear, csr, vartype, temperatures, rng, guidance)
+
+
+LOCAL_PARAMS = ["optimization_method", "number_iterations", "temperature_start", "temperature_end",
+                "temperature_mode", "temperature_decay", "temperature_interval", "guidance_config", "initial_state",
+                "tenure", "seed", "workers"]
+
+
+def solve(problem, times=1):
+    """Solve a Qubo or Ising in the current process (platform "local").
+
+    The following keys of problem.solver_params are used, all other keys are ignored:
+        optimization_method: "annealing" (default) or "tabu"
+        number_iterations: number of iterations per run (one flip proposal per run and iteration)
+        temperature_start, temperature_end, temperature_mode, temperature_decay, temperature_interval: annealing
+            schedule, see the Fujitsu examples
+        guidance_config: dictionary with an initial value for every variable (initial_state is used likewise)
+        tenure: number of iterations a flipped variable stays tabu
+        seed: seed of the random number generator
+        workers: number of processes the runs are distributed to
+
+    Parameters
+    ----------
+    problem: Problem
+        The Qubo or Ising that is solved
+    times: int
+        Number of independent runs
+
+    Returns
+    -------
+    LocalResponse
+        The distinct samples of all runs sorted by energy
+    """
+    from .Response import LocalResponse
+
+    start_time = time.perf_counter()
+    variables, linear, (row, col, quadratic), offset = problem.to_arrays()
+    num_variables = len(variables)
+    given = problem.solver_params
+    params = {
+        "optimization_method": given.get("optimization_method", "annealing"),
+        "number_iterations": given.get("number_iterations", max(1000, 100 * num_variables)),
+        "temperature_start": given.get("temperature_start", None),
+        "temperature_end": given.get("temperature_end", None),
+        "temperature_mode": given.get("temperature_mode", 0),
+        "temperature_decay": given.get("temperature_decay", 0.001),
+        "temperature_interval": given.get("temperature_interval", 1),
+        "tenure": given.get("tenure", max(1, min(20, num_variables // 4))),
+    }
+    if params["optimization_method"] not in ("annealing", "tabu"):
+        raise ValueError(f"Invalid optimization_method '{params['optimization_method']}' for the local platform. "
+                         f"Valid methods are 'annealing' and 'tabu'")
+    # by default the temperatures are derived from the biases: start where the largest flip is likely accepted, end
+    # where the smallest flip is unlikely to be accepted
+    magnitudes = np.abs(np.concatenate([linear, quadratic]))
+    magnitudes = magnitudes[magnitudes > 0]
+    if params["temperature_start"] is None:
+        params["temperature_start"] = 2.0 * magnitudes.max() if len(magnitudes) else 1.0
+    if params["temperature_end"] is None and "temperature_decay" not in given:
+        params["temperature_end"] = 0.05 * magnitudes.min() if len(magnitudes) else 1e-3
+
+    guidance = None
+    initial_state = given.get("guidance_config", given.get("initial_state"))
+    if initial_state is not None:
+        guidance = [initial_state[v] for v in variables]
+
+    csr = adjacency(num_variables, row, col, quadratic)
+    workers = given.get("workers", min(os.cpu_count() or 1, max(1, times // 16)))
+    chunks = [len(chunk) for chunk in np.array_split(np.arange(times), max(1, min(workers, times)))]
+    seeds = np.random.SeedSequence(given.get("seed")).spawn(len(chunks))
+    arguments = [(params["optimization_method"], size, linear, csr, problem.vartype, params, seed, guidance)
+                 for size, seed in zip(chunks, seeds)]
+    if len(chunks) == 1:
+        results = [_solve_chunk(*arguments[0])]
+    else:
+        with ProcessPoolExecutor(max_workers=len(chunks)) as executor:
+            results = list(executor.map(_solve_chunk, *zip(*arguments)))
+    samples = np.concatenate(results)
+
+    samples, num_occurrences = np.unique(samples, axis=0, return_counts=True)
+    sample_energies = energies(samples, linear, row, col, quadratic, offset)
+    order = np.argsort(sample_energies, kind="stable")
+    run_time = int(1e6 * (time.perf_counter() - start_time))
+    sampleset = dimod.SampleSet.from_samples((samples[order], variables), problem.vartype,
+                                             energy=sample_energies[order], num_occurrences=num_occurrences[order],
+                                             info={"timing": {"run_time": run_time}},
+                                             sort_labels=False)
+    return LocalResponse(sampleset)
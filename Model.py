@@ -0,0 +1,470 @@
+import numbers
+import numpy as np
+import dimod
+
+
+class Expression:
+    """Polynomial of degree at most 2 in the variables of a Model, stored as coordinate arrays. Terms are only
+    accumulated (arrays are concatenated), duplicates are summed up when the model is compiled.
+
+    Expressions support +, -, * (scalars and expressions, as long as the degree stays at most 2), / by a scalar, ** 2
+    and the comparisons ==, <= and >=, which return a Constraint.
+
+    Attributes
+    ----------
+    model
+        The model the variables belong to
+    constant
+        Constant term
+    linear
+        (indices, coefficients) of the linear terms
+    quadratic
+        (row, col, coefficients) of the quadratic terms
+    """
+
+    __hash__ = None
+
+    def __init__(self, model, constant=0.0, linear=None, quadratic=None):
+        self.model = model
+        self.constant = float(constant)
+        self.linear = linear if linear is not None else (np.zeros(0, dtype=np.int64), np.zeros(0))
+        self.quadratic = quadratic if quadratic is not None else \
+            (np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64), np.zeros(0))
+
+    def degree(self):
+        if len(self.quadratic[2]) and np.any(self.quadratic[2]):
+            return 2
+        return 1 if len(self.linear[1]) and np.any(self.linear[1]) else 0
+
+    def _coerce(self, other):
+        if isinstance(other, Expression):
+            return other
+        if isinstance(other, numbers.Number):
+            return Expression(self.model, other)
+        return NotImplemented
+
+    def __add__(self, other):
+        other = self._coerce(other)
+        if other is NotImplemented:
+            return other
+        return Expression(self.model, self.constant + other.constant,
+                          tuple(np.concatenate(pair) for pair in zip(self.linear, other.linear)),
+                          tuple(np.concatenate(pair) for pair in zip(self.quadratic, other.quadratic)))
+
+    __radd__ = __add__
+
+    def __neg__(self):
+        return self * -1
+
+    def __sub__(self, other):
+        other = self._coerce(other)
+        if other is NotImplemented:
+            return other
+        return self + (-other)
+
+    def __rsub__(self, other):
+        return (-self) + other
+
+    def __mul__(self, other):
+        if isinstance(other, numbers.Number):
+            return Expression(self.model, self.constant * other, (self.linear[0], self.linear[1] * other),
+                              (self.quadratic[0], self.quadratic[1], self.quadratic[2] * other))
+        other = self._coerce(other)
+        if other is NotImplemented:
+            return other
+        if self.degree() + other.degree() > 2:
+            raise ValueError("The product of the expressions has a degree larger than 2")
+
+        result = self * other.constant + Expression(self.model, 0.0, (other.linear[0], other.linear[1] * self.constant),
+                                                    (other.quadratic[0], other.quadratic[1],
+                                                     other.quadratic[2] * self.constant))
+        # product of the linear terms
+        row = np.repeat(self.linear[0], len(other.linear[0]))
+        col = np.tile(other.linear[0], len(self.linear[0]))
+        coefficients = np.outer(self.linear[1], other.linear[1]).ravel()
+        return result + Expression(self.model, 0.0, None, (row, col, coefficients))
+
+    __rmul__ = __mul__
+
+    def __truediv__(self, other):
+        return self * (1.0 / other)
+
+    def __pow__(self, exponent):
+        if exponent == 1:
+            return self
+        if exponent == 2:
+            return self * self
+        raise ValueError("Only the exponents 1 and 2 are supported")
+
+    def __eq__(self, other):
+        return Constraint(self - other, "==")
+
+    def __le__(self, other):
+        return Constraint(self - other, "<=")
+
+    def __ge__(self, other):
+        return Constraint(other - self, "<=")
+
+    def bounds(self):
+        """Return a lower and an upper bound of the expression over all assignments of the variables. """
+        low, high = self.model._domain_bounds()
+        index, coefficients = self.linear
+        linear_values = np.stack([coefficients * low[index], coefficients * high[index]])
+        row, col, quadratic = self.quadratic
+        products = np.stack([low[row] * low[col], low[row] * high[col], high[row] * low[col], high[row] * high[col]])
+        quadratic_values = products * quadratic
+        return (self.constant + linear_values.min(axis=0).sum() + quadratic_values.min(axis=0).sum(),
+                self.constant + linear_values.max(axis=0).sum() + quadratic_values.max(axis=0).sum())
+
+    def evaluate(self, values):
+        """Return the value of the expression for every row of values (array of shape (num_samples, num_variables) with
+        the values of all variables of the model in their own domain). """
+        values = np.atleast_2d(values)
+        result = np.full(len(values), self.constant)
+        result += values[:, self.linear[0]] @ self.linear[1]
+        row, col, quadratic = self.quadratic
+        result += (values[:, row] * values[:, col]) @ quadratic
+        return result
+
+    def __repr__(self):
+        labels = self.model.labels
+        terms = [f"{c:g}*{labels[i]}" for i, c in zip(*self.linear)]
+        terms += [f"{c:g}*{labels[i]}*{labels[j]}" for i, j, c in zip(*self.quadratic)]
+        return " + ".join(terms + [f"{self.constant:g}"])
+
+
+class Variable(Expression):
+    """A single binary or spin variable of a Model. """
+
+    def __init__(self, model, index):
+        Expression.__init__(self, model, 0.0, (np.array([index], dtype=np.int64), np.ones(1)))
+        self.index = index
+
+    @property
+    def label(self):
+        return self.model.labels[self.index]
+
+
+class VariableArray:
+    """An n-dimensional array of variables. Indexing returns a Variable or a VariableArray.
+
+    Methods
+    -------
+    sum(axis)
+        Return the sum of the variables (an Expression) or a list of sums along an axis
+    dot(coefficients)
+        Return the weighted sum of the variables
+    """
+
+    def __init__(self, model, indices):
+        self.model = model
+        self.indices = indices
+
+    @property
+    def shape(self):
+        return self.indices.shape
+
+    def __len__(self):
+        return len(self.indices)
+
+    def __getitem__(self, key):
+        indices = self.indices[key]
+        if np.ndim(indices) == 0:
+            return Variable(self.model, int(indices))
+        return VariableArray(self.model, indices)
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    def dot(self, coefficients):
+        coefficients = np.broadcast_to(np.asarray(coefficients, dtype=np.float64), self.shape)
+        return Expression(self.model, 0.0, (self.indices.ravel(), coefficients.ravel().copy()))
+
+    def sum(self, axis=None):
+        if axis is None:
+            return self.dot(1.0)
+        moved = np.moveaxis(self.indices, axis, -1)
+        return [VariableArray(self.model, row).sum() for row in moved.reshape(-1, moved.shape[-1])]
+
+
+class Constraint:
+    """A linear constraint "expression == 0" or "expression <= 0" that is added to the objective as a penalty.
+
+    Attributes
+    ----------
+    expression
+        Left hand side (everything moved to the left)
+    sense
+        "==" or "<="
+    penalty
+        Weight of the penalty penalty * (expression + slack)^2
+    name
+        Name of the constraint
+    slack
+        Expression of the slack variables of an inequality (None for equalities)
+    """
+
+    def __init__(self, expression, sense, penalty=1.0, name=None):
+        self.expression = expression
+        self.sense = sense
+        self.penalty = penalty
+        self.name = name
+        self.slack = None
+
+    def violation(self, values):
+        """Return how much every row of values violates the constraint (0 if it is satisfied). """
+        lhs = self.expression.evaluate(values)
+        return np.abs(lhs) if self.sense == "==" else np.maximum(lhs, 0.0)
+
+    def penalty_expression(self, penalty=None):
+        expression = self.expression if self.slack is None else self.expression + self.slack
+        return (expression ** 2) * (self.penalty if penalty is None else penalty)
+
+    def __repr__(self):
+        return f"Constraint({self.name!r}: {self.expression!r} {self.sense} 0, penalty={self.penalty})"
+
+
+class Model:
+    """Modelling layer for QUBO and Ising problems.
+
+    Variables are created with binary(), spin(), binaries() and spins() and combined to expressions with the usual
+    operators. The objective is set with minimize() or maximize(), linear constraints are added with add_constraint()
+    and become penalties: an equality e == 0 adds penalty * e^2, an inequality e <= 0 adds binary slack variables s
+    (binary encoding of the range of -e, which assumes integer coefficients) and the penalty penalty * (e + s)^2.
+
+    compile() accumulates all terms in coordinate arrays and creates an array-backed Qubo or Ising. Variables of the
+    other type are substituted (s = 2x - 1 or x = (s + 1) / 2). decode() maps the samples of a response back to the
+    named variables.
+
+    Example
+    -------
+        model = Model()
+        x = model.binaries("x", (3, 2))
+        for row in x:
+            model.add_constraint(row.sum() == 1, penalty=2)
+        model.minimize(x.dot([[1, 2], [3, 1], [2, 2]]))
+        qubo = model.compile(config)
+        solutions = model.decode(qubo.solve(10))
+
+    Attributes
+    ----------
+    labels
+        Labels of all variables (a name or a tuple (name, index...))
+    vartypes
+        Variable type of every variable
+    objective
+        The expression that is minimized
+    constraints
+        The constraints
+
+    Methods
+    -------
+    binary(name), spin(name), binaries(name, shape), spins(name, shape)
+        Create variables
+    minimize(expression), maximize(expression)
+        Set the objective
+    add_constraint(constraint, penalty, name)
+        Add a constraint
+    compile(config, vartype, penalties)
+        Return the Qubo or Ising of the model
+    values(response), decode(response)
+        Map the samples of a response back to the variables of the model
+    violations(values), feasible(values), evaluate(values)
+        Check samples against the constraints and compute the objective
+    """
+
+    def __init__(self):
+        self.labels = []
+        self.vartypes = []
+        self.names = {}
+        self.objective = Expression(self)
+        self.constraints = []
+        self.compiled_vartype = None
+
+    def _add_variables(self, name, shape, vartype):
+        if name in self.names:
+            raise ValueError(f"A variable named {name!r} already exists")
+        start = len(self.labels)
+        count = int(np.prod(shape)) if shape is not None else 1
+        if shape is None:
+            # scalar variables store their index, arrays of variables an array of indices
+            indices = start
+            self.labels.append(name)
+        else:
+            indices = np.arange(start, start + count, dtype=np.int64).reshape(shape)
+            self.labels.extend((name,) + index for index in np.ndindex(*shape))
+        self.vartypes.extend([vartype] * count)
+        self.names[name] = (indices, shape)
+        return indices
+
+    def binary(self, name):
+        """Create a binary variable. """
+        return Variable(self, self._add_variables(name, None, dimod.BINARY))
+
+    def spin(self, name):
+        """Create a spin variable. """
+        return Variable(self, self._add_variables(name, None, dimod.SPIN))
+
+    def binaries(self, name, shape):
+        """Create an array of binary variables labeled (name, index...). """
+        shape = (shape,) if isinstance(shape, numbers.Integral) else tuple(shape)
+        return VariableArray(self, self._add_variables(name, shape, dimod.BINARY))
+
+    def spins(self, name, shape):
+        """Create an array of spin variables labeled (name, index...). """
+        shape = (shape,) if isinstance(shape, numbers.Integral) else tuple(shape)
+        return VariableArray(self, self._add_variables(name, shape, dimod.SPIN))
+
+    def _domain_bounds(self):
+        spin = np.array([vartype is dimod.SPIN for vartype in self.vartypes], dtype=bool)
+        return np.where(spin, -1.0, 0.0), np.ones(len(spin))
+
+    def minimize(self, expression):
+        self.objective = expression if isinstance(expression, Expression) else Expression(self, expression)
+        return self
+
+    def maximize(self, expression):
+        return self.minimize(-expression)
+
+    def add_constraint(self, constraint, penalty=1.0, name=None):
+        """Add a linear constraint (created by comparing expressions with ==, <= or >=).
+
+        Parameters
+        ----------
+        constraint: Constraint
+            The constraint
+        penalty: float
+            Weight of the penalty term
+        name: str
+            Name of the constraint, also used for the labels of its slack variables
+
+        Returns
+        -------
+        Constraint
+        """
+        if constraint.expression.degree() > 1:
+            raise ValueError("Only linear constraints are supported")
+        constraint.penalty = penalty
+        constraint.name = name if name is not None else f"c{len(self.constraints)}"
+
+        if constraint.sense == "<=":
+            low, high = constraint.expression.bounds()
+            if low > 0:
+                raise ValueError(f"Constraint {constraint.name!r} can never be satisfied")
+            # slack in [0, -low], binary encoded: 1, 2, 4, ..., rest
+            upper = int(np.floor(-low + 1e-9))
+            if upper > 0:
+                num_bits = int(upper).bit_length()
+                coefficients = 2.0 ** np.arange(num_bits)
+                coefficients[-1] = upper - (2 ** (num_bits - 1) - 1)
+                slack = self.binaries(f"{constraint.name}_slack", num_bits)
+                constraint.slack = slack.dot(coefficients)
+        self.constraints.append(constraint)
+        return constraint
+
+    def terms(self, penalties=None):
+        """Return the constant, linear and quadratic terms of the objective plus all penalties in the domains of the
+        variables. penalties (name -> weight) overrides the penalties of the constraints. """
+        penalties = penalties if penalties is not None else {}
+        expressions = [self.objective] + [constraint.penalty_expression(penalties.get(constraint.name))
+                                          for constraint in self.constraints]
+        constant = sum(expression.constant for expression in expressions)
+        linear = tuple(np.concatenate([expression.linear[k] for expression in expressions]) for k in range(2))
+        quadratic = tuple(np.concatenate([expression.quadratic[k] for expression in expressions]) for k in range(3))
+        return constant, linear, quadratic
+
+    def compile(self, config=None, vartype=dimod.BINARY, penalties=None):
+        """Return the model as an array-backed Qubo (vartype BINARY) or Ising (vartype SPIN) whose variables are labeled
+        with the labels of the model.
+
+        Parameters
+        ----------
+        config
+            The config object that contains the users configuration data
+        vartype
+            dimod.BINARY or dimod.SPIN (or "BINARY" / "SPIN")
+        penalties: dict
+            Penalty weights (constraint name -> weight) that are used instead of the penalties of the constraints
+
+        Returns
+        -------
+        Qubo or Ising
+        """
+        from .Problem import Qubo, Ising
+
+        vartype = dimod.as_vartype(vartype)
+        num_variables = len(self.labels)
+        constant, (index, coefficients), (row, col, quadratic) = self.terms(penalties)
+        spin = np.array([v is dimod.SPIN for v in self.vartypes], dtype=bool)
+
+        # products of a variable with itself: x*x = x, s*s = 1
+        diagonal = row == col
+        square_spin = diagonal & spin[row]
+        constant += quadratic[square_spin].sum()
+        square_binary = diagonal & ~spin[row]
+        index = np.concatenate([index, row[square_binary]])
+        coefficients = np.concatenate([coefficients, quadratic[square_binary]])
+        row, col, quadratic = row[~diagonal], col[~diagonal], quadratic[~diagonal]
+
+        # every variable v is written as scale[v] * y + shift[v] with y of the target type
+        target_spin = vartype is dimod.SPIN
+        scale = np.ones(num_variables)
+        shift = np.zeros(num_variables)
+        if target_spin:
+            scale[~spin], shift[~spin] = 0.5, 0.5
+        else:
+            scale[spin], shift[spin] = 2.0, -1.0
+
+        linear = np.bincount(index, coefficients * scale[index], minlength=num_variables)
+        constant += float(coefficients @ shift[index])
+        linear += np.bincount(row, quadratic * scale[row] * shift[col], minlength=num_variables)
+        linear += np.bincount(col, quadratic * shift[row] * scale[col], minlength=num_variables)
+        constant += float(quadratic @ (shift[row] * shift[col]))
+        quadratic = quadratic * scale[row] * scale[col]
+
+        self.compiled_vartype = vartype
+        cls = Ising if target_spin else Qubo
+        return cls.from_arrays(config, linear, (row, col, quadratic), list(self.labels), constant)
+
+    def values(self, response):
+        """Return the samples of a response as a matrix (num_samples, num_variables) with the values of the variables
+        in their own domain (0/1 for binary and -1/+1 for spin variables). """
+        samples = response.sample_matrix(self.labels).astype(np.int8)
+        if response.sampleset.vartype is dimod.SPIN:
+            binary = np.array([v is dimod.BINARY for v in self.vartypes], dtype=bool)
+            samples[:, binary] = (samples[:, binary] + 1) // 2
+        else:
+            spin = np.array([v is dimod.SPIN for v in self.vartypes], dtype=bool)
+            samples[:, spin] = 2 * samples[:, spin] - 1
+        return samples
+
+    def decode(self, response):
+        """Return a dictionary per sample of a response that maps the name of every variable (without slack variables)
+        to its value, arrays of variables are returned as numpy arrays. """
+        values = self.values(response)
+        slack_names = {f"{constraint.name}_slack" for constraint in self.constraints}
+        solutions = []
+        for row in values:
+            solution = {}
+            for name, (indices, shape) in self.names.items():
+                if name in slack_names:
+                    continue
+                solution[name] = int(row[indices]) if shape is None else row[indices]
+            solutions.append(solution)
+        return solutions
+
+    def violations(self, values):
+        """Return an array (num_samples, num_constraints) with the violation of every constraint by every sample. """
+        values = np.atleast_2d(values)
+        if not self.constraints:
+            return np.zeros((len(values), 0))
+        return np.stack([constraint.violation(values) for constraint in self.constraints], axis=1)
+
+    def feasible(self, values, tolerance=1e-9):
+        """Return a boolean array that is True for every sample that satisfies all constraints. """
+        return np.all(self.violations(values) <= tolerance, axis=1)
+
+    def evaluate(self, values):
+        """Return the objective (without penalties) of every sample. """
+        return self.objective.evaluate(values)
@@ -0,0 +1,176 @@
+import numpy as np
+import dimod
+from dimod.sampleset import SampleSet
+
+
+class PresolveInfo:
+    """Everything that is needed to map the samples of a presolved problem back to the original problem.
+
+    Attributes
+    ----------
+    variables
+        Variable labels of the original problem
+    kept
+        Original labels of the variables of the presolved problem. The presolved problem uses the labels 0..len(kept)-1,
+        label i belongs to kept[i].
+    fixed
+        Dictionary with the original labels and values of the fixed variables
+    offset
+        Energy that has to be added to the energies of the presolved problem
+    vartype
+        Variable type of the problem
+    report
+        Dictionary that describes how much the problem shrank
+
+    Methods
+    -------
+    expand(response)
+        Map the samples of a response to the presolved problem back to the original variables
+    print_report()
+        Print the report
+    """
+
+    def __init__(self, variables, kept, fixed, offset, vartype, report):
+        self.variables = variables
+        self.kept = kept
+        self.fixed = fixed
+        self.offset = offset
+        self.vartype = vartype
+        self.report = report
+
+    def expand(self, response=None):
+        """Return a copy of response whose samples contain all variables of the original problem and whose energies
+        include the energy of the fixed variables. If response is None (all variables were fixed), a Response with the
+        single optimal sample is returned. """
+        from .Response import Response
+
+        fixed_labels = list(self.fixed)
+        fixed_values = np.array([self.fixed[v] for v in fixed_labels], dtype=np.int8)
+        if response is None:
+            sampleset = SampleSet.from_samples((fixed_values[None, :], fixed_labels), self.vartype,
+                                               energy=[self.offset], sort_labels=False)
+            return Response(sampleset)
+
+        reduced = response.sample_matrix(list(range(len(self.kept))))
+        samples = np.hstack([reduced, np.broadcast_to(fixed_values, (len(reduced), len(fixed_values)))])
+        return response.with_samples(samples, list(self.kept) + fixed_labels,
+                                     energies=response.sampleset.record.energy + self.offset)
+
+    def print_report(self):
+        for key, value in self.report.items():
+            print(f"{key}: {value}")
+
+
+def presolve(problem, persistency=True):
+    """Return a smaller problem that has the same optimal solutions as problem (after mapping back). Quadratic terms
+    with a zero coefficient are removed, isolated variables and variables whose optimal value does not depend on the
+    other variables are fixed, and the remaining variables are relabeled to 0..n-1.
+
+    A variable can be fixed, if flipping it away from one value never lowers the energy, no matter which values the
+    other variables have (e.g. a binary variable x_i with h_i + sum of its negative couplings >= 0 can be fixed to 0).
+    Fixed variables are folded into the linear biases of their neighbours and the check is repeated until no further
+    variable can be fixed.
+
+    Parameters
+    ----------
+    problem: Problem
+        The Qubo or Ising that is presolved
+    persistency: bool
+        If False, only zero terms and isolated variables are removed
+
+    Returns
+    -------
+    Problem
+        The presolved problem with the same config, platform, solver and parameters as problem. Its attribute
+        presolve_info (PresolveInfo) is used by solve() to map the samples back to the original variables.
+    """
+    from .Problem import Qubo, Ising
+
+    variables, linear, (row, col, quadratic), offset = problem.to_arrays()
+    num_variables = len(variables)
+    spin = problem.vartype is dimod.SPIN
+    linear = np.array(linear, dtype=np.float64)
+
+    nonzero = quadratic != 0
+    report = {
+        "original_variables": num_variables,
+        "original_interactions": len(quadratic),
+        "removed_zero_interactions": int((~nonzero).sum()),
+    }
+    row, col, quadratic = row[nonzero], col[nonzero], quadratic[nonzero].astype(np.float64)
+
+    active = np.ones(num_variables, dtype=bool)
+    values = np.zeros(num_variables, dtype=np.int8)
+    isolated = np.bincount(np.concatenate([row, col]), minlength=num_variables) == 0
+    report["fixed_isolated"] = int(isolated.sum())
+    report["fixed_persistency"] = 0
+
+    first = True
+    while True:
+        if first:
+            fix = isolated
+            if spin:
+                values[fix] = np.where(linear[fix] > 0, -1, 1)
+            else:
+                values[fix] = (linear[fix] < 0).astype(np.int8)
+        elif persistency:
+            if spin:
+                bound = np.bincount(row, np.abs(quadratic), num_variables) + \
+                        np.bincount(col, np.abs(quadratic), num_variables)
+                fix = active & (np.abs(linear) >= bound)
+                values[fix] = np.where(linear[fix] > 0, -1, 1)
+            else:
+                negative = np.bincount(row, np.minimum(quadratic, 0), num_variables) + \
+                           np.bincount(col, np.minimum(quadratic, 0), num_variables)
+                positive = np.bincount(row, np.maximum(quadratic, 0), num_variables) + \
+                           np.bincount(col, np.maximum(quadratic, 0), num_variables)
+                # x = 1 is optimal if its bias stays non-positive with all positive couplings switched on, x = 0 if
+                # it stays non-negative with all negative couplings switched on
+                one = active & (linear + positive <= 0)
+                zero = active & ~one & (linear + negative >= 0)
+                fix = one | zero
+                values[one] = 1
+                values[zero] = 0
+            report["fixed_persistency"] += int(fix.sum())
+        else:
+            break
+        # the persistency pass runs even if no variable is isolated
+        if not fix.any() and not first:
+            break
+        first = False
+
+        offset += float(linear[fix] @ values[fix])
+        active &= ~fix
+
+        # fold the couplings to fixed variables into the linear biases of the active neighbours
+        fixed_row, fixed_col = fix[row], fix[col]
+        both = fixed_row & fixed_col
+        offset += float(quadratic[both] @ (values[row[both]] * values[col[both]]))
+        only_col = fixed_col & ~fixed_row
+        only_row = fixed_row & ~fixed_col
+        np.add.at(linear, row[only_col], quadratic[only_col] * values[col[only_col]])
+        np.add.at(linear, col[only_row], quadratic[only_row] * values[row[only_row]])
+        keep = ~(fixed_row | fixed_col)
+        row, col, quadratic = row[keep], col[keep], quadratic[keep]
+
+    kept_indices = np.flatnonzero(active)
+    new_index = np.full(num_variables, -1, dtype=np.int64)
+    new_index[kept_indices] = np.arange(len(kept_indices))
+    new_linear = linear[kept_indices].tolist()
+    new_quadratic = dict(zip(zip(new_index[row].tolist(), new_index[col].tolist()), quadratic.tolist()))
+
+    if spin:
+        reduced = Ising(problem.config, dict(enumerate(new_linear)), new_quadratic)
+    else:
+        qubo = {(i, i): bias for i, bias in enumerate(new_linear)}
+        qubo.update(new_quadratic)
+        reduced = Qubo(problem.config, qubo)
+    reduced._inherit_settings(problem)
+
+    report["remaining_variables"] = len(kept_indices)
+    report["remaining_interactions"] = len(quadratic)
+    report["variable_reduction"] = 1.0 - len(kept_indices) / num_variables if num_variables else 0.0
+    reduced.presolve_info = PresolveInfo(variables, [variables[i] for i in kept_indices],
+                                         {variables[i]: int(values[i]) for i in np.flatnonzero(~active)},
+                                         float(offset), problem.vartype, report)
+    return reduced
@@ -1,7 +1,15 @@
+from types import MappingProxyType
 from dimod.binary_quadratic_model import BinaryQuadraticModel
 import dimod
-import dwave_networkx as dnx
-import matplotlib.pyplot as plt
+import numpy as np
+from . import LocalSolver
+from . import Embedding
+from . import Presolve
+from . import ReverseAnnealing
+
+# Solver parameters that are keyed by variable labels: the initial state for reverse annealing and the guidance of the
+# Fujitsu Digital Annealer. They are sent with the variable indices (see Problem.encode_solver_params).
+LABEL_KEYED_PARAMS = ("initial_state", "guidance_config")
 
 
 class Problem:
@@ -19,11 +27,19 @@ class Problem:
     solver
         Specifies which solver should be used
     platform
-        Specifies which platform should be used
+        Specifies which platform should be used. The platform "local" solves the problem in the current process (see
+        LocalSolver.solve)
     embedding
         Chimera or Pegasus embedding for the problem
     connection
-        Connection object containing the configuration data of the user
+        Connection object containing the configuration data of the user. Without a config, only the local platform can
+        be used.
+    presolve_info
+        Set on problems returned by presolve(). Used to map the samples back to the variables of the original problem.
+    offset
+        Constant energy offset of the problem
+    conversion_source
+        Set on problems returned by Ising.to_qubo() and Qubo.to_ising(). Responses are mapped back to this problem.
 
     Methods
     -------
@@ -45,8 +61,27 @@ class Problem:
         embedding
     draw_pegasus_embedding()
         Save the pegasus embedding to a file.
+    draw_embedding(output_path, mode)
+        Save the embedding to a file, the topology is derived from the solver. Large embeddings are rasterised.
+    find_local_embedding(solver, topology, attempts, workers)
+        Search an embedding in the current machine with several randomized attempts in parallel processes.
+    embedding_report(solver, edges)
+        Check the embedding against the edge list of the solver and return chain and qubit statistics.
+    reverse_anneal(initial_states, **driver_params)
+        Iterative reverse annealing with several concurrent chains.
     solve(times)
         Solve a problem by either calling the connections solve_qubo or solve_ising function.
+    freeze()
+        Serialize the problem once and reuse the serialization for all following requests.
+    presolve()
+        Return a smaller problem with fixed variables removed, whose responses are mapped back automatically.
+    variables()
+        Return the variable labels. The problem is sent to the server with the index of each label instead of the label.
+    decode_response(response), encode_embedding(embedding), decode_embedding(embedding), encode_sample(sample),
+    encode_solver_params()
+        Translate between the variable labels and the indices that are used on the wire.
+    to_arrays()
+        Return the variables, linear biases, quadratic biases in coordinate format and the offset as NumPy arrays.
     """
 
     def __init__(self, config):
@@ -56,7 +91,37 @@ class Problem:
         self.solver = None
         self.platform = None
         self.embedding = None
-        self.connection = config.create_connection()
+        self.presolve_info = None
+        self.offset = 0.0
+        self.conversion_source = None
+        self._arrays = None
+        self._converted = None
+        self._frozen = None
+        self._labels = None
+        self.connection = config.create_connection() if config is not None else None
+
+    def _inherit_settings(self, problem):
+        """Copy the platform, solver and parameters of problem. """
+        self.solver_params = dict(problem.solver_params)
+        self.uq_params = dict(problem.uq_params)
+        self.solver = problem.solver
+        self.platform = problem.platform
+        return self
+
+    def _reset_arrays(self):
+        """Invalidate the array form and the cached conversion after the dictionaries were replaced. """
+        self._arrays = None
+        self._converted = None
+        self._frozen = None
+        self._labels = None
+
+    def freeze(self):
+        """Serialize the problem once and reuse the serialization (and the variable labels) for every following
+        request, e.g. when the same problem is sent many times with different parameters. Changes made to the
+        dictionaries in place after calling freeze() are not sent to the server. """
+        self._frozen = None
+        self._frozen = (self.variables(), self.to_json())
+        return self
 
     # ------------------ Set attributes ------------------ #
 
@@ -88,16 +153,17 @@ class Problem:
         self.embedding = self.connection.find_chimera_embedding(self)
         return self.embedding
 
-    def draw_chimera_embedding(self, output_path):
+    def draw_chimera_embedding(self, output_path, mode="auto"):
         """Save the chimera embedding to a file.
 
         Parameters
         ----------
         output_path
             Specifies the path to the file where to save the embedding
+        mode: str
+            "full", "raster", "aggregate" or "auto", see Embedding.draw_embedding
         """
-        dnx.draw_chimera_embedding(dnx.chimera_graph(16, 16, 4), emb=self.embedding, node_size=3, width=.3)
-        plt.savefig(output_path)
+        Embedding.draw_embedding(self.embedding, output_path, self.solver, family="chimera", mode=mode)
 
     def find_pegasus_embedding(self):
         """Call the connections find_chimera_embedding method to make a server request for finding a pegasus
@@ -105,16 +171,75 @@ class Problem:
         self.embedding = self.connection.find_pegasus_embedding(self)
         return self.embedding
 
-    def draw_pegasus_embedding(self, output_path):
+    def draw_pegasus_embedding(self, output_path, mode="auto"):
         """Save the pegasus embedding to a file.
 
         Parameters
         ----------
         output_path
             Specifies the path to the file where to save the embedding
+        mode: str
+            "full", "raster", "aggregate" or "auto", see Embedding.draw_embedding
+        """
+        Embedding.draw_embedding(self.embedding, output_path, self.solver, family="pegasus", mode=mode)
+
+    def draw_embedding(self, output_path, mode="auto"):
+        """Save the embedding to a file. The graph family and size are taken from the solver (see
+        Embedding.solver_topology).
+
+        Parameters
+        ----------
+        output_path
+            Specifies the path to the file where to save the embedding
+        mode: str
+            "full", "raster", "aggregate" or "auto", see Embedding.draw_embedding
+        """
+        Embedding.draw_embedding(self.embedding, output_path, self.solver, mode=mode)
+
+    def find_local_embedding(self, solver=None, topology=None, attempts=8, workers=None, **params):
+        """Search an embedding without asking the server (see Embedding.find_embedding) and save it in the embedding
+        attribute.
+
+        Parameters
+        ----------
+        solver: str
+            DWave solver whose (cached) edge list is used. By default the solver of the problem is used.
+        topology: tuple
+            Instead of a solver, an ideal graph from dwave_networkx can be used, e.g. ("pegasus", (16,)) or
+            ("chimera", (16, 16, 4))
+        attempts: int
+            Number of randomized attempts, the embedding with the shortest chains is kept
+        workers: int
+            Number of processes the attempts are distributed to
+        **params
+            Further parameters for minorminer.find_embedding
         """
-        dnx.draw_pegasus_embedding(dnx.pegasus_graph(11), emb=self.embedding, node_size=3, width=.3)
-        plt.savefig(output_path)
+        if topology is not None:
+            edges = Embedding.topology_edges(*topology)
+        else:
+            edges = Embedding.solver_edges(self.connection, solver if solver is not None else self.solver)
+        self.embedding = Embedding.find_embedding(self, edges, attempts, workers, **params)
+        return self.embedding
+
+    def embedding_report(self, solver=None, edges=None):
+        """Check the embedding locally against the edge list of a solver (see Embedding.check_embedding). The edge list
+        is requested from the server once and cached afterwards.
+
+        Parameters
+        ----------
+        solver: str
+            Name of the DWave solver. By default the solver of the problem is used.
+        edges
+            Edge list of the solver. If it is passed, no edge list is loaded.
+
+        Returns
+        -------
+        Embedding.EmbeddingReport
+            Chain lengths, qubit usage and the problems of the embedding (e.g. missing couplers)
+        """
+        if edges is None:
+            edges = Embedding.solver_edges(self.connection, solver if solver is not None else self.solver)
+        return Embedding.check_embedding(self, self.embedding, edges)
 
     # ---------------- find initial state ---------------- #
 
@@ -123,6 +248,17 @@ class Problem:
         self.uq_params.update({"num_repeats": times})
         return self.connection.find_initial_state(self)
 
+    def reverse_anneal(self, initial_states=None, **driver_params):
+        """Run a forward anneal followed by concurrent chains of reverse anneals that are fed with the best states
+        found so far. See ReverseAnnealing.ReverseAnnealingDriver for the parameters.
+
+        Returns
+        -------
+        Response
+            The best distinct states, the attribute history describes the progress of the chains.
+        """
+        return ReverseAnnealing.ReverseAnnealingDriver(self, **driver_params).run(initial_states)
+
     # ------------------ Solve problems ------------------ #
 
     def solve(self, times=1):
@@ -135,6 +271,25 @@ class Problem:
         """
 
         self.uq_params.update({"num_repeats": times})
+        if self.presolve_info is not None:
+            if not self.presolve_info.kept:
+                response = self.presolve_info.expand(None)
+            else:
+                response = self.presolve_info.expand(self._solve(times))
+        else:
+            response = self._solve(times)
+        if self.conversion_source is not None:
+            response = self.conversion_source.decode_converted_response(response)
+        return response
+
+    def _solve(self, times):
+        if self.platform == "local":
+            return LocalSolver.solve(self, times)
+        # fail before the round trip if the embedding does not fit the (locally cached) solver graph
+        if self.platform == "dwave" and self.embedding is not None and self.solver is not None:
+            edges = Embedding.cached_solver_edges(self.solver)
+            if edges is not None:
+                Embedding.validate_embedding(self, self.embedding, edges)
         if self.solver is not None:
             self.connection.set_preferred_solver(self.solver)
         if self.platform is not None:
@@ -145,6 +300,138 @@ class Problem:
         if isinstance(self, Ising):
             return self.connection.solve_ising(self)
 
+    # ------------------ Presolve ------------------ #
+
+    def presolve(self, persistency=True):
+        """Return a smaller problem with the same optimal solutions. Zero terms are removed, isolated variables and
+        variables whose optimal value can be determined locally are fixed and the remaining variables are relabeled to
+        0..n-1. Solving the returned problem returns samples with the labels of this problem. See Presolve.presolve.
+
+        Parameters
+        ----------
+        persistency: bool
+            If False, only zero terms and isolated variables are removed
+
+        Returns
+        -------
+        Problem
+            The presolved problem. presolve_info.report describes how much the problem shrank.
+        """
+        return Presolve.presolve(self, persistency)
+
+    # ------------------ Array representation ------------------ #
+
+    def to_arrays(self):
+        """Return the problem in a sparse array form.
+
+        Returns
+        -------
+        variables: list
+            The variable labels. The i-th entry of the arrays belongs to the i-th variable.
+        linear: numpy.ndarray
+            Linear biases (QUBO diagonal or Ising h)
+        (row, col, quadratic): tuple of numpy.ndarray
+            Quadratic biases in coordinate format with row[k] != col[k] and every pair occurring only once
+        offset: float
+            Constant energy offset
+        """
+        if self._arrays is not None:
+            variables, linear, quadratic = self._arrays
+            return variables, linear, quadratic, self.offset
+        vectors = self.to_bqm().to_numpy_vectors(return_labels=True)
+        return vectors.labels, vectors.linear_biases, tuple(vectors.quadratic), vectors.offset
+
+    def _set_arrays(self, linear, quadratic, variables=None, offset=0.0):
+        """Store the problem in array form (see coalesce). """
+        linear, quadratic = coalesce(linear, *quadratic)
+        self._arrays = (list(range(len(linear))) if variables is None else list(variables), linear, quadratic)
+        self.offset = float(offset)
+        self._labels = None
+        return self
+
+    def _array_bqm(self):
+        variables, linear, quadratic, offset = self.to_arrays()
+        return BinaryQuadraticModel.from_numpy_vectors(linear, quadratic, offset, self.vartype,
+                                                       variable_order=variables)
+
+    def decode_converted_response(self, response):
+        """Map a response to the converted problem (see Ising.to_qubo and Qubo.to_ising) back to this problem: the
+        samples are converted into the variable type of this problem and the energies are calculated for this problem.
+        """
+        variables, linear, (row, col, quadratic), offset = self.to_arrays()
+        samples = response.sample_matrix(variables)
+        if response.sampleset.vartype is not self.vartype:
+            samples = (samples + 1) // 2 if self.vartype is dimod.BINARY else 2 * samples - 1
+        energies = LocalSolver.energies(samples, linear, row, col, quadratic, offset)
+        return response.with_samples(samples, variables, energies, vartype=self.vartype)
+
+    # ------------------ Variable labels ------------------ #
+
+    # The variables can have any hashable labels (e.g. strings or tuples). On the wire, the i-th variable of variables()
+    # is always labeled with i, so the server only sees dense integer labels.
+
+    def _label_index(self):
+        """Return the variable labels in the order of their indices and the dictionary label -> index. Both are cached
+        until the problem changes: replacing the dictionaries or arrays resets the cache, entries that are added to or
+        removed from the dictionaries in place are detected by their number. """
+        signature = self._signature()
+        if self._labels is None or self._labels[0] != signature:
+            variables = list(self.to_arrays()[0])
+            self._labels = (signature, variables, {label: i for i, label in enumerate(variables)})
+        return self._labels[1], self._labels[2]
+
+    def variables(self):
+        """Return the variable labels in the order of their indices. """
+        if self._frozen is not None:
+            return self._frozen[0]
+        return self._label_index()[0]
+
+    def to_index_bqm(self):
+        """Return the problem as a dimod.BinaryQuadraticModel whose variables are labeled with their indices. """
+        variables, linear, quadratic, offset = self.to_arrays()
+        return BinaryQuadraticModel.from_numpy_vectors(linear, quadratic, offset, self.vartype)
+
+    def decode_response(self, response):
+        """Return a copy of a response to this problem whose samples are labeled with the variable labels instead of
+        the indices that were used on the wire. """
+        variables = self.variables()
+        labels = np.fromiter(variables, dtype=object, count=len(variables))
+        indices = np.fromiter((int(v) for v in response.sampleset.variables), dtype=np.int64,
+                              count=len(response.sampleset.variables))
+        return response.with_samples(response.sampleset.record.sample, labels[indices].tolist())
+
+    def encode_embedding(self, embedding):
+        """Return the embedding with the variable indices instead of the variable labels as keys. """
+        index = self._label_index()[1]
+        return {index[label]: chain for label, chain in embedding.items()}
+
+    def decode_embedding(self, embedding):
+        """Return an embedding received from the server (keyed by variable indices, possibly as strings, or in CSR
+        format, see codec.embedding_arrays) with the variable labels as keys. """
+        variables = self.variables()
+        if not isinstance(embedding, tuple):
+            return {variables[int(key)]: chain for key, chain in embedding.items()}
+        indices, indptr, qubits = embedding
+        qubits, bounds = qubits.tolist(), indptr.tolist()
+        chains = [qubits[start:stop] for start, stop in zip(bounds[:-1], bounds[1:])]
+        return dict(zip(map(variables.__getitem__, indices.tolist()), chains))
+
+    def encode_sample(self, sample):
+        """Return a sample (e.g. an initial state) with the variable indices instead of the variable labels as keys. """
+        index = self._label_index()[1]
+        return {index[label]: value for label, value in sample.items()}
+
+    def encode_solver_params(self):
+        """Return the solver parameters with the label-keyed parameters (LABEL_KEYED_PARAMS) keyed by the variable
+        indices. solver_params is not changed. """
+        solver_params = self.solver_params
+        if any(name in solver_params for name in LABEL_KEYED_PARAMS):
+            solver_params = dict(solver_params)
+            for name in LABEL_KEYED_PARAMS:
+                if name in solver_params:
+                    solver_params[name] = self.encode_sample(solver_params[name])
+        return solver_params
+
 
 class Qubo(Problem):
     """Represents a problem in QUBO format.
@@ -152,25 +439,87 @@ class Qubo(Problem):
     Attributes
     ----------
     problem_dict: dict
-        QUBO represantation of a problem
+        QUBO represantation of a problem (read-only for QUBOs created with from_arrays)
 
     Methods
     -------
+    from_arrays(config, linear, quadratic, variables, offset)
+        Create a QUBO from NumPy arrays without building a dictionary
+    to_ising()
+        Return the equivalent Ising (cached)
+    to_bqm()
+        Transform a QUBO dictionary into a dimod.BinaryQuadraticModel (BQM)
     to_json()
         Transform a QUBO dictionary into a dimod.BinaryQuadraticModel (BQM) and return the serialized BQM
     """
+    vartype = dimod.BINARY
+
     def __init__(self, config, qubo_dict):
         Problem.__init__(self, config)
         self.problem_dict = qubo_dict
 
-    def to_json(self):
-        """Transform a QUBO dictionary into a dimod.BinaryQuadraticModel (BQM) and return the serialized BQM.
+    @classmethod
+    def from_arrays(cls, config, linear, quadratic, variables=None, offset=0.0):
+        """Create an array-backed QUBO. The dictionary problem_dict is only built if it is accessed.
 
-        Returns
-        -------
-        bqm.to_serializable(): dict
-            The serialized BQM
+        Parameters
+        ----------
+        config
+            The config object that contains the users configuration data
+        linear: numpy.ndarray
+            Diagonal of the QUBO, one entry per variable
+        quadratic: tuple of numpy.ndarray
+            (row, col, biases) of the off-diagonal entries. Diagonal entries are added to linear and duplicate entries
+            (also (i, j) and (j, i)) are summed up.
+        variables: list
+            Labels of the variables. By default the variables are labeled 0..n-1.
+        offset: float
+            Constant energy offset
         """
+        qubo = cls(config, None)
+        return qubo._set_arrays(linear, quadratic, variables, offset)
+
+    @property
+    def problem_dict(self):
+        """The QUBO dictionary. For an array-backed QUBO it is built from the arrays and read-only, assign a new
+        dictionary to change the problem. """
+        if self._arrays is None:
+            return self._problem_dict
+        if self._problem_dict is None:
+            variables, linear, (row, col, quadratic), offset = self.to_arrays()
+            problem_dict = {(v, v): bias for v, bias in zip(variables, linear.tolist())}
+            labels = np.fromiter(variables, dtype=object, count=len(variables))
+            problem_dict.update(zip(zip(labels[row].tolist(), labels[col].tolist()), quadratic.tolist()))
+            self._problem_dict = problem_dict
+        return MappingProxyType(self._problem_dict)
+
+    @problem_dict.setter
+    def problem_dict(self, qubo_dict):
+        self._problem_dict = qubo_dict
+        self._reset_arrays()
+
+    def _signature(self):
+        return None if self._arrays is not None else len(self._problem_dict)
+
+    def to_ising(self):
+        """Return the equivalent Ising (x = (s + 1) / 2) with the same energies, including the offset. The conversion
+        is done on the array form in one pass and cached. Responses to the Ising are mapped back to this QUBO. """
+        if self._converted is None:
+            variables, linear, (row, col, quadratic), offset = self.to_arrays()
+            num_variables = len(variables)
+            couplings = np.bincount(row, quadratic, num_variables) + np.bincount(col, quadratic, num_variables)
+            h = linear / 2 + couplings / 4
+            ising_offset = offset + linear.sum() / 2 + quadratic.sum() / 4
+            ising = Ising.from_arrays(self.config, h, (row, col, quadratic / 4), variables, ising_offset)
+            ising._inherit_settings(self).embedding = self.embedding
+            ising.conversion_source = self
+            self._converted = ising
+        return self._converted
+
+    def to_bqm(self):
+        """Transform a QUBO dictionary into a dimod.BinaryQuadraticModel (BQM). """
+        if self._arrays is not None:
+            return self._array_bqm()
         linear = {}
         quadratic = {}
         for (a, b) in self.problem_dict.keys():
@@ -179,8 +528,20 @@ class Qubo(Problem):
             else:
                 quadratic[(a, b)] = self.problem_dict[(a, b)]
 
-        bqm = BinaryQuadraticModel(linear, quadratic, 0.0, dimod.BINARY)
-        return bqm.to_serializable()
+        return BinaryQuadraticModel(linear, quadratic, self.offset, dimod.BINARY)
+
+    def to_json(self):
+        """Transform a QUBO dictionary into a dimod.BinaryQuadraticModel (BQM) and return the serialized BQM. The
+        variables are labeled with their indices (see Problem.variables).
+
+        Returns
+        -------
+        bqm.to_serializable(): dict
+            The serialized BQM
+        """
+        if self._frozen is not None:
+            return self._frozen[1]
+        return self.to_index_bqm().to_serializable()
 
 
 class Ising(Problem):
@@ -189,30 +550,144 @@ class Ising(Problem):
     Attributes
     ----------
     linear_dict: dict
-        external magnetic field values
+        external magnetic field values (read-only for Isings created with from_arrays)
     quadratic_dict: dict
-        interaction values
+        interaction values (read-only for Isings created with from_arrays)
 
     Methods
     -------
+    from_arrays(config, linear, quadratic, variables, offset)
+        Create an Ising from NumPy arrays without building dictionaries
+    to_qubo()
+        Return the equivalent QUBO (cached)
+    to_bqm()
+        Transform an Ising representation of a problem into a dimod.BinaryQuadraticModel (BQM)
     to_json()
         Transform an Ising representation of a problem into a dimod.BinaryQuadraticModel (BQM) and return the serialized
         BQM
     """
+    vartype = dimod.SPIN
+
     def __init__(self, config, linear_dict, quadratic_dict):
         Problem.__init__(self, config)
         self.linear_dict = linear_dict
         self.quadratic_dict = quadratic_dict
 
+    @classmethod
+    def from_arrays(cls, config, linear, quadratic, variables=None, offset=0.0):
+        """Create an array-backed Ising. The dictionaries linear_dict and quadratic_dict are only built if they are
+        accessed.
+
+        Parameters
+        ----------
+        config
+            The config object that contains the users configuration data
+        linear: numpy.ndarray
+            External magnetic field values, one entry per variable
+        quadratic: tuple of numpy.ndarray
+            (row, col, biases) of the interactions. Duplicate entries (also (i, j) and (j, i)) are summed up.
+        variables: list
+            Labels of the variables. By default the variables are labeled 0..n-1.
+        offset: float
+            Constant energy offset
+        """
+        ising = cls(config, None, None)
+        return ising._set_arrays(linear, quadratic, variables, offset)
+
+    @property
+    def linear_dict(self):
+        """The external field dictionary. For an array-backed Ising it is built from the arrays and read-only, assign a
+        new dictionary to change the problem. """
+        if self._arrays is None:
+            return self._linear_dict
+        if self._linear_dict is None:
+            variables, linear, quadratic, offset = self.to_arrays()
+            self._linear_dict = dict(zip(variables, linear.tolist()))
+        return MappingProxyType(self._linear_dict)
+
+    @linear_dict.setter
+    def linear_dict(self, linear_dict):
+        self._linear_dict = linear_dict
+        self._reset_arrays()
+
+    @property
+    def quadratic_dict(self):
+        """The interaction dictionary. For an array-backed Ising it is built from the arrays and read-only, assign a new
+        dictionary to change the problem. """
+        if self._arrays is None:
+            return self._quadratic_dict
+        if self._quadratic_dict is None:
+            variables, linear, (row, col, quadratic), offset = self.to_arrays()
+            labels = np.fromiter(variables, dtype=object, count=len(variables))
+            self._quadratic_dict = dict(zip(zip(labels[row].tolist(), labels[col].tolist()), quadratic.tolist()))
+        return MappingProxyType(self._quadratic_dict)
+
+    @quadratic_dict.setter
+    def quadratic_dict(self, quadratic_dict):
+        self._quadratic_dict = quadratic_dict
+        self._reset_arrays()
+
+    def _signature(self):
+        if self._arrays is not None:
+            return None
+        return len(self._linear_dict), len(self._quadratic_dict)
+
+    def to_qubo(self):
+        """Return the equivalent QUBO (s = 2x - 1) with the same energies, including the offset. The conversion is done
+        on the array form in one pass and cached. Responses to the QUBO are mapped back to this Ising. """
+        if self._converted is None:
+            variables, h, (row, col, quadratic), offset = self.to_arrays()
+            num_variables = len(variables)
+            couplings = np.bincount(row, quadratic, num_variables) + np.bincount(col, quadratic, num_variables)
+            linear = 2 * h - 2 * couplings
+            qubo_offset = offset - h.sum() + quadratic.sum()
+            qubo = Qubo.from_arrays(self.config, linear, (row, col, 4 * quadratic), variables, qubo_offset)
+            qubo._inherit_settings(self).embedding = self.embedding
+            qubo.conversion_source = self
+            self._converted = qubo
+        return self._converted
+
+    def to_bqm(self):
+        """Transform an Ising representation of a problem into a dimod.BinaryQuadraticModel (BQM). """
+        if self._arrays is not None:
+            return self._array_bqm()
+        return BinaryQuadraticModel(self.linear_dict, self.quadratic_dict, self.offset, dimod.SPIN)
+
     def to_json(self):
         """
         Transform an Ising representation of a problem into a dimod.BinaryQuadraticModel (BQM) and return the serialized
-        BQM.
+        BQM. The variables are labeled with their indices (see Problem.variables).
 
         Returns
         -------
         bqm.to_serializable(): dict
             The serialized BQM
         """
-        bqm = BinaryQuadraticModel(self.linear_dict, self.quadratic_dict, 0.0, dimod.SPIN)
-        return bqm.to_serializable()
+        if self._frozen is not None:
+            return self._frozen[1]
+        return self.to_index_bqm().to_serializable()
+
+
+def coalesce(linear, row, col, quadratic):
+    """Bring a problem in array form into a canonical form: entries on the diagonal are added to the linear biases and
+    duplicate quadratic entries (also (i, j) and (j, i)) are summed up, so that every pair row[k] < col[k] occurs once.
+
+    Returns
+    -------
+    linear: numpy.ndarray
+    (row, col, quadratic): tuple of numpy.ndarray
+    """
+    linear = np.array(linear, dtype=np.float64)
+    num_variables = len(linear)
+    row, col = np.asarray(row, dtype=np.int64), np.asarray(col, dtype=np.int64)
+    quadratic = np.asarray(quadratic, dtype=np.float64)
+
+    diagonal = row == col
+    if diagonal.any():
+        linear += np.bincount(row[diagonal], quadratic[diagonal], num_variables)
+        row, col, quadratic = row[~diagonal], col[~diagonal], quadratic[~diagonal]
+
+    keys = np.minimum(row, col) * num_variables + np.maximum(row, col)
+    unique, inverse = np.unique(keys, return_inverse=True)
+    quadratic = np.bincount(inverse, quadratic, len(unique))
+    return linear, (unique // num_variables, unique % num_variables, quadratic)
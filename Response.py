@@ -1,5 +1,53 @@
 from dimod.sampleset import SampleSet
+from dimod.serialization.utils import deserialize_ndarray, deserialize_ndarrays
+from dimod.variables import iter_deserialize_variables
 from prettytable import PrettyTable
+import numpy as np
+import dimod
+import copy
+import zipfile
+import json
+from . import LocalSolver
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pq = None
+
+# number of samples that are converted and written at once by the export functions
+EXPORT_CHUNK_SIZE = 65536
+
+
+def sampleset_from_serializable(obj):
+    """Deserialize a SampleSet like dimod.SampleSet.from_serializable with fewer copies of the samples: the packed
+    samples are unpacked with one np.unpackbits call and, if the labels arrive sorted (the variable indices the server
+    uses), the columns are not reordered. The arrays of obj are NumPy arrays (see client.codec.decode_reply) or lists.
+    """
+    if obj["version"]["sampleset_schema"] < "3.0.0":
+        return SampleSet.from_serializable(obj)
+    vartype = str(obj["variable_type"])
+    num_variables = obj["num_variables"]
+    variables = list(iter_deserialize_variables(obj["variable_labels"]))
+    info = deserialize_ndarrays(obj["info"])
+    vectors = {name: deserialize_ndarray(data) for name, data in obj["vectors"].items()}
+
+    sample = deserialize_ndarray(obj["sample_data"])
+    if obj.get("sample_packed", True):
+        # every row is a sequence of uint32 words, the first variable is the lowest bit of the first word
+        words = np.ascontiguousarray(sample, dtype="<u4").reshape(len(sample), (num_variables + 31) // 32)
+        sample = np.unpackbits(words.view(np.uint8), axis=1, count=num_variables, bitorder="little")
+        sample = sample.astype(obj["sample_type"], copy=False)
+        if vartype == "SPIN":
+            sample *= 2
+            sample -= 1
+
+    try:
+        sort_labels = variables != sorted(variables)
+    except TypeError:
+        sort_labels = True
+    return SampleSet.from_samples((sample, variables), vartype, info=info, sort_labels=sort_labels, **vectors)
 
 
 class Response:
@@ -12,26 +60,58 @@ class Response:
     sampleset
         Table with solution vectors, energy and number of occurrences
     solutions
-        List of the sampled solution vectors
+        List of the sampled solution vectors (built on first use)
     energies
-        List of the solution vectors energies
+        List of the solution vectors energies (built on first use)
     num_occurrences
-        List of number of occurrences of a solution vector
+        List of number of occurrences of a solution vector (built on first use)
 
     Methods
     -------
     print_solutions(), print_energies(), print_num_occurrences()
         Print the solution vectors, the energies and the number of occurrences of the vectors.
-    print_solutions_nice()
+    print_solutions_nice(max_rows, page)
         Show the solution (solution vectors, energies and number of occurrences) in a well readable table format.
+    to_npz(path, packed), to_arrow(path, packed), to_parquet(path, packed)
+        Write the samples, energies and number of occurrences in a columnar format to a file.
+    apply_energy_offset(offset)
+        Add a constant offset to all energies (e.g. the offset of an Ising to QUBO translation).
+    with_samples(samples, variables, energies)
+        Return a copy of the response (same class and attributes) with other samples.
+    sample_matrix(variables)
+        Return the samples as a matrix with the columns ordered like the given variables.
+    polish(problem, method, workers)
+        Improve the samples with a local search and return a new Response with the improved samples.
     """
 
     def __init__(self, sampleset):
         self.sampleset = sampleset
-        self.solutions = list(self.sampleset.samples())
-        self.energies = list(map(lambda x: x.energy, list(self.sampleset.data(fields=["energy"]))))
-        self.num_occurrences = list(
-            map(lambda x: x.num_occurrences, list(self.sampleset.data(fields=["num_occurrences"]))))
+        self._solutions = None
+        self._sorted_vectors = None
+
+    # the lists are only built when they are used, large responses are worked with through the sampleset record
+
+    @property
+    def solutions(self):
+        if self._solutions is None:
+            self._solutions = list(self.sampleset.samples())
+        return self._solutions
+
+    def _sorted(self):
+        """Energies and numbers of occurrences in the order of the energies (like sampleset.data()). """
+        if self._sorted_vectors is None:
+            record = self.sampleset.record
+            order = np.argsort(record.energy)
+            self._sorted_vectors = list(record.energy[order]), list(record.num_occurrences[order])
+        return self._sorted_vectors
+
+    @property
+    def energies(self):
+        return self._sorted()[0]
+
+    @property
+    def num_occurrences(self):
+        return self._sorted()[1]
 
     def print_solutions(self):
         for solution in self.solutions:
@@ -45,21 +125,259 @@ class Response:
         for occurrence in self.num_occurrences:
             print(occurrence)
 
-    def print_solutions_nice(self):
-        """Show the solution (solution vectors, energies and number of occurrences) in a well readable table format. """
+    def print_solutions_nice(self, max_rows=None, page=0):
+        """Show the solution (solution vectors, energies and number of occurrences) in a well readable table format.
+
+        Parameters
+        ----------
+        max_rows: int
+            If specified, only one page of at most max_rows samples is formatted and printed. By default all samples
+            are printed.
+        page: int
+            Index of the page that is printed if max_rows is specified.
+        """
         t = PrettyTable(["Answer-Sample", "Energy", "Num-Occurrences"])
 
-        for index, solution in enumerate(self.solutions):
-            t.add_row([solution, self.energies[index], self.num_occurrences[index]])
+        if max_rows is None:
+            for index, solution in enumerate(self.solutions):
+                t.add_row([solution, self.energies[index], self.num_occurrences[index]])
+            print(t)
+            return
+
+        # only the rows of the requested page are converted into dictionaries
+        record = self.sampleset.record
+        variables = list(self.sampleset.variables)
+        start = min(page * max_rows, len(record))
+        stop = min(start + max_rows, len(record))
+        for row in record[start:stop]:
+            t.add_row([dict(zip(variables, row.sample.tolist())), row.energy, row.num_occurrences])
 
         print(t)
+        print("Showing samples %d-%d of %d (page %d of %d)"
+              % (start, stop, len(record), page + 1, max(1, -(-len(record) // max_rows))))
+
+    def apply_energy_offset(self, offset):
+        """Add a constant offset to the energies of all samples, e.g. the offset that is lost when an Ising is
+        translated into a QUBO on the server. """
+        self.sampleset.record.energy += offset
+        self._sorted_vectors = None
+        return self
+
+    def with_samples(self, samples, variables, energies=None, vartype=None):
+        """Return a copy of this response (same class, same attributes such as timing) whose sampleset contains the
+        given samples. The number of occurrences and the info of the sampleset are kept.
+
+        Parameters
+        ----------
+        samples: numpy.ndarray
+            Sample matrix with one row per sample of this response
+        variables: list
+            Variable labels of the columns of samples
+        energies: numpy.ndarray
+            Energies of the samples. By default the energies of this response are kept.
+        vartype
+            Variable type of the samples. By default the variable type of this response is kept.
+        """
+        sampleset = SampleSet.from_samples((samples, list(variables)),
+                                           self.sampleset.vartype if vartype is None else vartype,
+                                           energy=self.sampleset.record.energy if energies is None else energies,
+                                           num_occurrences=self.sampleset.record.num_occurrences,
+                                           info=self.sampleset.info, sort_labels=False)
+        response = copy.copy(self)
+        Response.__init__(response, sampleset)
+        return response
+
+    def sample_matrix(self, variables):
+        """Return the samples as an int8 matrix whose columns are ordered like variables. Labels that were converted
+        to strings on the way from the server are matched as well.
+
+        Parameters
+        ----------
+        variables: list
+            Variable labels in the order of the columns
+        """
+        position = {label: index for index, label in enumerate(self.sampleset.variables)}
+        missing = [v for v in variables if v not in position and str(v) not in position]
+        if missing:
+            raise ValueError(f"The samples do not contain the variables {missing[:10]}")
+        columns = [position[v] if v in position else position[str(v)] for v in variables]
+        return self.sampleset.record.sample[:, columns]
+
+    # ------------------ Local improvement ------------------ #
+
+    def polish(self, problem, method="steepest_descent", workers=None, max_iter=None):
+        """Improve every sample with a vectorised local search (single bit flips) on the given problem and return a new
+        Response with the improved samples. The samples keep their order, so the i-th row of the new response belongs
+        to the i-th row of this response.
+
+        Parameters
+        ----------
+        problem: Problem
+            The Qubo or Ising this response is an answer to
+        method: str
+            "steepest_descent" flips the best variable per step, "greedy_descent" sweeps over the variables and flips
+            every variable that improves the sample
+        workers: int
+            Number of processes the samples are distributed to. By default the search runs in the current process.
+        max_iter: int
+            Maximum number of steps (steepest_descent) or sweeps (greedy_descent). By default the search runs until
+            no single flip improves a sample.
+
+        Returns
+        -------
+        Response
+            Response with the improved samples. Its attribute polish_report is a dictionary with the arrays
+            "original_energies", "energies", "improvement" and "flips" (one entry per sample).
+        """
+        variables, linear, (row, col, quadratic), offset = problem.to_arrays()
+        samples = self.sample_matrix(variables)
+        if self.sampleset.vartype is not problem.vartype:
+            samples = (samples + 1) // 2 if problem.vartype is dimod.BINARY else 2 * samples - 1
+
+        csr = LocalSolver.adjacency(len(variables), row, col, quadratic)
+        polished, flips = LocalSolver.descend(samples, linear, csr, problem.vartype, method, workers, max_iter)
+
+        original_energies = LocalSolver.energies(samples, linear, row, col, quadratic, offset)
+        polished_energies = LocalSolver.energies(polished, linear, row, col, quadratic, offset)
+        sampleset = SampleSet.from_samples((polished, variables), problem.vartype, energy=polished_energies,
+                                           num_occurrences=self.sampleset.record.num_occurrences,
+                                           info=self.sampleset.info, sort_labels=False)
+        response = Response(sampleset)
+        response.polish_report = {
+            "original_energies": original_energies,
+            "energies": polished_energies,
+            "improvement": original_energies - polished_energies,
+            "flips": flips,
+        }
+        return response
+
+    # ------------------ Export ------------------ #
+
+    def _export_metadata(self, packed):
+        """Return the metadata that is stored alongside the exported samples. """
+        return {
+            "variable_labels": [label if isinstance(label, (int, str)) else str(label)
+                                for label in self.sampleset.variables],
+            "variable_type": self.sampleset.vartype.name,
+            "num_variables": len(self.sampleset.variables),
+            "num_rows": len(self.sampleset.record),
+            "packed": packed,
+        }
+
+    def _iter_chunks(self, packed, chunk_size=EXPORT_CHUNK_SIZE):
+        """Yield the samples, energies and number of occurrences in chunks of chunk_size rows. If packed is True, the
+        samples are packed into bits (spin values -1 are stored as 0) with one row of bytes per sample. """
+        record = self.sampleset.record
+        for start in range(0, len(record), chunk_size):
+            chunk = record[start:start + chunk_size]
+            samples = chunk.sample
+            if packed:
+                samples = np.packbits(samples > 0, axis=1)
+            yield samples, chunk.energy, chunk.num_occurrences
+
+    def to_npz(self, path, packed=True, chunk_size=EXPORT_CHUNK_SIZE):
+        """Write the samples, energies and number of occurrences to an uncompressed .npz file. The arrays are written
+        chunk by chunk, so the samples never have to be copied as a whole.
+
+        Parameters
+        ----------
+        path
+            Path of the .npz file
+        packed: bool
+            If True, the samples are stored as packed bits (array "samples" of shape (num_rows, ceil(num_variables / 8))
+            and dtype uint8), otherwise as int8 values (shape (num_rows, num_variables)).
+        chunk_size: int
+            Number of samples that are written at once
+        """
+        record = self.sampleset.record
+        num_rows, num_variables = record.sample.shape
+        sample_shape = (num_rows, (num_variables + 7) // 8) if packed else (num_rows, num_variables)
+        columns = [
+            ("samples", np.dtype(np.uint8) if packed else np.dtype(np.int8), sample_shape),
+            ("energies", record.energy.dtype, (num_rows,)),
+            ("num_occurrences", record.num_occurrences.dtype, (num_rows,)),
+        ]
+
+        with zipfile.ZipFile(path, "w", zipfile.ZIP_STORED, allowZip64=True) as archive:
+            for index, (name, dtype, shape) in enumerate(columns):
+                with archive.open(name + ".npy", "w", force_zip64=True) as file:
+                    np.lib.format.write_array_header_1_0(
+                        file, {"descr": np.lib.format.dtype_to_descr(dtype), "fortran_order": False, "shape": shape})
+                    for chunk in self._iter_chunks(packed, chunk_size):
+                        file.write(np.ascontiguousarray(chunk[index], dtype=dtype).tobytes())
+            archive.writestr("metadata.json", json.dumps(self._export_metadata(packed)))
+
+    def _arrow_batches(self, packed, chunk_size):
+        """Yield the schema and the record batches that are used by to_arrow and to_parquet. """
+        if pa is None:
+            raise ImportError("pyarrow is required to export a Response to the arrow or parquet format")
+
+        variables = [str(label) for label in self.sampleset.variables]
+        record = self.sampleset.record
+        fields = [pa.field("sample", pa.binary((len(variables) + 7) // 8))] if packed else \
+            [pa.field(label, pa.int8()) for label in variables]
+        fields += [pa.field("energy", pa.from_numpy_dtype(record.energy.dtype)),
+                   pa.field("num_occurrences", pa.from_numpy_dtype(record.num_occurrences.dtype))]
+        schema = pa.schema(fields, metadata={"uqo": json.dumps(self._export_metadata(packed))})
+
+        def batches():
+            for samples, energies, num_occurrences in self._iter_chunks(packed, chunk_size):
+                if packed:
+                    width = samples.shape[1]
+                    columns = [pa.FixedSizeBinaryArray.from_buffers(
+                        pa.binary(width), len(samples), [None, pa.py_buffer(np.ascontiguousarray(samples))])]
+                else:
+                    columns = [pa.array(samples[:, index]) for index in range(samples.shape[1])]
+                columns += [pa.array(energies), pa.array(num_occurrences)]
+                yield pa.RecordBatch.from_arrays(columns, schema=schema)
+
+        return schema, batches()
+
+    def to_arrow(self, path, packed=True, chunk_size=EXPORT_CHUNK_SIZE):
+        """Write the samples, energies and number of occurrences to an Arrow IPC file, one record batch per chunk.
+        Requires pyarrow.
+
+        Parameters
+        ----------
+        path
+            Path of the arrow file
+        packed: bool
+            If True, the samples are stored as packed bits in a fixed size binary column "sample", otherwise every
+            variable is stored in its own int8 column.
+        chunk_size: int
+            Number of samples per record batch
+        """
+        schema, batches = self._arrow_batches(packed, chunk_size)
+        with pa.OSFile(str(path), "wb") as sink:
+            with pa.ipc.new_file(sink, schema) as writer:
+                for batch in batches:
+                    writer.write_batch(batch)
+
+    def to_parquet(self, path, packed=True, chunk_size=EXPORT_CHUNK_SIZE):
+        """Write the samples, energies and number of occurrences to a parquet file, one row group per chunk.
+        Requires pyarrow.
+
+        Parameters
+        ----------
+        path
+            Path of the parquet file
+        packed: bool
+            If True, the samples are stored as packed bits in a fixed size binary column "sample", otherwise every
+            variable is stored in its own int8 column.
+        chunk_size: int
+            Number of samples per row group
+        """
+        schema, batches = self._arrow_batches(packed, chunk_size)
+        with pq.ParquetWriter(str(path), schema) as writer:
+            for batch in batches:
+                writer.write_batch(batch)
 
 
 class QBSolveResponse(Response):
     """Response that represents a reply from the QBSolv Solver. """
 
     def __init__(self, dimod_answer):
-        solution = SampleSet.from_serializable(dimod_answer)
+        solution = sampleset_from_serializable(dimod_answer)
         Response.__init__(self, solution)
 
 
@@ -67,7 +385,7 @@ class DWaveResponse(Response):
     """Response that represents a reply from the DWave Solver. """
 
     def __init__(self, dwave_answer):
-        sampleset = SampleSet.from_serializable(dwave_answer)
+        sampleset = sampleset_from_serializable(dwave_answer)
         Response.__init__(self, sampleset)
         self.timing = self.sampleset.info["timing"]
 
@@ -76,7 +394,7 @@ class FujitsuDAUResponse(Response):
     """Response that represents a reply from the Fujitsu Solver. """
 
     def __init__(self, fujitsu_answer):
-        sampleset = SampleSet.from_serializable(fujitsu_answer)
+        sampleset = sampleset_from_serializable(fujitsu_answer)
         Response.__init__(self, sampleset)
         self.timing = self.sampleset.info["timing"]
 
@@ -85,7 +403,7 @@ class GeneticResponse(Response):
     """Response that represents a reply from the Genetic Solver. """
 
     def __init__(self, fujitsu_answer):
-        sampleset = SampleSet.from_serializable(fujitsu_answer)
+        sampleset = sampleset_from_serializable(fujitsu_answer)
         Response.__init__(self, sampleset)
 
 
@@ -93,7 +411,7 @@ class TabuResponse(Response):
     """Response that represents a reply from the DWave Solver. """
 
     def __init__(self, dwave_answer):
-        sampleset = SampleSet.from_serializable(dwave_answer)
+        sampleset = sampleset_from_serializable(dwave_answer)
         Response.__init__(self, sampleset)
 
 
@@ -101,6 +419,14 @@ class LeapHybridResponse(Response):
     """Response that represents a reply from the DWave Solver. """
 
     def __init__(self, leap_answer):
-        sampleset = SampleSet.from_serializable(leap_answer)
+        sampleset = sampleset_from_serializable(leap_answer)
+        Response.__init__(self, sampleset)
+        self.timing = self.sampleset.info["timing"]
+
+
+class LocalResponse(Response):
+    """Response that represents a result of the local platform (solved in the current process). """
+
+    def __init__(self, sampleset):
         Response.__init__(self, sampleset)
         self.timing = self.sampleset.info["timing"]
@@ -0,0 +1,181 @@
+import copy
+import time
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from dimod.sampleset import SampleSet
+from .Response import Response
+from . import Embedding
+from . import LocalSolver
+
+
+class ReverseAnnealingDriver:
+    """Iterative reverse annealing. A forward anneal provides the first initial states, afterwards several chains of
+    reverse anneals run concurrently. Whenever a chain returns, its samples are merged into a pool of the best distinct
+    states and the chain is resubmitted immediately with one of the best top_k states as its new initial state, so the
+    chains never wait for each other.
+
+    The problem is serialized once (Problem.freeze) and its embedding is reused for every request. The driver stops when
+    the best energy did not improve for patience * chains reverse anneals, or when one of the budgets is used up.
+
+    Attributes
+    ----------
+    problem
+        The Qubo or Ising that is solved (platform and solver have to be set)
+    chains
+        Number of reverse anneals that run at the same time
+    top_k
+        Number of best states that are used as initial states
+    reads
+        Number of samples per reverse anneal
+    forward_reads
+        Number of samples of the initial forward anneal
+    s_target, hold_time, reinitialize_state
+        Reverse annealing parameters, see examples.dwave_example_qubo_reverse_annealing
+    max_anneals
+        Maximum number of reverse anneals
+    patience
+        Number of reverse anneals per chain without improvement after which the driver stops
+    time_budget
+        Maximum wall clock time in seconds
+    qpu_budget
+        Maximum sum of the "qpu_access_time" of the responses (microseconds)
+
+    Methods
+    -------
+    run(initial_states)
+        Run the driver and return a Response with the best distinct states. The response has an attribute history
+        with one entry per finished anneal.
+    """
+
+    def __init__(self, problem, chains=4, top_k=None, reads=10, forward_reads=100, s_target=0.45, hold_time=80,
+                 reinitialize_state=True, max_anneals=40, patience=2, time_budget=None, qpu_budget=None):
+        self.problem = problem
+        self.chains = chains
+        self.top_k = top_k if top_k is not None else chains
+        self.reads = reads
+        self.forward_reads = forward_reads
+        self.s_target = s_target
+        self.hold_time = hold_time
+        self.reinitialize_state = reinitialize_state
+        self.max_anneals = max_anneals
+        self.patience = patience
+        self.time_budget = time_budget
+        self.qpu_budget = qpu_budget
+        self.variables = None
+        self.pool = {}
+        self.history = []
+
+    def _solve(self, times, initial_state=None):
+        """Solve a shallow copy of the problem, so that the chains can use different parameters. The copies share the
+        serialization and the embedding of the problem, each copy has its own copy of the connection (the preferred
+        solver and platform are set per request). The endpoint pool and the rate limiter are shared. """
+        problem = copy.copy(self.problem)
+        problem.solver_params = dict(self.problem.solver_params)
+        problem.uq_params = dict(self.problem.uq_params)
+        if problem.connection is not None:
+            problem.connection = copy.copy(problem.connection)
+        if initial_state is not None:
+            problem.with_params(initial_state=dict(zip(self.variables, initial_state.tolist())),
+                                reinitialize_state=self.reinitialize_state, s_target=self.s_target,
+                                hold_time=self.hold_time)
+        return problem.solve(times)
+
+    def _merge(self, response):
+        """Add the samples of a response to the pool of the best distinct states. Returns the best energy of the
+        response. """
+        samples = response.sample_matrix(self.variables)
+        energies = response.sampleset.record.energy
+        for index in np.argsort(energies)[:self.top_k]:
+            self.pool.setdefault(samples[index].tobytes(), (float(energies[index]), samples[index].copy()))
+        best = sorted(self.pool.items(), key=lambda item: item[1][0])[:self.top_k]
+        self.pool = dict(best)
+        return float(energies.min())
+
+    def _ranked_states(self):
+        return [state for energy, state in sorted(self.pool.values(), key=lambda entry: entry[0])]
+
+    def run(self, initial_states=None):
+        """Run the forward anneal (unless initial states are given) and the reverse annealing chains.
+
+        Parameters
+        ----------
+        initial_states: list of dict
+            Initial states for the chains. If None, a forward anneal with forward_reads samples provides them.
+
+        Returns
+        -------
+        Response
+            The best top_k distinct states. Its attribute history contains a dictionary per anneal with the keys
+            "chain", "best_energy" (of the anneal), "pool_best" and "elapsed".
+        """
+        if self.problem.embedding is None and self.problem.platform == "dwave":
+            self._find_embedding()
+        frozen = self.problem._frozen
+        self.problem.freeze()
+        try:
+            return self._run(initial_states)
+        finally:
+            self.problem._frozen = frozen
+
+    def _find_embedding(self):
+        """Find an embedding for the graph family of the solver. There is no server side search for Zephyr solvers,
+        their embedding is searched locally on the edge list of the solver. """
+        family = Embedding.solver_family(self.problem.solver)
+        if family == "pegasus":
+            self.problem.find_pegasus_embedding()
+        elif family == "zephyr":
+            self.problem.find_local_embedding()
+        else:
+            self.problem.find_chimera_embedding()
+
+    def _run(self, initial_states):
+        start = time.perf_counter()
+        self.variables = self.problem.variables()
+
+        if initial_states is None:
+            self._merge(self._solve(self.forward_reads))
+        else:
+            variables, linear, (row, col, quadratic), offset = self.problem.to_arrays()
+            states = np.array([[state[v] for v in self.variables] for state in initial_states], dtype=np.int8)
+            for state, energy in zip(states, LocalSolver.energies(states, linear, row, col, quadratic, offset)):
+                self.pool[state.tobytes()] = (float(energy), state)
+
+        best = min(energy for energy, state in self.pool.values())
+        anneals, stale, qpu_time = 0, 0, 0
+
+        with ThreadPoolExecutor(max_workers=self.chains) as executor:
+            running = {}
+            for chain in range(self.chains):
+                states = self._ranked_states()
+                running[executor.submit(self._solve, self.reads, states[chain % len(states)])] = chain
+                anneals += 1
+
+            while running:
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    chain = running.pop(future)
+                    response = future.result()
+                    qpu_time += getattr(response, "timing", {}).get("qpu_access_time", 0)
+                    response_best = self._merge(response)
+                    if response_best < best - 1e-9:
+                        best, stale = response_best, 0
+                    else:
+                        stale += 1
+                    self.history.append({"chain": chain, "best_energy": response_best, "pool_best": best,
+                                         "elapsed": time.perf_counter() - start})
+
+                    exhausted = anneals >= self.max_anneals or stale >= self.patience * self.chains or \
+                        (self.time_budget is not None and time.perf_counter() - start >= self.time_budget) or \
+                        (self.qpu_budget is not None and qpu_time >= self.qpu_budget)
+                    if not exhausted:
+                        states = self._ranked_states()
+                        running[executor.submit(self._solve, self.reads, states[chain % len(states)])] = chain
+                        anneals += 1
+
+        ranked = sorted(self.pool.values(), key=lambda entry: entry[0])
+        sampleset = SampleSet.from_samples((np.array([state for energy, state in ranked]), self.variables),
+                                           self.problem.vartype, energy=[energy for energy, state in ranked],
+                                           info={"qpu_access_time": qpu_time}, sort_labels=False)
+        response = Response(sampleset)
+        response.history = self.history
+        return response
@@ -0,0 +1,297 @@
+import time
+from collections import deque
+import numpy as np
+
+
+# Rough limits of the platforms (number of variables). DWave problems have to be embedded, for dense problems the
+# limit of a clique embedding on a Pegasus (Advantage) solver is used.
+PLATFORM_LIMITS = {
+    "local": 5000,
+    "tabu": 20000,
+    "qbsolv": 100000,
+    "genetic": 20000,
+    "fujitsu": 100000,
+    "dwave": 5000,
+    "leaphybrid": 1000000,
+}
+DWAVE_CLIQUE_LIMIT = 177
+
+# Largest ratio between the largest and the smallest absolute coefficient that the hardware resolves (limited precision
+# of the couplers and the fixed point representation of the Digital Annealer)
+COEFFICIENT_RANGE_LIMITS = {
+    "dwave": 1e3,
+    "fujitsu": 2.0 ** 15,
+}
+
+# Relative costs of the platforms (e.g. quota and queueing). The router prefers cheaper platforms.
+PLATFORM_COSTS = {
+    "local": 0.0,
+    "tabu": 1.0,
+    "qbsolv": 1.0,
+    "genetic": 2.0,
+    "fujitsu": 5.0,
+    "dwave": 10.0,
+    "leaphybrid": 20.0,
+}
+
+# Latency (seconds) assumed for platforms that have not been used yet
+DEFAULT_LATENCY = {
+    "local": 1.0,
+    "tabu": 5.0,
+    "qbsolv": 5.0,
+    "genetic": 30.0,
+    "fujitsu": 30.0,
+    "dwave": 20.0,
+    "leaphybrid": 30.0,
+}
+
+
+class ProblemProfile:
+    """Structural profile of a problem that is used to decide which platforms can solve it.
+
+    Attributes
+    ----------
+    num_variables
+        Number of variables
+    num_interactions
+        Number of quadratic terms
+    density
+        num_interactions divided by the number of possible interactions
+    mean_degree, max_degree
+        Mean and largest number of interactions of a variable. A variable with more than DWAVE_CLIQUE_LIMIT
+        interactions needs a chain as long as in a clique embedding on DWave.
+    min_coefficient, max_coefficient
+        Smallest and largest absolute value of the non-zero coefficients
+    coefficient_range
+        max_coefficient / min_coefficient. Ranges above COEFFICIENT_RANGE_LIMITS are not resolved by the DWave and
+        Fujitsu hardware (limited precision).
+    """
+
+    def __init__(self, problem):
+        variables, linear, (row, col, quadratic), offset = problem.to_arrays()
+        self.num_variables = len(variables)
+        self.num_interactions = len(quadratic)
+        possible = self.num_variables * (self.num_variables - 1) / 2
+        self.density = self.num_interactions / possible if possible else 0.0
+
+        degrees = np.bincount(np.concatenate([row, col]), minlength=self.num_variables)
+        self.mean_degree = float(degrees.mean()) if self.num_variables else 0.0
+        self.max_degree = int(degrees.max()) if self.num_variables else 0
+
+        coefficients = np.abs(np.concatenate([linear, quadratic]))
+        coefficients = coefficients[coefficients > 0]
+        self.min_coefficient = float(coefficients.min()) if len(coefficients) else 0.0
+        self.max_coefficient = float(coefficients.max()) if len(coefficients) else 0.0
+        self.coefficient_range = self.max_coefficient / self.min_coefficient if len(coefficients) else 1.0
+
+    def __repr__(self):
+        return "ProblemProfile(" + ", ".join(f"{key}={value}" for key, value in vars(self).items()) + ")"
+
+
+class PlatformStats:
+    """Rolling statistics of the last window solves on one platform.
+
+    Attributes
+    ----------
+    latencies
+        Wall clock time of the successful solves in seconds
+    gaps
+        Relative gap between the best energy of a response and the reference energy of the problem (if one was passed)
+    failures
+        1 for every failed solve, 0 for every successful solve
+    """
+
+    def __init__(self, window=50):
+        self.latencies = deque(maxlen=window)
+        self.gaps = deque(maxlen=window)
+        self.failures = deque(maxlen=window)
+
+    def record(self, latency=None, gap=None, failed=False):
+        self.failures.append(1 if failed else 0)
+        if not failed:
+            self.latencies.append(latency)
+            if gap is not None:
+                self.gaps.append(gap)
+
+    def latency(self, quantile=0.9):
+        """Return the given quantile of the observed latencies or None if there are no observations. """
+        return float(np.quantile(self.latencies, quantile)) if self.latencies else None
+
+    def gap(self):
+        """Return the mean observed gap or None if there are no observations. """
+        return float(np.mean(self.gaps)) if self.gaps else None
+
+    def failure_rate(self):
+        return float(np.mean(self.failures)) if self.failures else 0.0
+
+
+class Router:
+    """Choose a platform for a problem based on the problem profile and the observed latency and quality of the
+    platforms. The cheapest platform (see PLATFORM_COSTS) that can solve the problem and is expected to meet the targets
+    is used.
+
+    Attributes
+    ----------
+    platforms
+        Platforms the router chooses from
+    solvers
+        Dictionary that maps a platform to the solver that is used on it (e.g. {"fujitsu": "DAv3"})
+    costs
+        Relative cost of each platform
+    stats
+        Dictionary that maps a platform to its PlatformStats
+    pinned
+        If set, every problem is sent to this platform
+    fallback
+        Platform that is used if the chosen platform fails (e.g. "local" when working offline)
+
+    Methods
+    -------
+    choose(problem, max_latency, max_gap)
+        Return the platform for a problem
+    solve(problem, times, max_latency, max_gap, reference_energy)
+        Solve a problem on the chosen platform and record the latency and quality of the solve
+    pin(platform), unpin()
+        Send every problem to one platform / choose the platform automatically again
+    """
+
+    def __init__(self, platforms=None, solvers=None, costs=None, window=50, max_failure_rate=0.5, fallback=None):
+        self.platforms = list(platforms) if platforms is not None else list(PLATFORM_COSTS)
+        self.solvers = solvers if solvers is not None else {}
+        self.costs = dict(PLATFORM_COSTS)
+        if costs is not None:
+            self.costs.update(costs)
+        self.stats = {platform: PlatformStats(window) for platform in self.platforms}
+        self.max_failure_rate = max_failure_rate
+        self.pinned = None
+        self.fallback = fallback
+
+    def pin(self, platform):
+        """Send every problem to platform. """
+        self.pinned = platform
+        return self
+
+    def unpin(self):
+        self.pinned = None
+        return self
+
+    def eligible(self, profile):
+        """Return the platforms that can solve a problem with the given profile. """
+        result = []
+        for platform in self.platforms:
+            limit = PLATFORM_LIMITS.get(platform)
+            if platform == "dwave" and (profile.density > 0.3 or profile.max_degree >= DWAVE_CLIQUE_LIMIT):
+                limit = DWAVE_CLIQUE_LIMIT
+            if limit is not None and profile.num_variables > limit:
+                continue
+            if profile.coefficient_range > COEFFICIENT_RANGE_LIMITS.get(platform, float("inf")):
+                continue
+            if self.stats[platform].failure_rate() > self.max_failure_rate:
+                continue
+            result.append(platform)
+        return result
+
+    def choose(self, problem, max_latency=None, max_gap=None):
+        """Return the platform the problem should be solved on.
+
+        Parameters
+        ----------
+        problem: Problem
+            The problem that will be solved. If its platform is set explicitly, that platform is used.
+        max_latency: float
+            Target for the 90% quantile of the latency in seconds
+        max_gap: float
+            Target for the mean relative gap to the reference energy
+
+        Returns
+        -------
+        platform: str
+        """
+        if self.pinned is not None:
+            return self.pinned
+        if problem.platform is not None:
+            return problem.platform
+
+        candidates = self.eligible(ProblemProfile(problem))
+        if not candidates:
+            raise ValueError("No platform can solve this problem. Pin a platform to override the routing.")
+
+        def meets_targets(platform):
+            stats = self.stats[platform]
+            latency = stats.latency()
+            if latency is None:
+                latency = DEFAULT_LATENCY.get(platform, 0.0)
+            if max_latency is not None and latency > max_latency:
+                return False
+            gap = stats.gap()
+            # platforms without observed quality are given a chance
+            return max_gap is None or gap is None or gap <= max_gap
+
+        suitable = [platform for platform in candidates if meets_targets(platform)]
+        if suitable:
+            return min(suitable, key=lambda platform: self.costs.get(platform, 0.0))
+        # no platform meets the targets: use the platform with the best observed quality, unobserved platforms last
+        def observed_gap(platform):
+            gap = self.stats[platform].gap()
+            return float("inf") if gap is None else gap
+
+        return min(candidates, key=lambda platform: (observed_gap(platform), self.costs.get(platform, 0.0)))
+
+    def solve(self, problem, times=1, max_latency=None, max_gap=None, reference_energy=None):
+        """Solve a problem on the platform returned by choose() and record the latency and quality of the solve. If the
+        solve fails and a fallback platform is set, the problem is solved on the fallback platform. The platform and
+        solver of the problem and the preferred solver and platform of its connection are restored afterwards.
+
+        Parameters
+        ----------
+        problem: Problem
+            The problem that is solved
+        times: int
+            Number of samples, see Problem.solve
+        max_latency, max_gap
+            Targets, see choose()
+        reference_energy: float
+            Best known energy of the problem. If it is passed, the gap of the response is recorded.
+
+        Returns
+        -------
+        Response
+        """
+        platform = self.choose(problem, max_latency, max_gap)
+        try:
+            return self._solve_on(problem, platform, times, reference_energy)
+        except Exception:
+            if self.fallback is None or platform == self.fallback:
+                raise
+            return self._solve_on(problem, self.fallback, times, reference_energy)
+
+    def _solve_on(self, problem, platform, times, reference_energy):
+        """Solve a problem on platform with the solver of that platform and record the solve. """
+        connection = problem.connection
+        solver = problem.solver
+        explicit_platform = problem.platform
+        if connection is not None:
+            preferred = connection.preferred_solver, connection.preferred_platform
+        problem.with_platform(platform)
+        if platform in self.solvers:
+            problem.with_solver(self.solvers[platform])
+        stats = self.stats.setdefault(platform, PlatformStats())
+
+        start = time.perf_counter()
+        try:
+            response = problem.solve(times)
+        except Exception:
+            stats.record(failed=True)
+            raise
+        finally:
+            problem.platform = explicit_platform
+            problem.solver = solver
+            if connection is not None:
+                connection.preferred_solver, connection.preferred_platform = preferred
+        latency = time.perf_counter() - start
+
+        gap = None
+        if reference_energy is not None and len(response.energies):
+            gap = abs(min(response.energies) - reference_energy) / max(abs(reference_energy), 1e-12)
+        stats.record(latency, gap)
+        return response
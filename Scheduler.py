@@ -0,0 +1,275 @@
+import itertools
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+import numpy as np
+from .UQOExceptions import InsufficientQuotaException
+
+
+# Platforms that use quota and the timing entry of their responses that is charged (microseconds)
+QUOTA_PLATFORMS = {
+    "dwave": "qpu_access_time",
+    "leaphybrid": "qpu_access_time",
+}
+
+# Costs (microseconds) that are assumed for a platform before any timing data was observed. A DWave request is charged
+# the programming time once and the annealing time plus the readout for every sample.
+DWAVE_PROGRAMMING_TIME = 15000
+DWAVE_READOUT_TIME = 150
+DWAVE_ANNEALING_TIME = 20
+LEAPHYBRID_ACCESS_TIME = 50000
+
+
+class CostModel:
+    """Quota cost of the requests on one platform and solver, estimated from the timing data of past responses.
+
+    With observations for at least two different numbers of samples, a line (programming overhead plus cost per sample)
+    is fitted. With observations for a single number of samples, the largest observed cost is scaled up for more samples
+    and kept for fewer samples, which never underestimates a cost of the form overhead + samples * cost per sample.
+
+    Attributes
+    ----------
+    observations
+        The (number of samples, cost) pairs of the last window responses
+    """
+
+    def __init__(self, window=50):
+        self.observations = deque(maxlen=window)
+
+    def record(self, times, cost):
+        self.observations.append((times, cost))
+
+    def estimate(self, times):
+        """Return the estimated cost of a request with times samples or None if there are no observations. """
+        if not self.observations:
+            return None
+        samples, costs = np.array(self.observations, dtype=np.float64).T
+        if len(np.unique(samples)) > 1:
+            slope, intercept = np.polyfit(samples, costs, 1)
+            return float(max(intercept, 0.0) + max(slope, 0.0) * times)
+        return float(costs.max() * max(1.0, times / samples[0]))
+
+
+class Job:
+    """A problem that is solved by the QuotaScheduler.
+
+    Attributes
+    ----------
+    problem, times
+        The problem and the number of samples, see Problem.solve
+    value
+        Priority of the job, jobs with a higher value are solved first
+    name
+        Name of the job (default: the submission number)
+    status
+        "pending", "running", "done" or "failed"
+    estimate
+        Estimated quota cost when the job was admitted
+    cost
+        Quota that was charged for the job
+    response
+        Response of the job once it is done
+    error
+        Exception raised by the job if it failed
+    """
+
+    def __init__(self, problem, times, value, name, order):
+        self.problem = problem
+        self.times = times
+        self.value = value
+        self.name = name
+        self.status = "pending"
+        self.estimate = None
+        self.cost = None
+        self.response = None
+        self.error = None
+        self.order = order
+
+    def __repr__(self):
+        return f"Job(name={self.name!r}, value={self.value}, status={self.status!r}, estimate={self.estimate}, " \
+               f"cost={self.cost})"
+
+
+class QuotaScheduler:
+    """Solve a batch of problems without running out of quota halfway.
+
+    The cost of every job is estimated from the timing data of the responses of earlier jobs on the same platform and
+    solver (see CostModel and QUOTA_PLATFORMS), multiplied by a safety factor. The pending jobs are run in order of
+    decreasing value; a job is only started if its estimate fits into the remaining quota (the quota of the server,
+    optionally capped by a budget, minus a reserve) including the estimates of the jobs that are still running. When no
+    pending job fits, the scheduler pauses and run() returns. The pending jobs stay in the queue, run() can be called
+    again later (e.g. after the quota was raised).
+
+    Attributes
+    ----------
+    config
+        Config that is used to request the quota of the user. If None, only the budget is used.
+    budget
+        Maximum quota (microseconds) the scheduler may spend in total
+    reserve
+        Quota (microseconds) that is never spent
+    safety
+        Factor the estimated costs are multiplied with
+    workers
+        Number of jobs that run at the same time
+    jobs
+        All submitted jobs
+    spent
+        Quota that was charged for the finished jobs
+    paused
+        True if the last run() stopped with pending jobs, because none of them fitted into the remaining quota
+
+    Methods
+    -------
+    submit(problem, times, value, name)
+        Add a job and return it
+    estimate(problem, times)
+        Return the estimated quota cost of solving a problem
+    remaining()
+        Return the quota that can still be spent
+    run()
+        Solve the pending jobs that fit into the quota and return the jobs that finished
+    """
+
+    def __init__(self, config=None, budget=None, reserve=0, safety=1.25, workers=1, window=50):
+        self.config = config
+        self.budget = budget
+        self.reserve = reserve
+        self.safety = safety
+        self.workers = workers
+        self.window = window
+        self.jobs = []
+        self.cost_models = {}
+        self.spent = 0
+        self.paused = False
+        self.quota = None
+        self.spent_since_refresh = 0
+        self._counter = itertools.count()
+
+    def submit(self, problem, times=1, value=1.0, name=None):
+        """Add a job to the queue.
+
+        Parameters
+        ----------
+        problem: Problem
+            The problem that is solved. Its platform and solver have to be set.
+        times: int
+            Number of samples
+        value: float
+            Priority of the job, jobs with a higher value are solved first
+        name
+            Name of the job
+
+        Returns
+        -------
+        Job
+        """
+        number = next(self._counter)
+        job = Job(problem, times, value, name if name is not None else number, number)
+        self.jobs.append(job)
+        return job
+
+    def pending(self):
+        return [job for job in self.jobs if job.status == "pending"]
+
+    def _prior(self, problem, times):
+        if problem.platform == "dwave":
+            annealing_time = problem.solver_params.get("annealing_time", DWAVE_ANNEALING_TIME)
+            return DWAVE_PROGRAMMING_TIME + times * (annealing_time + DWAVE_READOUT_TIME)
+        return LEAPHYBRID_ACCESS_TIME
+
+    def estimate(self, problem, times=1):
+        """Return the estimated quota cost (microseconds, including the safety factor) of solving a problem. Platforms
+        that do not use quota cost 0. """
+        if problem.platform not in QUOTA_PLATFORMS:
+            return 0
+        model = self.cost_models.get((problem.platform, problem.solver))
+        cost = model.estimate(times) if model is not None else None
+        if cost is None:
+            cost = self._prior(problem, times)
+        return cost * self.safety
+
+    def _record(self, job):
+        key = QUOTA_PLATFORMS.get(job.problem.platform)
+        if key is None:
+            job.cost = 0
+            return
+        timing = getattr(job.response, "timing", None) or {}
+        job.cost = timing.get(key, job.estimate)
+        if key in timing:
+            model = self.cost_models.setdefault((job.problem.platform, job.problem.solver), CostModel(self.window))
+            model.record(job.times, job.cost)
+
+    def refresh(self):
+        """Request the quota of the user from the server. """
+        if self.config is not None:
+            self.quota = self.config.create_connection().get_quota()
+            self.spent_since_refresh = 0
+        return self.quota
+
+    def remaining(self):
+        """Return the quota (microseconds) that can still be spent, the reserve is already subtracted. """
+        limits = []
+        if self.quota is not None:
+            limits.append(self.quota - self.spent_since_refresh)
+        if self.budget is not None:
+            limits.append(self.budget - self.spent)
+        return (min(limits) if limits else float("inf")) - self.reserve
+
+    def _solve(self, job):
+        return job.problem.solve(job.times)
+
+    def run(self):
+        """Solve the pending jobs in order of decreasing value as long as their estimated costs fit into the remaining
+        quota.
+
+        Returns
+        -------
+        list of Job
+            The jobs that finished (status "done" or "failed") in this call. Jobs that did not fit stay pending and
+            paused is set to True.
+        """
+        self.refresh()
+        finished = []
+        running = {}
+        committed = 0
+        quota_exhausted = False
+
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            while True:
+                if not quota_exhausted:
+                    for job in sorted(self.pending(), key=lambda job: (-job.value, job.order)):
+                        if len(running) >= self.workers:
+                            break
+                        estimate = self.estimate(job.problem, job.times)
+                        if estimate > self.remaining() - committed:
+                            continue
+                        job.estimate = estimate
+                        job.status = "running"
+                        committed += estimate
+                        running[executor.submit(self._solve, job)] = job
+                if not running:
+                    break
+
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    job = running.pop(future)
+                    committed -= job.estimate
+                    try:
+                        job.response = future.result()
+                    except InsufficientQuotaException:
+                        # the estimate was too low: put the job back and stop admitting jobs
+                        job.status = "pending"
+                        quota_exhausted = True
+                        continue
+                    except Exception as error:
+                        job.status, job.error = "failed", error
+                        finished.append(job)
+                        continue
+                    job.status = "done"
+                    self._record(job)
+                    self.spent += job.cost
+                    self.spent_since_refresh += job.cost
+                    finished.append(job)
+
+        self.paused = bool(self.pending())
+        return finished
@@ -0,0 +1,184 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+
+
+class TuningResult:
+    """Result of a PenaltyTuner run.
+
+    Attributes
+    ----------
+    problem
+        The Qubo or Ising built with the tuned penalty weights
+    penalties
+        The tuned penalty weights
+    best
+        Evidence entry of the chosen weights
+    evidence
+        One dictionary per evaluated set of weights with the keys "round", "penalties", "feasible_fraction",
+        "best_objective", "mean_objective", "violation_rates" and "seconds"
+    """
+
+    def __init__(self, problem, penalties, best, evidence):
+        self.problem = problem
+        self.penalties = penalties
+        self.best = best
+        self.evidence = evidence
+
+    def __repr__(self):
+        return f"TuningResult(penalties={self.penalties}, feasible_fraction={self.best['feasible_fraction']}, " \
+               f"best_objective={self.best['best_objective']}, evaluations={len(self.evidence)})"
+
+
+class PenaltyTuner:
+    """Search penalty weights that make the samples of a cheap platform feasible without drowning the objective.
+
+    Every round evaluates several candidate sets of weights concurrently: the current weights, the weights of the most
+    often violated constraints multiplied by factor and all weights divided by factor. For every candidate the problem
+    is built and solved with times samples, the fraction of feasible samples and the objective of the feasible samples
+    are measured. The best candidate is the one with the best feasible objective among those that reach
+    target_feasibility (otherwise the one with the highest feasible fraction). If the current weights stay the best,
+    the factor is refined (square root), the search stops when it is below min_factor or after max_rounds.
+
+    The problem is either a Model (the penalties of its constraints are tuned, feasibility and objective come from
+    the model), or it is described by two functions: build(penalties) returns the problem for a dictionary of weights
+    and evaluate(problem, response) returns the feasibility (bool array), the objective (float array) and optionally a
+    dictionary of per-constraint violation flags (bool arrays) of the samples.
+
+    Attributes
+    ----------
+    platform, solver, params, times
+        Platform, solver, solver parameters and number of samples of the solves
+    workers
+        Number of solves that run at the same time
+    target_feasibility
+        Fraction of feasible samples that is required
+    factor, min_factor, max_rounds
+        Step size, smallest step size and maximum number of rounds of the search
+
+    Methods
+    -------
+    tune(penalties)
+        Run the search starting with the given weights and return a TuningResult
+    """
+
+    def __init__(self, model=None, build=None, evaluate=None, config=None, platform="local", solver=None, params=None,
+                 times=20, workers=4, target_feasibility=0.9, factor=4.0, min_factor=1.2, max_rounds=8):
+        if model is None and (build is None or evaluate is None):
+            raise ValueError("Pass a Model or the functions build and evaluate")
+        self.model = model
+        self.build = build
+        self.evaluate = evaluate
+        self.config = config
+        self.platform = platform
+        self.solver = solver
+        self.params = params if params is not None else {}
+        self.times = times
+        self.workers = workers
+        self.target_feasibility = target_feasibility
+        self.factor = factor
+        self.min_factor = min_factor
+        self.max_rounds = max_rounds
+
+    def _build(self, penalties):
+        if self.model is None:
+            return self.build(penalties)
+        return self.model.compile(self.config, penalties=penalties)
+
+    def _evaluate(self, problem, response):
+        if self.model is None:
+            result = self.evaluate(problem, response)
+            return result if len(result) == 3 else (result[0], result[1], {})
+        values = self.model.values(response)
+        violated = self.model.violations(values) > 1e-9
+        violations = {constraint.name: violated[:, k] for k, constraint in enumerate(self.model.constraints)}
+        return ~violated.any(axis=1), self.model.evaluate(values), violations
+
+    def _run(self, penalties, round_number):
+        """Build and solve the problem with the given weights and return its evidence entry. """
+        start = time.perf_counter()
+        problem = self._build(penalties)
+        problem.with_platform(self.platform).with_params(**self.params)
+        if self.solver is not None:
+            problem.with_solver(self.solver)
+        response = problem.solve(self.times)
+        feasible, objective, violations = self._evaluate(problem, response)
+        feasible = np.asarray(feasible, dtype=bool)
+        objective = np.asarray(objective, dtype=np.float64)
+        # samples are weighted with their number of occurrences
+        occurrences = response.sampleset.record.num_occurrences
+        total = occurrences.sum()
+        return {
+            "round": round_number,
+            "penalties": dict(penalties),
+            "feasible_fraction": float(occurrences[feasible].sum() / total) if total else 0.0,
+            "best_objective": float(objective[feasible].min()) if feasible.any() else None,
+            "mean_objective": float(np.average(objective[feasible], weights=occurrences[feasible]))
+            if feasible.any() else None,
+            "violation_rates": {name: float(occurrences[np.asarray(flags, dtype=bool)].sum() / total)
+                                for name, flags in violations.items()},
+            "seconds": time.perf_counter() - start,
+        }
+
+    def _score(self, entry):
+        """Sort key of an evidence entry, smaller is better. """
+        if entry["feasible_fraction"] >= self.target_feasibility:
+            # without feasible samples (possible with target_feasibility 0) there is no objective to compare
+            objective = entry["best_objective"] if entry["best_objective"] is not None else float("inf")
+            return 0, objective, sum(entry["penalties"].values())
+        # below the target, fewer violations and (on a tie) larger penalties are better
+        return 1, -entry["feasible_fraction"], sum(entry["violation_rates"].values()), -sum(entry["penalties"].values())
+
+    def _candidates(self, penalties, current, factor):
+        candidates = [dict(penalties), {name: weight / factor for name, weight in penalties.items()}]
+        rates = current["violation_rates"] if current is not None else {}
+        violated = sorted((name for name in penalties if rates.get(name, 0.0) > 0),
+                          key=lambda name: -rates[name])
+        if violated:
+            for name in violated[:max(1, self.workers - 3)]:
+                candidates.append({**penalties, name: penalties[name] * factor})
+        if current is None or current["feasible_fraction"] < self.target_feasibility or not violated:
+            candidates.append({name: weight * factor for name, weight in penalties.items()})
+        return candidates
+
+    def tune(self, penalties=None):
+        """Search penalty weights.
+
+        Parameters
+        ----------
+        penalties: dict
+            Initial weights (name -> weight). With a Model, the current penalties of its constraints are used by
+            default.
+
+        Returns
+        -------
+        TuningResult
+        """
+        if penalties is None:
+            if self.model is None:
+                raise ValueError("Initial penalties are required if no Model is passed")
+            penalties = {constraint.name: constraint.penalty for constraint in self.model.constraints}
+        penalties = dict(penalties)
+
+        evidence = []
+        current = None
+        factor = self.factor
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            for round_number in range(self.max_rounds):
+                candidates = self._candidates(penalties, current, factor)
+                entries = list(executor.map(lambda candidate: self._run(candidate, round_number), candidates))
+                evidence.extend(entries)
+                best = min(entries, key=self._score)
+                if current is not None and self._score(current) <= self._score(best):
+                    best = current
+                if best is current or best["penalties"] == penalties:
+                    factor = np.sqrt(factor)
+                    if factor < self.min_factor:
+                        current = best
+                        break
+                current, penalties = best, dict(best["penalties"])
+
+        if self.model is not None:
+            for constraint in self.model.constraints:
+                constraint.penalty = current["penalties"][constraint.name]
+        return TuningResult(self._build(current["penalties"]), current["penalties"], current, evidence)
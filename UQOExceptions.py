@@ -18,6 +18,12 @@ class InvalidFujitsuSolverException(UQOException):
         UQOException.__init__(self, message)
 
 
+class InvalidEmbeddingException(UQOException):
+    def __init__(self, errors):
+        message = "\n\nThe embedding is not valid for the solver:\n" + "\n".join(errors)
+        UQOException.__init__(self, message)
+
+
 # ------------ AUTH - EXCEPTIONS ------------ #
 
 
@@ -156,3 +162,11 @@ class LeapHybridException(UQOException):
     def __init__(self, answer_details):
         message = "\n\nError while accessing Leap Hybrid Solver:\n" + answer_details["message"]
         UQOException.__init__(self, message)
+
+
+# ------------  CONNECTION ------------ #
+
+class NoEndpointAvailableException(UQOException):
+    def __init__(self, failures):
+        message = "\n\nNo endpoint answered the request:\n" + "\n".join(failures)
+        UQOException.__init__(self, message)
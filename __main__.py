@@ -0,0 +1,159 @@
+"""Command line interface of UQO.
+
+    python -m uqo solve-batch PROBLEMS... --output DIR [--platform local] [--solver NAME] [--param KEY=VALUE] ...
+
+solve-batch reads problem files (see Loaders.load_problem) from files, directories or glob patterns, solves them
+concurrently and writes one result file per problem (npz, arrow or parquet, see Response.to_npz) and a summary.csv to
+the output directory. The result files keep the directory structure of the problem files below their common directory.
+"""
+import os
+import sys
+import csv
+import json
+import glob
+import time
+import argparse
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import dimod
+from .Loaders import load_problem, FORMATS
+
+
+def parse_param(text):
+    """Parse KEY=VALUE, the value is read as JSON if possible and as a string otherwise. """
+    key, separator, value = text.partition("=")
+    if not separator:
+        raise argparse.ArgumentTypeError(f"Parameter '{text}' is not of the form KEY=VALUE")
+    try:
+        return key, json.loads(value)
+    except ValueError:
+        return key, value
+
+
+def find_problem_files(inputs):
+    """Return the sorted problem files of the given files, directories and glob patterns. """
+    files = set()
+    for entry in inputs:
+        if os.path.isdir(entry):
+            candidates = [os.path.join(entry, name) for name in os.listdir(entry)]
+        elif os.path.isfile(entry):
+            files.add(entry)
+            continue
+        else:
+            candidates = glob.glob(entry, recursive=True)
+        files.update(path for path in candidates
+                     if os.path.isfile(path) and os.path.splitext(path)[1].lower() in FORMATS)
+    return sorted(files)
+
+
+def output_names(files):
+    """Return the name of the result file (without extension) of every problem file. The names are the paths relative
+    to the common directory of the files without the extension (sub/a for in/sub/a.txt), files that would get the same
+    name keep their extension (a.qubo and a.txt). """
+    root = os.path.commonpath([os.path.dirname(os.path.abspath(path)) for path in files])
+    relative = [os.path.relpath(os.path.abspath(path), root) for path in files]
+    stems = [os.path.splitext(path)[0] for path in relative]
+    counts = Counter(stems)
+    names = [stem if counts[stem] == 1 else path for stem, path in zip(stems, relative)]
+    if len(set(names)) < len(names):
+        duplicates = sorted(name for name, count in Counter(names).items() if count > 1)
+        raise ValueError(f"Problem files would overwrite each other's results: {', '.join(duplicates)}")
+    return dict(zip(files, names))
+
+
+def solve_file(path, name, args, config):
+    """Load, solve and export one problem to the result file name. Returns a row of the summary. """
+    start = time.perf_counter()
+    row = {"problem": path, "status": "done", "num_variables": None, "best_energy": None, "num_samples": None,
+           "seconds": None, "output": None, "error": None}
+    try:
+        problem = load_problem(path, config, dimod.SPIN if args.ising else None)
+        problem.with_platform(args.platform).with_params(**dict(args.param))
+        if args.solver is not None:
+            problem.with_solver(args.solver)
+        row["num_variables"] = len(problem.variables())
+        response = problem.solve(args.times)
+
+        output = os.path.join(args.output, f"{name}.{args.format}")
+        os.makedirs(os.path.dirname(output), exist_ok=True)
+        getattr(response, f"to_{args.format}")(output, packed=not args.unpacked)
+        energies = response.sampleset.record.energy
+        row.update(best_energy=float(energies.min()) if len(energies) else None, num_samples=len(energies),
+                   output=output)
+    except Exception as error:
+        row.update(status="failed", error=repr(error))
+    row["seconds"] = round(time.perf_counter() - start, 3)
+    return row
+
+
+def solve_batch(args):
+    files = find_problem_files(args.problems)
+    if not files:
+        print("No problem files found", file=sys.stderr)
+        return 1
+    try:
+        names = output_names(files)
+    except ValueError as error:
+        print(error, file=sys.stderr)
+        return 1
+    os.makedirs(args.output, exist_ok=True)
+
+    config = None
+    if args.config is not None:
+        from .client.config import Config
+        config = Config(configpath=args.config)
+
+    rows = []
+    with ThreadPoolExecutor(max_workers=args.workers) as executor:
+        futures = [executor.submit(solve_file, path, names[path], args, config) for path in files]
+        for count, future in enumerate(as_completed(futures), 1):
+            row = future.result()
+            rows.append(row)
+            if not args.quiet:
+                result = row["error"] if row["status"] == "failed" else f"best energy {row['best_energy']}"
+                print(f"[{count}/{len(files)}] {row['problem']}: {row['status']}, {result} ({row['seconds']} s)",
+                      file=sys.stderr, flush=True)
+
+    rows.sort(key=lambda row: row["problem"])
+    with open(os.path.join(args.output, "summary.csv"), "w", newline="") as file:
+        writer = csv.DictWriter(file, fieldnames=list(rows[0]))
+        writer.writeheader()
+        writer.writerows(rows)
+
+    failed = sum(row["status"] == "failed" for row in rows)
+    if not args.quiet:
+        print(f"{len(rows) - failed} of {len(rows)} problems solved, results in {args.output}", file=sys.stderr)
+    return 1 if failed else 0
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="python -m uqo", description="UQO command line interface")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    batch = commands.add_parser("solve-batch", help="Solve all problem files of a directory or glob pattern",
+                                description="Solve problem files (" + ", ".join(sorted(FORMATS)) + ") concurrently.")
+    batch.add_argument("problems", nargs="+", help="Problem files, directories or glob patterns")
+    batch.add_argument("-o", "--output", required=True, help="Directory for the results and summary.csv")
+    batch.add_argument("-c", "--config", help="Config file (not needed for the local platform)")
+    batch.add_argument("-p", "--platform", default="local", help="Platform (default: local)")
+    batch.add_argument("-s", "--solver", help="Solver of the platform")
+    batch.add_argument("--param", action="append", type=parse_param, default=[], metavar="KEY=VALUE",
+                       help="Solver parameter, the value is parsed as JSON (can be repeated)")
+    batch.add_argument("-n", "--times", type=int, default=1, help="Number of samples per problem")
+    batch.add_argument("-w", "--workers", type=int, default=4, help="Number of problems solved at the same time")
+    batch.add_argument("-f", "--format", choices=["npz", "arrow", "parquet"], default="npz",
+                       help="Format of the result files")
+    batch.add_argument("--unpacked", action="store_true", help="Store the samples as int8 instead of packed bits")
+    batch.add_argument("--ising", action="store_true", help="Read COO files as Ising problems")
+    batch.add_argument("-q", "--quiet", action="store_true", help="Do not print the progress")
+    batch.set_defaults(function=solve_batch)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    return args.function(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,107 @@
+"""Compare the decoding of solver replies: json.loads, SampleSet.from_serializable on nested lists and the lists the
+Response used to build on creation (the former path of send_message and solve_qubo) against codec.decode_reply, for
+10^5 samples of 5000 variables, and json.loads followed by codec.embedding_arrays against codec.decode_reply for an
+embedding of 5000 variables.
+
+Run with: python -m uqo.benchmarks.decoding
+"""
+import gc
+import json
+import time
+import numpy as np
+import dimod
+from dimod.sampleset import SampleSet
+from ..client import codec
+from ..Problem import Qubo
+from ..Response import Response, DWaveResponse
+
+
+def solve_reply(num_samples, num_variables, seed=0):
+    """A reply of the server to a solve request as it arrives on the socket. """
+    rng = np.random.default_rng(seed)
+    samples = rng.integers(0, 2, (num_samples, num_variables), dtype=np.int8)
+    sampleset = dimod.SampleSet.from_samples((samples, list(range(num_variables))), dimod.BINARY,
+                                             energy=rng.normal(size=num_samples),
+                                             num_occurrences=rng.integers(1, 10, num_samples),
+                                             info={"timing": {"qpu_access_time": 12345.0}})
+    del samples
+    reply = {"status": "success", "solver": "DWaveSolver", "solver_details": {"answer": sampleset.to_serializable()}}
+    return json.dumps(reply).encode("utf8")
+
+
+def embedding_reply(num_variables, chain_length, seed=0):
+    """A reply of the server to a find embedding request. """
+    qubits = np.random.default_rng(seed).permutation(num_variables * chain_length).reshape(num_variables, chain_length)
+    embedding = {str(i): chain for i, chain in enumerate(qubits.tolist())}
+    return json.dumps({"status": "success", "solver_details": {"embedding": embedding}}).encode("utf8")
+
+
+def former_lists(response):
+    """The lists Response.__init__ used to build for every response. """
+    sampleset = response.sampleset
+    return (list(sampleset.samples()), list(map(lambda x: x.energy, list(sampleset.data(fields=["energy"])))),
+            list(map(lambda x: x.num_occurrences, list(sampleset.data(fields=["num_occurrences"])))))
+
+
+def former_solve(raw, problem):
+    answer = json.loads(raw)
+    response = Response(SampleSet.from_serializable(answer["solver_details"]["answer"]))
+    former_lists(response)
+    response = problem.decode_response(response)
+    former_lists(response)
+    return response
+
+
+def direct_solve(raw, problem):
+    answer = codec.decode_reply(raw)
+    return problem.decode_response(DWaveResponse(answer["solver_details"]["answer"]))
+
+
+def former_embedding(raw, problem):
+    return codec.embedding_arrays(json.loads(raw)["solver_details"]["embedding"])
+
+
+def direct_embedding(raw, problem):
+    return codec.decode_reply(raw, embeddings=True)["solver_details"]["embedding"]
+
+
+def measure(function, raw, problem, repeat):
+    """Best time of repeat calls in seconds and the result of the last call. """
+    best = float("inf")
+    for _ in range(repeat):
+        result = None
+        gc.collect()
+        start = time.perf_counter()
+        result = function(raw, problem)
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main(num_samples=10 ** 5, num_variables=5000, chain_length=8, repeat=1):
+    backend = "orjson" if codec.orjson is not None else "json"
+    print(f"backend: {backend}")
+    problem = Qubo.from_arrays(None, np.zeros(num_variables), (np.zeros(0, dtype=np.int64),) * 2 + (np.zeros(0),))
+
+    raw = solve_reply(num_samples, num_variables)
+    gc.collect()
+    former, expected = measure(former_solve, raw, problem, repeat)
+    expected = expected.sampleset.record
+    direct, result = measure(direct_solve, raw, problem, repeat)
+    assert np.array_equal(result.sampleset.record.sample, expected.sample)
+    assert np.array_equal(result.sampleset.record.energy, expected.energy)
+    del expected, result
+    print(f"solve reply, {num_samples} samples x {num_variables} variables ({len(raw) / 2 ** 20:.0f} MiB): "
+          f"former {former:.2f}s, decode_reply {direct:.2f}s, {former / direct:.1f}x")
+    del raw
+
+    raw = embedding_reply(num_variables, chain_length)
+    former, expected = measure(former_embedding, raw, problem, max(repeat, 5))
+    direct, result = measure(direct_embedding, raw, problem, max(repeat, 5))
+    assert all(np.array_equal(a, b) for a, b in zip(result, expected))
+    assert problem.decode_embedding(result) == problem.decode_embedding(json.loads(raw)["solver_details"]["embedding"])
+    print(f"embedding reply to CSR arrays, {num_variables} chains of {chain_length} qubits: "
+          f"former {former * 1000:.1f}ms, decode_reply {direct * 1000:.1f}ms, {former / direct:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
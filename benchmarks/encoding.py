@@ -0,0 +1,92 @@
+"""Compare the serialization of solve messages: Connection.to_json followed by json.dumps (the former path of
+send_message) against codec.encode_message, for large QUBOs with and without an embedding and with and without tuple
+keys in the solver parameters.
+
+Run with: python -m uqo.benchmarks.encoding
+"""
+import json
+import time
+import numpy as np
+from ..client import codec
+from ..client.connection import Connection
+from ..Problem import Qubo
+
+
+def random_qubo(num_variables, degree, seed=0):
+    """Array-backed Qubo with about num_variables * degree / 2 random quadratic terms. """
+    rng = np.random.default_rng(seed)
+    num_terms = num_variables * degree // 2
+    row = rng.integers(0, num_variables, num_terms)
+    col = rng.integers(0, num_variables, num_terms)
+    keep = row != col
+    return Qubo.from_arrays(None, rng.normal(size=num_variables),
+                            (row[keep], col[keep], rng.normal(size=int(keep.sum()))))
+
+
+def random_embedding(num_variables, chain_length, seed=0):
+    """Embedding of num_variables variables into disjoint chains of qubits. """
+    qubits = np.random.default_rng(seed).permutation(num_variables * chain_length).reshape(num_variables, chain_length)
+    return {i: chain for i, chain in enumerate(qubits.tolist())}
+
+
+def tuple_key_params(problem):
+    """Solver parameters with a dictionary keyed by the quadratic terms (tuples) of the problem. """
+    _, _, (row, col, _), _ = problem.to_arrays()
+    return {"num_reads": 100, "coupler_weights": {(int(i), int(j)): 1.0 for i, j in zip(row, col)}}
+
+
+def solve_message(problem, embedding=None, solver_params=None):
+    """The message send_message receives for a solve request (see Connection.get_task_details_message). """
+    task_details = {
+        "type": "qubo",
+        "task": "solve",
+        "platform": "dwave",
+        "value": problem.to_json(),
+        "params": {"uq_params": {}, "solver_params": solver_params or {"num_reads": 100}},
+    }
+    if embedding is not None:
+        task_details["embedding"] = embedding
+    return {"authentication": {"method": "token", "credentials": "token"}, "task_details": task_details,
+            "task": "solve"}
+
+
+# to_json does not use the attributes of the connection, no socket or rate limiter is needed
+_connection = Connection.__new__(Connection)
+
+
+def former_path(message):
+    """Connection.to_json and the json.dumps of socket.send_json. """
+    return json.dumps(_connection.to_json(message)).encode("utf8")
+
+
+def measure(function, message, repeat):
+    """Best time of repeat calls in seconds. """
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function(message)
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def main(sizes=(1000, 10000, 100000), degree=20, chain_length=4, repeat=5):
+    backend = "orjson" if codec.orjson is not None else "json"
+    print(f"backend: {backend}")
+    print(f"{'variables':>10} {'embedding':>10} {'tuple keys':>10} {'bytes':>12} {'to_json+dumps':>14} "
+          f"{'encode_message':>15} {'speedup':>8}")
+    for num_variables in sizes:
+        problem = random_qubo(num_variables, degree)
+        cases = [(embedding, solver_params) for embedding in (None, random_embedding(num_variables, chain_length))
+                 for solver_params in (None, tuple_key_params(problem))]
+        for embedding, solver_params in cases:
+            message = solve_message(problem, embedding, solver_params)
+            assert json.loads(codec.encode_message(message)) == json.loads(former_path(message))
+            former = measure(former_path, message, repeat)
+            single = measure(codec.encode_message, message, repeat)
+            print(f"{num_variables:>10d} {'yes' if embedding else 'no':>10} "
+                  f"{'yes' if solver_params else 'no':>10} {len(former_path(message)):>12d} "
+                  f"{former * 1000:>12.1f}ms {single * 1000:>13.1f}ms {former / single:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""Check Problem.presolve against brute force: for random small QUBOs and Isings the optimum of the presolved problem
+(plus the energy of the fixed variables) has to equal the optimum of the original problem, and the expanded optimal
+sample has to have that energy in the original problem. Reports how much the problems shrank.
+
+Run with: python -m uqo.benchmarks.presolve
+"""
+import itertools
+import numpy as np
+import dimod
+from ..LocalSolver import energies
+from ..Problem import Qubo, Ising
+from ..Response import Response
+
+
+def all_samples(num_variables, vartype):
+    samples = np.array(list(itertools.product((0, 1), repeat=num_variables)), dtype=np.int8).reshape(-1, num_variables)
+    return 2 * samples - 1 if vartype is dimod.SPIN else samples
+
+
+def optimum(problem):
+    """Lowest energy and one optimal sample (ordered like problem.variables()) of a problem. """
+    variables, linear, (row, col, quadratic), offset = problem.to_arrays()
+    samples = all_samples(len(variables), problem.vartype)
+    sample_energies = energies(samples, linear, row, col, quadratic, offset)
+    best = int(np.argmin(sample_energies))
+    return float(sample_energies[best]), samples[best]
+
+
+def random_problem(rng, num_variables, spin):
+    """Problem with small integer coefficients, so that ties (and the weak persistency conditions) are frequent. """
+    linear = {i: int(rng.integers(-2, 3)) for i in range(num_variables)}
+    quadratic = {(i, j): int(rng.integers(-2, 3)) for i, j in itertools.combinations(range(num_variables), 2)
+                 if rng.random() < 0.4}
+    if spin:
+        return Ising(None, linear, quadratic)
+    qubo = {(i, i): bias for i, bias in linear.items()}
+    qubo.update(quadratic)
+    return Qubo(None, qubo)
+
+
+def check(problem):
+    """Assert that presolving keeps the optimum and return the presolve report. """
+    expected, _ = optimum(problem)
+    reduced = problem.presolve()
+    info = reduced.presolve_info
+    if info.kept:
+        best, sample = optimum(reduced)
+        sampleset = dimod.SampleSet.from_samples((sample[None, :], reduced.variables()), problem.vartype,
+                                                 energy=[best])
+        response = info.expand(Response(sampleset))
+    else:
+        response = info.expand()
+    energy = float(response.sampleset.record.energy[0])
+    assert np.isclose(energy, expected), (problem.to_bqm(), energy, expected)
+    assert np.isclose(problem.to_bqm().energy(response.sampleset.first.sample), expected), problem.to_bqm()
+    return info.report
+
+
+def main(num_problems=300, num_variables=6, seed=0):
+    rng = np.random.default_rng(seed)
+    # no isolated variable in the first problem, a variable fixed to 1 by linear + positive <= 0 in the second
+    check(Qubo(None, {(0, 0): 5, (1, 1): -1, (0, 1): 1}))
+    check(Qubo(None, {(0, 1): 0, (0, 2): -1, (1, 1): 2, (3, 3): 1}))
+    for spin in (False, True):
+        reports = [check(random_problem(rng, num_variables, spin)) for _ in range(num_problems)]
+        reduction = np.mean([report["variable_reduction"] for report in reports])
+        print(f"{'ising' if spin else 'qubo'}: {num_problems} problems of {num_variables} variables match the brute "
+              f"force optimum, mean variable reduction {reduction:.0%}")
+
+
+if __name__ == "__main__":
+    main()
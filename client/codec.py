@@ -0,0 +1,295 @@
+import re
+import json
+import warnings
+import numpy as np
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def _default(obj):
+    """Serialize the NumPy types the JSON backends do not know. """
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    if isinstance(obj, np.generic):
+        return obj.item()
+    if isinstance(obj, (set, frozenset)):
+        return list(obj)
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+if orjson is not None:
+    _ORJSON_OPTIONS = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+
+    def _dumps(obj):
+        return orjson.dumps(obj, default=_default, option=_ORJSON_OPTIONS)
+
+    def _loads(data):
+        # orjson rejects the NaN and Infinity literals that json.dumps writes for non-finite floats
+        try:
+            return orjson.loads(data)
+        except orjson.JSONDecodeError:
+            return json.loads(data)
+else:
+    _json_encoder = json.JSONEncoder(separators=(",", ":"), default=_default)
+
+    def _dumps(obj):
+        return _json_encoder.encode(obj).encode("utf8")
+
+    _loads = json.loads
+
+
+def _key(key):
+    """Return a dictionary key as the string it is sent as. Tuples become str(key) (the variable pairs of a QUBO),
+    the other keys are converted like json.dumps does. """
+    if isinstance(key, str):
+        return key
+    if isinstance(key, tuple):
+        return str(key)
+    if isinstance(key, np.generic):
+        key = key.item()
+    if key is True:
+        return "true"
+    if key is False:
+        return "false"
+    if key is None:
+        return "null"
+    if isinstance(key, int):
+        return str(int(key))
+    if isinstance(key, float):
+        return float.__repr__(key)
+    raise TypeError(f"Keys must be str, int, float, bool, None or tuple, not {type(key).__name__}")
+
+
+def _backend_key(key):
+    """True if both backends accept the dictionary key as it is. """
+    return isinstance(key, (str, int, float)) or key is None
+
+
+def _find_converted(obj, converted):
+    """Map the ids of obj and of the dictionaries nested in its values whose keys have to be converted, because they or
+    a dictionary nested in them contain keys the backends reject (tuples), to whether a nested dictionary needs the
+    conversion too. Lists are not searched. Returns True if obj is one of them. """
+    if not isinstance(obj, dict):
+        return False
+    nested = False
+    for value in obj.values():
+        if isinstance(value, dict) and _find_converted(value, converted):
+            nested = True
+    if nested or not all(map(_backend_key, obj)):
+        converted[id(obj)] = nested
+        return True
+    return False
+
+
+def _encode(obj, chunks, converted):
+    """Append the serialization of obj to chunks. Dictionaries in converted are written with converted keys, either
+    key by key if a nested dictionary needs the conversion too or as a shallow copy in one call of the backend. Every
+    other value is serialized in one call of the backend, so each value is serialized exactly once. """
+    nested = converted.get(id(obj))
+    if nested is None:
+        chunks.append(_dumps(obj))
+        return
+    if not nested:
+        chunks.append(_dumps({_key(key): value for key, value in obj.items()}))
+        return
+    chunks.append(b"{")
+    separator = b""
+    for key, value in obj.items():
+        chunks.append(separator)
+        chunks.append(_dumps(_key(key)))
+        chunks.append(b":")
+        _encode(value, chunks, converted)
+        separator = b","
+    chunks.append(b"}")
+
+
+def encode_message(message):
+    """Serialize a message for the server in a single pass.
+
+    Tuple keys of (nested) dictionaries are converted to strings while the message is written, instead of copying the
+    message first. The keys of the dictionaries are checked once before writing: only the dictionaries on the path to
+    a dictionary with tuple keys are written key by key, the dictionary itself as a shallow copy with converted keys.
+    All other values (e.g. the serialized problem and the embedding) are handed to the backend as a whole, so every
+    value is serialized once. The values are serialized with orjson if it is installed, with the json module
+    otherwise. NumPy arrays and scalars are serialized as lists and numbers.
+
+    The backends differ for non-finite floats: orjson writes NaN and Infinity as null, the json module writes the
+    non-standard literals NaN and Infinity. Biases and parameters are expected to be finite, check them before
+    solving if they are computed.
+
+    Parameters
+    ----------
+    message: dict
+        The message
+
+    Returns
+    -------
+    bytes
+        The UTF-8 encoded JSON document
+    """
+    converted = {}
+    _find_converted(message, converted)
+    chunks = []
+    _encode(message, chunks, converted)
+    return b"".join(chunks)
+
+
+# ------------------ Decoding ------------------ #
+
+# Start of the (nested) list of a serialized NumPy array ({"type": "array", "data": [...], ...}) and of an embedding
+_ARRAY_START = re.compile(rb'"data"\s*:\s*\[')
+_EMBEDDING_START = re.compile(rb'"embedding"\s*:\s*\{')
+
+# Characters a numeric list and an embedding ({"index": [qubit, ...], ...}) consist of
+_ARRAY_CHARACTERS = b"0123456789+-.eE,[] \t\r\n"
+_EMBEDDING_CHARACTERS = b'0123456789",:[] \t\r\n'
+_ARRAY_SEPARATORS = bytes.maketrans(b"[]", b"  ")
+_EMBEDDING_SEPARATORS = bytes.maketrans(b'",:[]', b"     ")
+
+# Prefix of the strings that replace the extracted lists until they are parsed
+_PLACEHOLDER = "\x00uqo:"
+
+
+def _find_arrays(data):
+    """Yield (start, stop) of every list of numbers that is the "data" of a serialized array. A list can not contain
+    quotes or braces, so it ends with the last bracket before the next one of them. """
+    for match in _ARRAY_START.finditer(data):
+        start = match.end() - 1
+        ends = [end for end in (data.find(b'"', start), data.find(b"}", start)) if end != -1]
+        stop = data.rfind(b"]", start, min(ends) if ends else len(data)) + 1
+        span = data[start:stop]
+        if stop > start and not span.translate(None, _ARRAY_CHARACTERS) and span.count(b"[") == span.count(b"]"):
+            yield start, stop
+
+
+def _find_embeddings(data):
+    """Yield (start, stop) of every embedding object whose keys are indices and whose chains are lists of qubits. """
+    for match in _EMBEDDING_START.finditer(data):
+        start = match.end() - 1
+        stop = data.find(b"}", start) + 1
+        if stop > start and not data[start + 1:stop - 1].translate(None, _EMBEDDING_CHARACTERS):
+            yield start, stop
+
+
+def _parse_array(span, array):
+    """Parse the list of a serialized array with the data type and shape given in the array dictionary. The nested
+    list is read as a flat sequence of numbers and reshaped, the JSON parser is only used if that fails. """
+    if array.get("type") == "array" and "data_type" in array and "shape" in array:
+        with warnings.catch_warnings():
+            warnings.simplefilter("error")
+            try:
+                numbers = np.fromstring(span.translate(_ARRAY_SEPARATORS), dtype=np.dtype(array["data_type"]), sep=",")
+                shape = tuple(array["shape"])
+            except (ValueError, TypeError, DeprecationWarning):
+                numbers, shape = None, None
+        # empty entries are read as zeros, the number of values reveals them
+        if numbers is not None and numbers.size == int(np.prod(shape)):
+            return numbers.reshape(shape)
+    return _loads(span)
+
+
+def embedding_arrays(embedding):
+    """Return an embedding (dictionary index -> chain of qubits) in CSR format.
+
+    Returns
+    -------
+    variables: numpy.ndarray
+        Indices of the embedded variables
+    indptr: numpy.ndarray
+        The chain of variables[k] is qubits[indptr[k]:indptr[k + 1]]
+    qubits: numpy.ndarray
+        Qubits of all chains
+    """
+    if isinstance(embedding, tuple):
+        return embedding
+    chains = list(embedding.values())
+    lengths = np.fromiter(map(len, chains), dtype=np.int64, count=len(chains))
+    variables = np.fromiter(map(int, embedding), dtype=np.int64, count=len(chains))
+    qubits = np.fromiter((q for chain in chains for q in chain), dtype=np.int64, count=int(lengths.sum()))
+    return variables, np.concatenate([[0], np.cumsum(lengths)]), qubits
+
+
+def _parse_embedding(span):
+    """Parse an embedding object into CSR arrays (see embedding_arrays). The numbers are read as one flat sequence
+    (index, qubits of its chain, next index, ...), the chain lengths are derived from the positions of the brackets
+    and commas. """
+    compact = span.translate(None, b" \t\r\n")
+    text = np.frombuffer(compact, dtype=np.uint8)
+    opens = np.flatnonzero(text == ord("["))
+    closes = np.flatnonzero(text == ord("]"))
+    commas = np.flatnonzero(text == ord(","))
+    num_variables = len(opens)
+    # every chain is written as "index":[...] and followed by a comma or the end of the object
+    if len(closes) != num_variables or compact.count(b":") != num_variables or \
+            compact.count(b'"') != 2 * num_variables or np.any(text[opens - 1] != ord(":")) or \
+            np.any(closes[:-1] + 1 >= opens[1:]) or np.any(text[closes + 1][:-1] != ord(",")):
+        return _loads(span)
+    lengths = np.searchsorted(commas, closes) - np.searchsorted(commas, opens) + 1
+    lengths[text[opens + 1] == ord("]")] = 0
+    numbers = np.fromstring(compact[1:-1].translate(_EMBEDDING_SEPARATORS), dtype=np.int64, sep=" ")
+    if len(numbers) != num_variables + lengths.sum():
+        return _loads(span)
+    is_variable = np.zeros(len(numbers), dtype=bool)
+    is_variable[np.cumsum(lengths + 1) - lengths - 1] = True
+    return numbers[is_variable], np.concatenate([[0], np.cumsum(lengths)]), numbers[~is_variable]
+
+
+def _restore(obj, spans):
+    """Replace the placeholders in the parsed reply with the parsed lists and embeddings. """
+    if isinstance(obj, dict):
+        for key, value in obj.items():
+            if isinstance(value, str) and value.startswith(_PLACEHOLDER):
+                kind, span = spans[int(value[len(_PLACEHOLDER):])]
+                obj[key] = _parse_array(span, obj) if kind == "array" else _parse_embedding(span)
+            elif isinstance(value, (dict, list)):
+                _restore(value, spans)
+    elif isinstance(obj, list):
+        for value in obj:
+            if isinstance(value, (dict, list)):
+                _restore(value, spans)
+
+
+def decode_reply(data, embeddings=False):
+    """Deserialize a reply of the server without building Python objects for its large parts.
+
+    The lists of serialized NumPy arrays ({"type": "array", "data": [...], "data_type": ..., "shape": ...}, e.g. the
+    packed samples, the energies and the number of occurrences of a serialized SampleSet) are cut out of the raw bytes
+    and parsed directly into arrays of their data type, so dimod.SampleSet.from_serializable does not have to convert
+    nested lists. The rest of the reply is parsed with orjson if it is installed, with the json module otherwise or if
+    orjson rejects the reply (NaN and Infinity written by json.dumps).
+
+    Parameters
+    ----------
+    data: bytes
+        The UTF-8 encoded JSON document
+    embeddings: bool
+        If True, objects under the key "embedding" whose keys are indices are parsed into CSR arrays (see
+        embedding_arrays) instead of dictionaries
+
+    Returns
+    -------
+    dict
+    """
+    if isinstance(data, str):
+        data = data.encode("utf8")
+    found = [(start, stop, "array") for start, stop in _find_arrays(data)]
+    if embeddings:
+        found += [(start, stop, "embedding") for start, stop in _find_embeddings(data)]
+    if not found:
+        return _loads(data)
+
+    pieces, spans, position = [], [], 0
+    for start, stop, kind in sorted(found):
+        if start < position:
+            continue
+        pieces.append(data[position:start])
+        pieces.append(_dumps(f"{_PLACEHOLDER}{len(spans)}"))
+        spans.append((kind, data[start:stop]))
+        position = stop
+    pieces.append(data[position:])
+    reply = _loads(b"".join(pieces))
+    _restore(reply, spans)
+    return reply
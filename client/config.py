@@ -1,5 +1,9 @@
 from .connection import Connection
 import json
+import os
+
+# Directory where UQO keeps data between runs (edge lists of the DWave solvers, state of the rate limiters)
+CACHE_DIR = os.environ.get("UQO_CACHE_DIR", os.path.join(os.path.expanduser("~"), ".uqo", "cache"))
 
 
 class Config:
@@ -10,14 +14,21 @@ class Config:
     Attributes
     ----------
     endpoint
-        endpoint (ip+port) to which the connection will be established
+        endpoint (ip+port) to which the connection will be established, or a list of endpoints. With several
+        endpoints, every request is sent to the best healthy one (lowest ping latency and error rate) and fails over to
+        the next one if it times out.
+    endpoints
+        List of the endpoints (read-only)
+    timeout
+        Seconds to wait for a reply before a request fails over to the next endpoint (see Connection). Solve requests
+        only fail over on a timeout if it is set, a failed over solve request is run again on the next endpoint.
     method
         authentication method
     credentials
         personal token of the user
 
     The endpoint, method and credentials are specified in the config file or passed as a parameter to the config
-    object in main.py.
+    object in main.py. Several endpoints can be given as a list under "endpoint" or "endpoints".
 
     Methods
     ----------
@@ -36,9 +47,13 @@ class Config:
             or the path to the config file containing the configuration data.
         """
 
+        self.timeout = kwargs.get("timeout")
+
         # authentication without config file
         if "endpoint" in kwargs:
             self.endpoint = kwargs["endpoint"]
+        if "endpoints" in kwargs:
+            self.endpoint = list(kwargs["endpoints"])
         if "method" in kwargs and "credentials" in kwargs:
             self.method = kwargs["method"]
             self.credentials = kwargs["credentials"]
@@ -50,9 +65,15 @@ class Config:
                 config = json.load(configfile)
                 self.method = config["method"]
                 self.credentials = config["credentials"]
-                self.endpoint = config["endpoint"]
+                self.endpoint = config["endpoints"] if "endpoints" in config else config["endpoint"]
                 self.private_key_file = config["private_key_file"]
+                self.timeout = config.get("timeout", self.timeout)
+
+    @property
+    def endpoints(self):
+        """Return the list of endpoints. """
+        return [self.endpoint] if isinstance(self.endpoint, str) else list(self.endpoint)
 
     def create_connection(self):
         """Create a connection object containing the configuration data of the user. """
-        return Connection(self.endpoint, self.method, self.credentials, self.private_key_file)
+        return Connection(self.endpoints, self.method, self.credentials, self.private_key_file, self.timeout)
@@ -4,6 +4,9 @@ import os
 from .. import Problem
 from .. import Response
 from .. UQOExceptions import *
+from .ratelimit import RateLimiter, RATE_LIMITED_TASKS
+from .codec import encode_message, decode_reply
+from .endpoints import EndpointPool, FAILOVER_TIMEOUT, FAILOVER_TASKS
 
 
 class Connection:
@@ -17,7 +20,13 @@ class Connection:
     Attributes
     ----------
     url
-        ip+port to which the connection will be established (endpoint)
+        ip+port of the endpoint the last request was sent to
+    endpoints
+        EndpointPool with the health (ping latency and error rate) of all configured endpoints
+    timeout
+        Seconds to wait for a reply before the request is sent to the next endpoint (None waits forever). If it is
+        None and several endpoints are configured, FAILOVER_TIMEOUT applies to the FAILOVER_TASKS (ping, util,
+        show_quota) but not to solve requests.
     auth_method
         authentication method
     credentials
@@ -34,6 +43,9 @@ class Connection:
         Specifies which solver should be used.
     context
         ZeroMQ-Context
+    rate_limiter
+        RateLimiter that is shared by all processes using the same endpoint and credentials. Solve requests wait for it
+        before they are sent. Set it to None to disable the client-side rate limit.
 
     Methods
     -------
@@ -58,29 +70,39 @@ class Connection:
     set_preferred_solver(), set_preferred_platform(), set_task()
         Setter methods for the attributes preferred_solver, preferred_platform and task
     available_tasks()
-    send_message(message)
-        Create a request socket and connect to the endpoint specified in url. Send the message and return the reply.
+    send_message(message, embeddings)
+        Send the message to the best healthy endpoint, fail over to the next one on a timeout and return the reply.
     to_json()
+        Return a copy of the message with tuple keys converted to strings (send_message uses codec.encode_message)
     check_errors()
         Check if the message from the server contains an authentication or backend exception
+    get_quota()
+        Return the time a user has left for computation on a d-wave platform.
     show_quota()
-        Print the time a user has left for computation on a d-wave platform.
+        Print and return the time a user has left for computation on a d-wave platform.
     """
 
-    def __init__(self, url, auth_method, credentials, private_key_file):
+    def __init__(self, url, auth_method, credentials, private_key_file, timeout=None):
         """Initialize the connection object. Fill the config data (url, auth_method and credentials) by using the
         passed arguments.
 
         Parameters
         ----------
         url
-            ip+port to which the connection will be established (endpoint)
+            ip+port to which the connection will be established (endpoint), or a list of endpoints
         auth_method
             authentication method
         credentials
             personal token of the user
+        timeout
+            Seconds to wait for a reply before the request is sent to the next endpoint. A request that fails over is
+            sent again, so a solve request that timed out may run on two servers and use quota twice. By default
+            there is no timeout for solve requests, with several endpoints the other requests use FAILOVER_TIMEOUT.
         """
-        self.url = url
+        urls = [url] if isinstance(url, str) else list(url)
+        self.url = urls[0]
+        self.endpoints = EndpointPool.shared(urls)
+        self.timeout = timeout
         self.credentials = credentials
         self.auth_method = auth_method
         self.preferred_solver = None
@@ -89,6 +111,7 @@ class Connection:
         self.solver = None
         self.private_key_file = private_key_file
         self.context = zmq.Context().instance()
+        self.rate_limiter = RateLimiter.shared(",".join(urls), credentials)
 
     # ----------------------- PING MESSAGE ----------------------- #
     def ping(self):
@@ -143,15 +166,11 @@ class Connection:
         }
 
         # Send message to server and save the response in answer
-        answer = self.send_message(find_embedding_message)
+        answer = self.send_message(find_embedding_message, embeddings=True)
 
-        # Extract the embedding from the response.
+        # Extract the embedding from the response and translate the variable indices into the variable labels.
         embedding_stringed = answer["solver_details"]["embedding"]
-        embedding = {}
-        for key in embedding_stringed:
-            embedding[int(key)] = embedding_stringed[key]
-
-        return embedding
+        return problem.decode_embedding(embedding_stringed)
 
     def find_pegasus_embedding(self, problem):
         """Sends a request to the server to find a pegasus embedding for a given problem.
@@ -184,14 +203,10 @@ class Connection:
             }
         }
 
-        answer = self.send_message(find_embedding_message)
+        answer = self.send_message(find_embedding_message, embeddings=True)
         embedding_stringed = answer["solver_details"]["embedding"]
 
-        embedding = {}
-        for key in embedding_stringed:
-            embedding[int(key)] = embedding_stringed[key]
-
-        return embedding
+        return problem.decode_embedding(embedding_stringed)
 
     # --------------- FIND INITIAL STATE MESSAGE ---------------- #
 
@@ -211,7 +226,7 @@ class Connection:
 
         initial_parsed = {}
         for key in initial:
-            initial_parsed[int(key)] = int(initial[key])
+            initial_parsed[key] = int(initial[key])
 
         print("Calculated initial state: " + str(initial_parsed))
 
@@ -255,7 +270,10 @@ class Connection:
                     answer = Response.TabuResponse(answer["solver_details"]["answer"])
                 elif answer["solver"] == "LeapHybridSolver":
                     answer = Response.LeapHybridResponse(answer["solver_details"]["answer"])
-                return answer
+                # replies of unknown solvers are returned as they are, their samples are not relabeled
+                if not isinstance(answer, Response.Response):
+                    return answer
+                return problem.decode_response(answer)
             else:
                 self.check_errors(answer)
                 print(answer["status"])
@@ -305,7 +323,10 @@ class Connection:
                     answer = Response.LeapHybridResponse(answer["solver_details"]["answer"])
                 elif answer["solver"] == "GeneticSolver":
                     answer = Response.GeneticResponse(answer["solver_details"]["answer"])
-                return answer
+                # replies of unknown solvers are returned as they are, their samples are not relabeled
+                if not isinstance(answer, Response.Response):
+                    return answer
+                return problem.decode_response(answer)
             else:
                 print(answer["status"])
                 print(answer)
@@ -363,9 +384,10 @@ class Connection:
 
     def get_task_details_message(self, problem):
         """Return a dictionary that contains information referring to the task. """
+        # the initial state and the guidance are keyed by the variable labels, the server expects the indices
         params = {
             "uq_params": problem.uq_params,
-            "solver_params": problem.solver_params
+            "solver_params": problem.encode_solver_params()
         }
 
         # if a preferred solver is specified
@@ -384,7 +406,7 @@ class Connection:
             task_details_message["pref_platform"] = self.preferred_platform
 
         if problem.embedding is not None:
-            task_details_message["embedding"] = problem.embedding
+            task_details_message["embedding"] = problem.encode_embedding(problem.embedding)
 
         return task_details_message
 
@@ -401,40 +423,92 @@ class Connection:
     def available_tasks(self):
         return ["solve"]
 
-    def send_message(self, message):
-        """Create a request socket and connect to the endpoint specified in url. Send the message and wait for a response message.
+    def send_message(self, message, embeddings=False):
+        """Send the message to the best healthy endpoint (see EndpointPool) and wait for a response message. If the
+        endpoint does not answer within the timeout, the request is sent to the next endpoint, so the server that timed
+        out may still execute it. Solve requests only time out if a timeout was given. With several endpoints, all of
+        them are probed with a ping message when the last probe is older than the probe interval.
 
         Parameters
         ----------
         message
             The message containing information about the task the server should execute and about authentication data of
             the user.
+        embeddings: bool
+            If True, an embedding in the reply is returned in CSR format (see codec.decode_reply)
 
         Returns
         -------
         answer
             Reply from the server
         """
+        limited = self.rate_limiter is not None and message.get("task") in RATE_LIMITED_TASKS
+        if limited:
+            self.rate_limiter.acquire()
+
+        payload = encode_message(message)  # serialize message
+        if len(self.endpoints.endpoints) > 1:
+            self.endpoints.probe(self._ping)
+
+        timeout = self.timeout
+        if timeout is None and len(self.endpoints.endpoints) > 1 and message.get("task") in FAILOVER_TASKS:
+            timeout = FAILOVER_TIMEOUT
+
+        failures = []
+        for url in self.endpoints.ranked():
+            try:
+                reply = self._request(url, payload, timeout)
+            except zmq.ZMQError as error:
+                self.endpoints.failure(url)
+                failures.append(f"{url}: {'timeout' if isinstance(error, zmq.Again) else error}")
+                continue
+            self.endpoints.success(url)
+            self.url = url
+            break
+        else:
+            raise NoEndpointAvailableException(failures)
+
+        answer = decode_reply(reply, embeddings)  # samples are decoded into arrays
+        try:
+            self.check_errors(answer)
+        except FastRetryException:
+            if limited:
+                self.rate_limiter.penalize(answer["error_details"].get("interval"))
+            raise
+        if limited:
+            self.rate_limiter.reward()
+        return answer
 
+    def _request(self, url, payload, timeout):
+        """Create a request socket, connect to the endpoint url, send the serialized message and return the raw reply.
+        Raises zmq.Again if no reply arrives within timeout seconds (None waits forever). """
         socket = self.context.socket(zmq.REQ)  # establish socket
-
-        client_public, client_secret = zmq.auth.load_certificate(self.private_key_file)
-        socket.curve_secretkey = client_secret
-        socket.curve_publickey = client_public
-
-        # The client must know the server's public key to make a CURVE connection.
-        server_public_file = os.path.join(os.path.dirname(os.path.realpath(__file__)), "uqo_public.key")
-        server_public, _ = zmq.auth.load_certificate(server_public_file)
-        socket.curve_serverkey = server_public
-
-        socket.connect("tcp://" + self.url)
-
-        json_message = self.to_json(message)  # convert message into json object
-        socket.send_json(json_message)  # send message
-
-        answer = socket.recv_json()  # wait for response
-        self.check_errors(answer)
-        return answer
+        try:
+            client_public, client_secret = zmq.auth.load_certificate(self.private_key_file)
+            socket.curve_secretkey = client_secret
+            socket.curve_publickey = client_public
+
+            # The client must know the server's public key to make a CURVE connection.
+            server_public_file = os.path.join(os.path.dirname(os.path.realpath(__file__)), "uqo_public.key")
+            server_public, _ = zmq.auth.load_certificate(server_public_file)
+            socket.curve_serverkey = server_public
+
+            if timeout is not None:
+                socket.setsockopt(zmq.SNDTIMEO, int(timeout * 1000))
+                socket.setsockopt(zmq.RCVTIMEO, int(timeout * 1000))
+            socket.connect("tcp://" + url)
+            socket.send(payload)
+            return socket.recv()  # wait for response
+        finally:
+            socket.close(linger=0)
+
+    def _ping(self, url, timeout):
+        """Send a ping message to one endpoint (used to probe the endpoints). """
+        ping_message = {
+            "task": "ping",
+            "authentication": self.get_authentication_message()
+        }
+        return decode_reply(self._request(url, encode_message(ping_message), timeout))
 
     def to_json(self, message):
         json_message = dict()
@@ -511,8 +585,8 @@ class Connection:
             elif error_type == "GeneticException":
                 raise GeneticException(answer["error_details"])
 
-    def show_quota(self):
-        """Print the remaining quota (the time you can spend on a DWave platform in microseconds). """
+    def get_quota(self):
+        """Return the remaining quota (the time you can spend on a DWave platform in microseconds). """
 
         show_coins_message = {
             "authentication": self.get_authentication_message(),
@@ -521,4 +595,10 @@ class Connection:
 
         # send message to server
         answer = self.send_message(show_coins_message)
-        print(answer["quota"])
+        return answer["quota"]
+
+    def show_quota(self):
+        """Print and return the remaining quota (the time you can spend on a DWave platform in microseconds). """
+        quota = self.get_quota()
+        print(quota)
+        return quota
@@ -0,0 +1,179 @@
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+# Weight of a new measurement in the smoothed latency and error rate
+SMOOTHING = 0.3
+
+# An error rate of 1 counts like this many times the latency when the endpoints are ranked
+ERROR_PENALTY = 4.0
+
+# Seconds between two probes of all endpoints and seconds a probe waits for the pong
+PROBE_INTERVAL = 60.0
+PROBE_TIMEOUT = 5.0
+
+# Seconds an endpoint is tried last after a failure, doubled with every further failure in a row
+COOLDOWN = 5.0
+MAX_COOLDOWN = 300.0
+
+# Request timeout (seconds) of the FAILOVER_TASKS if several endpoints are configured and no timeout is given
+FAILOVER_TIMEOUT = 300.0
+
+# Tasks that are answered quickly and can be sent again without side effects (ping, edge lists, embeddings, quota).
+# Other requests (solve) have no default timeout: failing over re-submits the job, which runs it a second time.
+FAILOVER_TASKS = ("ping", "util", "show_quota")
+
+
+class Endpoint:
+    """Health of one endpoint.
+
+    Attributes
+    ----------
+    url
+        ip+port of the endpoint
+    latency
+        Smoothed round trip time of the pings in seconds (None before the first successful ping)
+    error_rate
+        Smoothed fraction of failed requests and pings
+    failures
+        Number of failures in a row
+    unhealthy_until
+        Time (time.time()) until which the endpoint is only tried after the healthy ones
+    """
+
+    def __init__(self, url):
+        self.url = url
+        self.latency = None
+        self.error_rate = 0.0
+        self.failures = 0
+        self.unhealthy_until = 0.0
+
+    @property
+    def healthy(self):
+        return time.time() >= self.unhealthy_until
+
+    def __repr__(self):
+        latency = "unknown" if self.latency is None else f"{self.latency * 1000:.1f}ms"
+        return f"Endpoint({self.url}, latency={latency}, error_rate={self.error_rate:.2f}, healthy={self.healthy})"
+
+
+class EndpointPool:
+    """The endpoints of a connection, ranked by their health. Healthy endpoints come first, ordered by their ping
+    latency (increased by their error rate), endpoints that failed recently are tried last. The pool of a list of
+    endpoints is shared by all connections of a process (see shared).
+
+    Attributes
+    ----------
+    endpoints
+        List of Endpoint objects in the configured order
+    probe_interval, probe_timeout
+        Seconds between two probes and seconds a probe waits for the pong
+    cooldown, max_cooldown
+        Seconds an endpoint is considered unhealthy after its first and after further failures in a row
+    last_probe
+        Time of the last probe (None before the first probe)
+
+    Methods
+    -------
+    shared(urls)
+        Return the pool of a list of endpoints (one instance per process)
+    probe(ping, force)
+        Ping all endpoints concurrently if the last probe is older than probe_interval
+    success(url, latency), failure(url)
+        Record the outcome of a request or ping
+    ranked()
+        Return the urls in the order they should be tried
+    """
+
+    _instances = {}
+    _instances_lock = threading.Lock()
+
+    def __init__(self, urls, probe_interval=PROBE_INTERVAL, probe_timeout=PROBE_TIMEOUT, cooldown=COOLDOWN,
+                 max_cooldown=MAX_COOLDOWN):
+        if not urls:
+            raise ValueError("At least one endpoint is required")
+        self.endpoints = [Endpoint(url) for url in urls]
+        self.probe_interval = probe_interval
+        self.probe_timeout = probe_timeout
+        self.cooldown = cooldown
+        self.max_cooldown = max_cooldown
+        self.last_probe = None
+        self._by_url = {endpoint.url: endpoint for endpoint in self.endpoints}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def shared(cls, urls, **kwargs):
+        """Return the pool of a list of endpoints (one instance per process). """
+        key = tuple(urls)
+        with cls._instances_lock:
+            if key not in cls._instances:
+                cls._instances[key] = cls(list(urls), **kwargs)
+            return cls._instances[key]
+
+    @property
+    def urls(self):
+        return [endpoint.url for endpoint in self.endpoints]
+
+    def probe(self, ping, force=False):
+        """Ping all endpoints concurrently, unless the last probe is more recent than probe_interval (and force is
+        False). Only one thread probes at a time.
+
+        Parameters
+        ----------
+        ping
+            Function ping(url, timeout) that raises an exception if the endpoint does not answer
+        force: bool
+            Probe even if the last probe is recent
+        """
+        with self._lock:
+            if not force and self.last_probe is not None and time.time() - self.last_probe < self.probe_interval:
+                return
+            self.last_probe = time.time()
+
+        def run(url):
+            start = time.perf_counter()
+            try:
+                ping(url, self.probe_timeout)
+            except Exception:
+                self.failure(url)
+            else:
+                self.success(url, time.perf_counter() - start)
+
+        with ThreadPoolExecutor(max_workers=len(self.endpoints)) as executor:
+            list(executor.map(run, self.urls))
+
+    def success(self, url, latency=None):
+        """Record a successful request (latency None) or ping (with its round trip time in seconds). """
+        with self._lock:
+            endpoint = self._by_url[url]
+            endpoint.failures = 0
+            endpoint.unhealthy_until = 0.0
+            endpoint.error_rate *= 1 - SMOOTHING
+            if latency is not None:
+                endpoint.latency = latency if endpoint.latency is None \
+                    else (1 - SMOOTHING) * endpoint.latency + SMOOTHING * latency
+
+    def failure(self, url):
+        """Record a failed request or ping, the endpoint is unhealthy for a cooldown that doubles with every failure in
+        a row. """
+        with self._lock:
+            endpoint = self._by_url[url]
+            endpoint.failures += 1
+            endpoint.error_rate = (1 - SMOOTHING) * endpoint.error_rate + SMOOTHING
+            endpoint.unhealthy_until = time.time() + min(self.cooldown * 2 ** (endpoint.failures - 1),
+                                                         self.max_cooldown)
+
+    def ranked(self):
+        """Return the urls in the order they should be tried: the healthy endpoints by their latency (endpoints that
+        were not pinged successfully yet after those with a known latency), then the unhealthy ones by the end of
+        their cooldown. """
+        def key(item):
+            position, endpoint = item
+            if not endpoint.healthy:
+                return 2, endpoint.unhealthy_until, position
+            if endpoint.latency is None:
+                return 1, endpoint.error_rate, position
+            return 0, endpoint.latency * (1 + ERROR_PENALTY * endpoint.error_rate), position
+
+        with self._lock:
+            return [endpoint.url for position, endpoint in sorted(enumerate(self.endpoints), key=key)]
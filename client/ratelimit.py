@@ -0,0 +1,163 @@
+import os
+import time
+import struct
+import hashlib
+import threading
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+# tokens, time of the last update, rate (requests per second), blocked until, rate at the last fast retry error
+STATE_FORMAT = "<5d"
+STATE_SIZE = struct.calcsize(STATE_FORMAT)
+
+# Tasks that count against the request limit of the server
+RATE_LIMITED_TASKS = ("solve",)
+
+
+class RateLimiter:
+    """Token bucket that is shared by all processes on this host that use the same endpoint and credentials.
+
+    The state of the bucket is kept in a small file in CACHE_DIR (see config) that is locked while it is read and
+    updated, so the limit applies to the sum of the requests of all processes. On platforms without fcntl, or if the
+    file can not be created or locked (e.g. a read-only cache directory), the bucket is only shared by the threads of
+    the current process.
+
+    The rate adapts to the limit of the server (additive increase, multiplicative decrease): every successful request
+    raises the rate by increase, a FastRetryException multiplies it by decrease and blocks all processes for the
+    interval the server asks for. Above the rate at which the last fast retry error occurred, the rate grows ten times
+    slower, so it settles just below the limit instead of oscillating around it.
+
+    Attributes
+    ----------
+    path
+        File that holds the shared state
+    rate
+        Initial rate (requests per second), used by the process that creates the shared state
+    burst
+        Maximum number of requests that can be sent at once
+    min_rate, max_rate
+        Bounds of the rate
+    increase, decrease
+        Additive increase per successful request and multiplicative decrease per fast retry error
+
+    Methods
+    -------
+    acquire()
+        Wait until a request may be sent
+    reward()
+        Record a successful request
+    penalize(interval)
+        Record a fast retry error
+    """
+
+    _instances = {}
+    _instances_lock = threading.Lock()
+
+    def __init__(self, path, rate=1.0, burst=1, min_rate=0.01, max_rate=20.0, increase=0.05, decrease=0.5):
+        self.path = path
+        self.rate = rate
+        self.burst = burst
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.increase = increase
+        self.decrease = decrease
+        self._lock = threading.Lock()
+        self._state = None
+        self._shared = fcntl is not None
+
+    @classmethod
+    def shared(cls, url, credentials, **kwargs):
+        """Return the rate limiter of an endpoint and credentials (one instance per process). """
+        from .config import CACHE_DIR
+
+        key = hashlib.sha1(f"{url}|{credentials}".encode()).hexdigest()[:16]
+        with cls._instances_lock:
+            if key not in cls._instances:
+                cls._instances[key] = cls(os.path.join(CACHE_DIR, f"ratelimit_{key}.bin"), **kwargs)
+            return cls._instances[key]
+
+    def _initial_state(self):
+        return [float(self.burst), time.time(), float(self.rate), 0.0, 0.0]
+
+    def _update(self, function):
+        """Apply function to the shared state while it is locked. function changes the state list in place and returns
+        the number of seconds the caller has to wait. """
+        with self._lock:
+            if self._shared:
+                try:
+                    file = self._open()
+                except OSError:
+                    # the state file can not be used, keep the bucket in this process
+                    self._shared = False
+                else:
+                    with file:
+                        return self._update_file(file, function)
+            if self._state is None:
+                self._state = self._initial_state()
+            return function(self._state)
+
+    def _open(self):
+        """Open (and create) the state file. """
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        return open(os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600), "r+b")
+
+    def _update_file(self, file, function):
+        fcntl.flock(file, fcntl.LOCK_EX)
+        try:
+            data = file.read(STATE_SIZE)
+            state = list(struct.unpack(STATE_FORMAT, data)) if len(data) == STATE_SIZE else self._initial_state()
+            wait = function(state)
+            file.seek(0)
+            file.write(struct.pack(STATE_FORMAT, *state))
+            file.flush()
+        finally:
+            fcntl.flock(file, fcntl.LOCK_UN)
+        return wait
+
+    def _take(self, state):
+        tokens, updated, rate, blocked_until, ceiling = state
+        now = time.time()
+        tokens = min(float(self.burst), tokens + max(now - updated, 0.0) * rate)
+        state[0], state[1] = tokens, now
+        if now < blocked_until:
+            return blocked_until - now
+        if tokens >= 1.0:
+            state[0] = tokens - 1.0
+            return 0.0
+        return (1.0 - tokens) / rate
+
+    def acquire(self):
+        """Block until the bucket contains a token and take it. """
+        while True:
+            wait = self._update(self._take)
+            if wait <= 0.0:
+                return
+            time.sleep(wait)
+
+    def reward(self):
+        """Raise the rate after a successful request. """
+        def function(state):
+            step = self.increase if state[4] <= 0.0 or state[2] < state[4] else self.increase / 10
+            state[2] = min(self.max_rate, state[2] + step)
+            return 0.0
+        self._update(function)
+
+    def penalize(self, interval=None):
+        """Lower the rate after a fast retry error and block all requests for interval seconds. """
+        def function(state):
+            now = time.time()
+            state[4] = state[2]
+            state[2] = max(self.min_rate, state[2] * self.decrease)
+            if interval:
+                state[2] = max(self.min_rate, min(state[2], 1.0 / interval))
+                state[3] = max(state[3], now + interval)
+            state[0] = 0.0
+            return 0.0
+        self._update(function)
+
+    def current_rate(self):
+        """Return the current shared rate (requests per second). """
+        return self._update(lambda state: state[2])
@@ -930,3 +930,16 @@ def dwave_leaphybrid_example_ising(config):
     # answer.print_num_occurrences()
 
     answer.print_solutions_nice()
+
+
+def local_example_qubo(config):
+    """Solve the QUBO example in the current process with the local platform (no request is sent to the server). """
+
+    parameters = {
+        "optimization_method": "annealing",  # "annealing" or "tabu"
+        "number_iterations": 1000,  # number of flip proposals per run
+        # "workers": 4,  # number of processes the runs are distributed to
+    }
+
+    answer = Problem.Qubo(config, example_qubo).with_platform("local").with_params(**parameters).solve(16)
+    answer.print_solutions_nice()
@@ -1,6 +1,8 @@
 import networkx as nx
+import numpy as np
 import matplotlib.pyplot as plt
 from . import util
+from .. import Builders
 
 
 def create_qubo():
@@ -20,30 +22,16 @@ def create_qubo():
     # Note: networkx sometimes draws the graph kinda strange. just execute the drawing multiple times, to get different
     #       equivalent representations of the problem instance
 
-    # The "names" of the nodes in the graph
-    nodes = [0, 1, 2, 3]
     # Think of 0 = red, 1 = green, 2 = blue
-    colors = [0, 1, 2]
-
-    amount_of_colors = len(colors)
-
-    QUBO = {}
-
-    # Fill the QUBO
-    for n_index, node in enumerate(nodes):
-        for c_index, color in enumerate(colors):
-            # Reward for assigning a color to a node
-            QUBO[(amount_of_colors * n_index + c_index, amount_of_colors * n_index + c_index)] = -1
-            # Penalty for assigning multiple colors to a node
-            for color in range(1, amount_of_colors - (amount_of_colors * n_index + c_index) % amount_of_colors):
-                QUBO[(amount_of_colors * n_index + c_index, amount_of_colors * n_index + c_index + color)] = 2
-            # Penalty for assigning the same color to adjacent nodes
-            for node2 in list(nx.neighbors(problem_instance, node)):
-                n2_index = nodes.index(node2)
-                if n_index >= n2_index:
-                    continue
-                else:
-                    QUBO[(amount_of_colors * n_index + c_index, amount_of_colors * n2_index + c_index)] = 1
+    amount_of_colors = 3
+
+    # Variable amount_of_colors * node + color is 1 if the node gets the color: a reward of -1 for assigning a color to
+    # a node, a penalty of 2 for assigning multiple colors to a node and a penalty of 1 for assigning the same color to
+    # adjacent nodes (see Builders.graph_coloring)
+    qubo = Builders.graph_coloring(problem_instance, amount_of_colors)
+    variables, linear, (row, col, quadratic), offset = qubo.to_arrays()
+    QUBO = {(i, i): bias for i, bias in enumerate(linear.tolist())}
+    QUBO.update(zip(zip(np.minimum(row, col).tolist(), np.maximum(row, col).tolist()), quadratic.tolist()))
 
     # If you want to see the qubo - uncomment the following lines
     # util.display_qubo(QUBO)
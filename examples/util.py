@@ -1,37 +1,124 @@
+import numpy as np
+
+# Characters of the block density heatmap, from empty to dense
+SHADES = " .:-=+*#%@"
 
-def display_qubo(qubo_dict):
-    """Save a QUBO in a well readable format to a txt file.
+
+def qubo_coordinates(qubo):
+    """Return the QUBO as coordinate arrays.
 
     Parameters
     ----------
-    qubo_dict
-        Dictionary that represents the QUBO
+    qubo
+        Dictionary that represents the QUBO or a Problem (Qubo or Ising, see Problem.to_arrays)
+
+    Returns
+    -------
+    num_variables: int
+    row, col: numpy.ndarray
+        Positions of the non-zero entries. Integer labels of a dictionary are used as positions, other labels are
+        numbered in the order they occur.
+    values: numpy.ndarray
+        Values of the non-zero entries
     """
+    if not isinstance(qubo, dict):
+        variables, linear, (row, col, quadratic), offset = qubo.to_arrays()
+        diagonal = np.arange(len(linear), dtype=np.int64)
+        row = np.concatenate([diagonal, np.asarray(row, dtype=np.int64)])
+        col = np.concatenate([diagonal, np.asarray(col, dtype=np.int64)])
+        values = np.concatenate([linear, quadratic]).astype(np.float64)
+    else:
+        values = np.fromiter(qubo.values(), dtype=np.float64, count=len(qubo))
+        labels = [label for key in qubo for label in key]
+        if all(isinstance(label, (int, np.integer)) for label in labels):
+            positions = np.array(labels, dtype=np.int64)
+        else:
+            index = {}
+            positions = np.array([index.setdefault(label, len(index)) for label in labels], dtype=np.int64)
+        positions = positions.reshape(-1, 2)
+        row, col = positions[:, 0], positions[:, 1]
+    nonzero = values != 0
+    num_variables = int(max(row.max(), col.max())) + 1 if len(row) else 0
+    return num_variables, row[nonzero], col[nonzero], values[nonzero]
+
+
+def _format(value):
+    return f"{value:g}"
+
 
-    print(qubo_dict)
-    max_1 = max(list(map(lambda x: x[0], qubo_dict.keys())))
-    max_2 = max(list(map(lambda x: x[1], qubo_dict.keys())))
+def write_dense(file, num_variables, row, col, values, empty_space=3):
+    """Write the QUBO matrix row by row. Only the non-zero entries of each row are formatted, a row is assembled from
+    a template of zeros. """
+    width = max([len(_format(value)) for value in values] + [1]) + empty_space
+    zero = "0".ljust(width)
+    order = np.lexsort((col, row))
+    row, col, values = row[order], col[order], values[order]
+    indptr = np.concatenate([[0], np.cumsum(np.bincount(row, minlength=num_variables))])
+    for i in range(num_variables):
+        cells = [zero] * num_variables
+        for j, value in zip(col[indptr[i]:indptr[i + 1]].tolist(), values[indptr[i]:indptr[i + 1]].tolist()):
+            cells[j] = _format(value).ljust(width)
+        file.write("".join(cells).rstrip() + "\n")
 
-    amount_of_vars = max_1 if max_1 >= max_2 else max_2
 
-    max_val = -100000000
+def write_summary(file, num_variables, row, col, values, blocks=64, bins=20, bar_width=50):
+    """Write statistics, a block density heatmap and a histogram of the coefficients of a QUBO. The time is linear in
+    the number of non-zero entries. """
+    possible = num_variables * (num_variables + 1) / 2
+    diagonal = row == col
+    file.write(f"variables: {num_variables}\n")
+    file.write(f"non-zero entries: {len(values)} ({int(diagonal.sum())} linear, {int((~diagonal).sum())} quadratic)\n")
+    file.write(f"density: {len(values) / possible if possible else 0.0:.6g}\n")
+    if not len(values):
+        return
+    file.write(f"coefficients: min {values.min():g}, max {values.max():g}, mean {values.mean():g}, "
+               f"min |c| {np.abs(values).min():g}, max |c| {np.abs(values).max():g}\n")
 
-    for i in range(0, amount_of_vars+1):
-        for j in range(0, amount_of_vars + 1):
-            if (i, j) in qubo_dict and abs(qubo_dict[(i, j)]) >= max_val:
-                max_val = qubo_dict[(i, j)]
+    # density of every block of (num_variables / blocks)^2 entries, drawn with SHADES
+    blocks = max(1, min(blocks, num_variables))
+    block_row = row * blocks // num_variables
+    block_col = col * blocks // num_variables
+    counts = np.bincount(block_row * blocks + block_col, minlength=blocks * blocks).reshape(blocks, blocks)
+    edges = np.arange(blocks + 1) * num_variables // blocks
+    sizes = np.diff(edges)
+    density = counts / np.maximum(np.outer(sizes, sizes), 1)
+    levels = np.where(counts > 0, 1 + np.minimum(
+        (density / density.max() * (len(SHADES) - 1)).astype(np.int64), len(SHADES) - 2), 0)
+    file.write(f"\nblock density ({blocks}x{blocks} blocks of about {num_variables / blocks:.4g} variables, "
+               f"'{SHADES[-1]}' = {density.max():.3g})\n")
+    for level_row in levels:
+        file.write("|" + "".join(SHADES[level] for level in level_row) + "|\n")
 
-    space_per_number = len(str(max_val))
-    empty_space = 3
+    counts, bin_edges = np.histogram(values, bins=bins)
+    file.write("\ncoefficient histogram\n")
+    for count, low, high in zip(counts, bin_edges[:-1], bin_edges[1:]):
+        bar = "#" * int(round(bar_width * count / counts.max()))
+        file.write(f"[{low:>11.4g}, {high:>11.4g}) {count:>10d} {bar}\n")
 
-    with open("qubo.txt", "w") as file:
-        for i in range(0, amount_of_vars + 1):
-            line = ""
-            for j in range(0, amount_of_vars + 1):
-                if (i, j) in qubo_dict:
-                    str_val = str(qubo_dict[(i, j)])
-                    line += str_val + " " * (space_per_number - len(str_val) + empty_space)
-                else:
-                    line += "0" + " " * (space_per_number - 1 + empty_space)
 
-            file.write(line + "\n")
+def display_qubo(qubo, path="qubo.txt", max_dense=1000, blocks=64, bins=20):
+    """Save a QUBO in a well readable format to a txt file.
+
+    Small QUBOs are written as a matrix, streamed row by row. QUBOs with more than max_dense variables are summarised
+    instead (statistics, block density heatmap and coefficient histogram), in time proportional to the number of
+    non-zero entries.
+
+    Parameters
+    ----------
+    qubo
+        Dictionary that represents the QUBO or a Problem
+    path
+        Path of the txt file
+    max_dense: int
+        Largest number of variables that is written as a matrix
+    blocks: int
+        Number of blocks per dimension of the heatmap
+    bins: int
+        Number of bins of the coefficient histogram
+    """
+    num_variables, row, col, values = qubo_coordinates(qubo)
+    with open(path, "w") as file:
+        if num_variables <= max_dense:
+            write_dense(file, num_variables, row, col, values)
+        else:
+            write_summary(file, num_variables, row, col, values, blocks, bins)